@@ -4,11 +4,21 @@
 from __future__ import annotations
 
 import argparse
+import codecs
+import hashlib
+import io
 import json
+import os
 import re
+import sqlite3
 import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
-from typing import Dict, List, Sequence
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
 try:
     from tqdm import tqdm
@@ -17,6 +27,25 @@ except ImportError as exc:  # pragma: no cover - runtime dependency
         "Missing dependency: tqdm. Install it with 'pip install tqdm' before running this script."
     ) from exc
 
+try:
+    import ollama
+except ImportError:  # pragma: no cover - optional HTTP backend
+    ollama = None
+
+try:
+    from PIL import Image, ImageDraw, ImageOps
+except ImportError:  # pragma: no cover - optional pre-processing stage
+    Image = None
+
+from atomic_io import atomic_write_text
+from build_manifest import file_digest
+from llm_json import JSONObjectScanner, loads_lenient
+
+BACKEND_ERRORS: tuple[type[Exception], ...] = (subprocess.CalledProcessError,)
+if ollama is not None:
+    BACKEND_ERRORS += (ollama.ResponseError,)
+
+OCR_PROMPT = "Text Recognition:"
 DEFAULT_PROMPT = """You are an expert data extractor. Given the OCR text from a document,
 produce a compact JSON object with these keys: name, age, location, prices (array
 of objects with duration, amount, currency), services (array of short strings),
@@ -29,9 +58,9 @@ CONSENSUS_PROMPT = """You are a coordinator model. Multiple LLMs extracted JSON
 same OCR text. Review their proposals and output a single reconciled JSON object
 described in the schema below.
 
-Schema keys: name, age, location, prices[{duration, amount, currency}],
-services[], contact{whatsapp, phone, email, social}, attributes{height, weight,
-hair_color, eye_color, implants, measurements}, raw_text (concise summary in
+Schema keys: name, age, location, prices[{{duration, amount, currency}}],
+services[], contact{{whatsapp, phone, email, social}}, attributes{{height, weight,
+hair_color, eye_color, implants, measurements}}, raw_text (concise summary in
 Spanish).
 
 Use the OCR text for reference when the proposals disagree. Prefer values with
@@ -45,16 +74,282 @@ PROPOSALS:\n{proposals}
 Return JSON only, no markdown."""
 
 
-def run_ollama(ollama_bin: str, model: str, prompt: str, timeout: int) -> str:
+class ModelCancelled(RuntimeError):
+    """A model request abandoned because its answer is no longer wanted."""
+
+
+class _Watchdog:
+    """Kill ``process`` once ``timeout`` passes or ``cancel`` is set; use as a context manager around the wait."""
+
+    def __init__(self, process: subprocess.Popen, timeout: float, cancel: threading.Event | None) -> None:
+        self.process = process
+        self.deadline = time.monotonic() + timeout
+        self.cancel = cancel
+        self.timed_out = False
+        self.cancelled = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(0.1):
+            if self.cancel is not None and self.cancel.is_set():
+                self.cancelled = True
+            elif time.monotonic() >= self.deadline:
+                self.timed_out = True
+            else:
+                continue
+            self.process.kill()
+            return
+
+    def __enter__(self) -> "_Watchdog":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def run_ollama(
+    ollama_bin: str,
+    model: str,
+    prompt: str,
+    timeout: int,
+    cancel: threading.Event | None = None,
+) -> str:
     command: Sequence[str] = (ollama_bin, "run", model, prompt)
-    completed = subprocess.run(  # noqa: S603
+    process = subprocess.Popen(  # noqa: S603
         command,
-        check=True,
-        capture_output=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
         text=True,
-        timeout=timeout,
     )
-    return completed.stdout.strip()
+    with _Watchdog(process, timeout, cancel) as watchdog:
+        stdout, stderr = process.communicate()
+    if watchdog.cancelled:
+        raise ModelCancelled(f"{model} cancelled")
+    if watchdog.timed_out:
+        raise subprocess.TimeoutExpired(command, timeout, output=stdout)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
+    return stdout.strip()
+
+
+def run_ollama_until_json(
+    ollama_bin: str,
+    model: str,
+    prompt: str,
+    timeout: int,
+    cancel: threading.Event | None = None,
+) -> str:
+    """Stream ``ollama run`` output and stop the process once a JSON object has closed."""
+    command: Sequence[str] = (ollama_bin, "run", model, prompt)
+    process = subprocess.Popen(  # noqa: S603
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    scanner = JSONObjectScanner()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with _Watchdog(process, timeout, cancel) as watchdog:
+        assert process.stdout is not None
+        while True:
+            chunk = process.stdout.read1(4096)
+            if not chunk:
+                break
+            if scanner.feed(decoder.decode(chunk)):
+                process.terminate()
+                break
+        scanner.feed(decoder.decode(b"", final=True))
+        _, stderr = process.communicate()
+    if scanner.complete:
+        return scanner.json_text() or ""
+    if watchdog.cancelled:
+        raise ModelCancelled(f"{model} cancelled")
+    if watchdog.timed_out:
+        raise subprocess.TimeoutExpired(command, timeout, output=scanner.text)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command, scanner.text, stderr)
+    return scanner.text.strip()
+
+
+def _normalize_host(host: Optional[str]) -> Optional[str]:
+    if not host:
+        return None
+    if host.startswith("http://") or host.startswith("https://"):
+        return host
+    return f"http://{host}"
+
+
+class ModelBackend:
+    """What both backends share: one bounded pool for fanning a prompt out to several --llm models."""
+
+    name = "base"
+
+    def __init__(self) -> None:
+        self.fanout_workers = 1
+        self._fanout: ThreadPoolExecutor | None = None
+        self._fanout_lock = threading.Lock()
+
+    def fanout(self) -> ThreadPoolExecutor:
+        with self._fanout_lock:
+            if self._fanout is None:
+                self._fanout = ThreadPoolExecutor(max_workers=self.fanout_workers, thread_name_prefix="structure")
+            return self._fanout
+
+    def close(self) -> None:
+        with self._fanout_lock:
+            if self._fanout is not None:
+                self._fanout.shutdown(wait=True, cancel_futures=True)
+                self._fanout = None
+
+
+class CLIBackend(ModelBackend):
+    """Spawn ``ollama run`` for every request; kept as the dependency-free fallback."""
+
+    name = "cli"
+
+    def __init__(self, ollama_bin: str, timeout: int, stream: bool = False) -> None:
+        super().__init__()
+        self.ollama_bin = ollama_bin
+        self.timeout = timeout
+        self.stream = stream
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        image: Path | bytes | None = None,
+        stop_at_json: bool = False,
+        cancel: threading.Event | None = None,
+    ) -> str:
+        if isinstance(image, bytes):
+            # The CLI only accepts image paths, so spill pre-processed bytes to disk.
+            fd, tmp_name = tempfile.mkstemp(prefix="ocr_", suffix=".jpg")
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(image)
+            try:
+                return self.generate(model, prompt, Path(tmp_name), stop_at_json, cancel)
+            finally:
+                Path(tmp_name).unlink(missing_ok=True)
+        if image is not None:
+            # The CLI picks up image paths embedded in the prompt.
+            prompt = f"{prompt} {image}"
+        if self.stream and stop_at_json:
+            return run_ollama_until_json(self.ollama_bin, model, prompt, self.timeout, cancel)
+        return run_ollama(self.ollama_bin, model, prompt, self.timeout, cancel)
+
+    def last_usage(self) -> Dict[str, int] | None:
+        return None
+
+
+class HTTPBackend(ModelBackend):
+    """Talk to the Ollama API through one pooled ``ollama.Client`` shared by all workers."""
+
+    name = "http"
+
+    def __init__(
+        self,
+        host: Optional[str],
+        timeout: int,
+        keep_alive: str | None,
+        stream: bool = False,
+    ) -> None:
+        super().__init__()
+        self.client = ollama.Client(host=_normalize_host(host), timeout=timeout)
+        self.keep_alive = keep_alive
+        self.stream = stream
+        self.totals: Dict[str, int] = {"requests": 0, "prompt_eval_count": 0, "eval_count": 0}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        image: Path | bytes | None = None,
+        stop_at_json: bool = False,
+        cancel: threading.Event | None = None,
+    ) -> str:
+        if isinstance(image, Path):
+            image = image.read_bytes()
+        images = [image] if image is not None else None
+        # A cancellable request has to stream: closing the stream is what stops Ollama generating.
+        if stop_at_json and (self.stream or cancel is not None):
+            return self._generate_until_json(model, prompt, images, cancel)
+        response = self.client.generate(
+            model=model,
+            prompt=prompt,
+            images=images,
+            keep_alive=self.keep_alive,
+            stream=False,
+        )
+        self._record_usage(response)
+        content = response.get("response")
+        return content.strip() if isinstance(content, str) else ""
+
+    def _generate_until_json(
+        self,
+        model: str,
+        prompt: str,
+        images: List[bytes] | None,
+        cancel: threading.Event | None = None,
+    ) -> str:
+        # Closing the stream drops the HTTP response, which makes Ollama stop generating.
+        chunks = self.client.generate(
+            model=model,
+            prompt=prompt,
+            images=images,
+            keep_alive=self.keep_alive,
+            stream=True,
+        )
+        scanner = JSONObjectScanner()
+        last_chunk: Any = {}
+        try:
+            for chunk in chunks:
+                if cancel is not None and cancel.is_set():
+                    raise ModelCancelled(f"{model} cancelled")
+                last_chunk = chunk
+                if scanner.feed(chunk.get("response") or ""):
+                    break
+        finally:
+            chunks.close()
+        self._record_usage(last_chunk)
+        return scanner.json_text() or scanner.text.strip()
+
+    def _record_usage(self, response: Any) -> None:
+        # Streams cut short never receive the final chunk, so counts may be zero.
+        usage = {
+            "prompt_eval_count": int(response.get("prompt_eval_count") or 0),
+            "eval_count": int(response.get("eval_count") or 0),
+        }
+        self._local.usage = usage
+        with self._lock:
+            self.totals["requests"] += 1
+            for key, value in usage.items():
+                self.totals[key] += value
+
+    def last_usage(self) -> Dict[str, int] | None:
+        """Token counts of the most recent request issued from the calling thread."""
+        return getattr(self._local, "usage", None)
+
+
+def build_backend(args: argparse.Namespace) -> CLIBackend | HTTPBackend:
+    backend_name = args.backend
+    if backend_name == "auto":
+        backend_name = "http" if ollama is not None else "cli"
+    backend: CLIBackend | HTTPBackend
+    if backend_name == "http":
+        if ollama is None:
+            raise SystemExit(
+                "Missing dependency: ollama. Install it with 'pip install ollama' or use --backend cli."
+            )
+        backend = HTTPBackend(args.ollama_host, args.timeout, args.keep_alive, args.stream)
+    else:
+        backend = CLIBackend(args.ollama_bin, args.timeout, args.stream)
+    # Every OCR worker may fan out to all --llm models at once, but never more than that.
+    backend.fanout_workers = max(args.workers, 1) * max(len(args.llm or ()), 1)
+    return backend
 
 
 def extract_json(block: str) -> Dict:
@@ -65,32 +360,527 @@ def extract_json(block: str) -> Dict:
     elif cleaned.startswith("```"):
         cleaned = cleaned.split("```", 1)[1]
         cleaned = cleaned.split("```", 1)[0]
-    start_idx = cleaned.find("{")
-    if start_idx > 0:
-        cleaned = cleaned[start_idx:]
-    return json.loads(cleaned)
+    payload, _ = loads_lenient(cleaned)
+    return payload
+
+
+# Up to three words, stopping before the next "Label:" on the same line ("Nombre: Kim Edad: 23").
+NAME_WORD = r"[^\W\d_](?:[^\W\d_]|['’-])*"
+NAME_LABEL_PATTERN = re.compile(
+    rf"\bnombre\s*:\s*({NAME_WORD}(?:[ \t]+(?!{NAME_WORD}\s*:){NAME_WORD}){{0,2}})",
+    re.IGNORECASE,
+)
+NAME_INTRO_PATTERN = re.compile(
+    r"\b(?:me llamo|mi nombre es|soy)\s+([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+)?)"
+)
+AGE_LABEL_PATTERN = re.compile(r"\bedad\s*:?\s*(\d{2})\b", re.IGNORECASE)
+AGE_YEARS_PATTERN = re.compile(r"\b(\d{2})\s*a[ñn]os\b", re.IGNORECASE)
+LOCATION_PATTERN = re.compile(
+    r"\b(?:zona donde vive|ubicaci[óo]n|zona|vive en)\s*:\s*([^\n]{2,60})",
+    re.IGNORECASE,
+)
+HEIGHT_PATTERN = re.compile(r"\b(?:estatura|altura|mide)\s*:?\s*(\d[.,]\d{2}\s*(?:mts?|m)?)", re.IGNORECASE)
+WEIGHT_PATTERN = re.compile(r"\b(\d{2,3})\s*(?:kg|kilos)\b", re.IGNORECASE)
+HAIR_PATTERN = re.compile(r"\bcabello\s*:\s*([a-záéíóúñ ]{3,30})", re.IGNORECASE)
+EYES_PATTERN = re.compile(r"\bojos\s*:\s*([a-záéíóúñ ]{3,30})", re.IGNORECASE)
+IMPLANTS_PATTERN = re.compile(r"\bimplantes\s*:\s*(s[íi]|no)\b", re.IGNORECASE)
+PHONE_PATTERN = re.compile(r"(?<![\d+])(?:\+?506[\s-]?)?([2-8]\d{3})[\s-]?(\d{4})(?!\d)")
+PRICE_LINE_PATTERN = re.compile(
+    r"(?P<currency>₡|¢|\$|CRC|USD)?\s?(?P<amount>\d{1,3}(?:[.,]\d{3})+|\d+)\s*(?P<mil>mil)?\b",
+    re.IGNORECASE,
+)
+DURATION_PATTERN = re.compile(
+    r"\b(\d+\s*(?:horas?|hrs?|h)\b|\d+\s*min(?:utos)?\b|toda la noche|noche completa|media hora)",
+    re.IGNORECASE,
+)
+HEURISTIC_FIELDS = ("name", "age", "location", "prices", "contact", "attributes")
+
+
+def _parse_price(line: str) -> Tuple[Dict[str, Any], float] | None:
+    duration = DURATION_PATTERN.search(line)
+    for match in PRICE_LINE_PATTERN.finditer(line):
+        if duration and duration.start() <= match.start() < duration.end():
+            continue
+        amount = int(re.sub(r"[.,]", "", match.group("amount")))
+        if match.group("mil"):
+            amount *= 1000
+        marker = (match.group("currency") or "").upper()
+        if not marker and not match.group("mil"):
+            continue
+        currency = "USD" if marker in {"$", "USD"} else "CRC"
+        confidence = 0.9 if duration else 0.6
+        return {
+            "duration": duration.group(1).strip() if duration else None,
+            "amount": amount,
+            "currency": currency,
+        }, confidence
+    return None
+
+
+def heuristic_structure(raw_text: str) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """Regex extraction of the structuring schema with a 0-1 confidence per field.
+
+    Only well-labelled cards reach high confidence; anything ambiguous is left
+    low so the LLM still gets a chance at it.
+    """
+    text = DISCLAIMER_PATTERN.sub("", raw_text)
+    confidence: Dict[str, float] = {field: 0.0 for field in HEURISTIC_FIELDS}
+    structured: Dict[str, Any] = {
+        "name": None,
+        "age": None,
+        "location": None,
+        "prices": [],
+        "services": [],
+        "contact": {"whatsapp": None, "phone": None, "email": None, "social": None},
+        "attributes": {
+            "height": None,
+            "weight": None,
+            "hair_color": None,
+            "eye_color": None,
+            "implants": None,
+            "measurements": None,
+        },
+        "raw_text": None,
+    }
+
+    match = NAME_LABEL_PATTERN.search(text)
+    if match:
+        structured["name"], confidence["name"] = match.group(1).strip(), 0.9
+    else:
+        match = NAME_INTRO_PATTERN.search(text)
+        if match:
+            structured["name"], confidence["name"] = match.group(1).strip(), 0.7
+
+    match = AGE_LABEL_PATTERN.search(text) or AGE_YEARS_PATTERN.search(text)
+    if match and 18 <= int(match.group(1)) <= 70:
+        structured["age"] = int(match.group(1))
+        confidence["age"] = 0.95 if match.re is AGE_LABEL_PATTERN else 0.85
+
+    match = LOCATION_PATTERN.search(text)
+    if match:
+        structured["location"], confidence["location"] = match.group(1).strip(), 0.8
+
+    price_scores: List[float] = []
+    for line in text.splitlines():
+        parsed = _parse_price(line)
+        if parsed:
+            structured["prices"].append(parsed[0])
+            price_scores.append(parsed[1])
+    if price_scores:
+        confidence["prices"] = min(price_scores)
+
+    match = PHONE_PATTERN.search(text)
+    if match:
+        number = f"+506{match.group(1)}{match.group(2)}"
+        key = "whatsapp" if "whatsapp" in text.lower() else "phone"
+        structured["contact"][key] = number
+        confidence["contact"] = 0.8
+
+    attributes = structured["attributes"]
+    for key, pattern in (
+        ("height", HEIGHT_PATTERN),
+        ("weight", WEIGHT_PATTERN),
+        ("hair_color", HAIR_PATTERN),
+        ("eye_color", EYES_PATTERN),
+        ("implants", IMPLANTS_PATTERN),
+    ):
+        match = pattern.search(text)
+        if match:
+            attributes[key] = match.group(1).strip()
+    found = sum(value is not None for value in attributes.values())
+    confidence["attributes"] = round(0.8 * found / len(attributes), 2)
+
+    summary = [part for part in (structured["name"], f"{structured['age']} años" if structured["age"] else None) if part]
+    if structured["location"]:
+        summary.append(f"de {structured['location']}")
+    structured["raw_text"] = ", ".join(summary) or None
+    return structured, confidence
+
+
+def _timed_proposal(
+    backend: CLIBackend | HTTPBackend,
+    model: str,
+    prompt: str,
+    cancel: threading.Event | None = None,
+) -> Tuple[Dict | None, Dict[str, Any]]:
+    started = time.perf_counter()
+    try:
+        proposal = extract_json(backend.generate(model, prompt, stop_at_json=True, cancel=cancel))
+    except Exception as exc:  # noqa: BLE001 - reported per model in the record
+        stats = {"status": "error", "latency_s": round(time.perf_counter() - started, 3), "error": str(exc)}
+        return None, stats
+    return proposal, {"status": "ok", "latency_s": round(time.perf_counter() - started, 3)}
 
 
 def structure_with_models(
     raw_text: str,
-    ollama_bin: str,
+    backend: CLIBackend | HTTPBackend,
     models: List[str],
     coordinator: str | None,
-    timeout: int,
-) -> Dict:
+    model_timeout: float | None = None,
+) -> Tuple[Dict, Dict[str, Any]]:
+    """Fan the structuring prompt out to every model and reconcile what arrives in time.
+
+    Returns the structured payload plus per-model status/latency stats. Requests
+    still running after ``model_timeout`` are cancelled (their stream or
+    process is closed) and reported as timeouts.
+    """
+    prompt = DEFAULT_PROMPT.format(raw_text=raw_text)
+    started = time.perf_counter()
+    stats: Dict[str, Any] = {"models": {}}
     proposals: List[Dict] = []
-    for model in models:
-        prompt = DEFAULT_PROMPT.format(raw_text=raw_text)
-        resp = run_ollama(ollama_bin, model, prompt, timeout)
-        proposals.append(extract_json(resp))
+    # A single model goes through the same pool, so it is cancelled after model_timeout too.
+    cancel = threading.Event()
+    pool = backend.fanout()
+    futures = {pool.submit(_timed_proposal, backend, model, prompt, cancel): model for model in models}
+    _, pending = wait(futures, timeout=model_timeout)
+    cancel.set()
+    for future in pending:
+        future.cancel()
+    for future, model in futures.items():
+        if future in pending:
+            stats["models"][model] = {"status": "timeout", "latency_s": None}
+            continue
+        proposal, model_stats = future.result()
+        stats["models"][model] = model_stats
+        if proposal is not None:
+            proposals.append(proposal)
+    if not proposals:
+        raise RuntimeError(f"No structuring model answered in time: {stats['models']}")
+
     if len(proposals) == 1 or not coordinator:
-        return proposals[0]
+        stats["wall_s"] = round(time.perf_counter() - started, 3)
+        return proposals[0], stats
     consensus_prompt = CONSENSUS_PROMPT.format(
         raw_text=raw_text,
         proposals=json.dumps(proposals, indent=2, ensure_ascii=False),
     )
-    resp = run_ollama(ollama_bin, coordinator, consensus_prompt, timeout)
-    return extract_json(resp)
+    coordinator_started = time.perf_counter()
+    resp = backend.generate(coordinator, consensus_prompt, stop_at_json=True)
+    structured = extract_json(resp)
+    stats["coordinator"] = {
+        "model": coordinator,
+        "proposals": len(proposals),
+        "latency_s": round(time.perf_counter() - coordinator_started, 3),
+    }
+    stats["wall_s"] = round(time.perf_counter() - started, 3)
+    return structured, stats
+
+
+class JobQueue:
+    """Persistent OCR job table with pending/running/done/failed states and retry backoff."""
+
+    STATES = ("pending", "running", "done", "failed")
+
+    def __init__(self, path: Path, max_attempts: int, backoff: float) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "image TEXT PRIMARY KEY, state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "last_error TEXT, next_attempt_at REAL NOT NULL DEFAULT 0, updated_at REAL NOT NULL)"
+            )
+            # Jobs still marked running were interrupted by a crash; they are outstanding again.
+            self.conn.execute("UPDATE jobs SET state = 'pending' WHERE state = 'running'")
+
+    def enqueue(self, images: Sequence[Path], overwrite: bool) -> int:
+        """Register newly discovered images; return how many were added."""
+        now = time.time()
+        with self._lock, self.conn:
+            known = {row[0] for row in self.conn.execute("SELECT image FROM jobs")}
+            rows = []
+            for image in images:
+                if str(image) in known:
+                    continue
+                state = "done" if image.with_suffix(".json").exists() and not overwrite else "pending"
+                rows.append((str(image), state, now))
+            self.conn.executemany(
+                "INSERT INTO jobs (image, state, updated_at) VALUES (?, ?, ?)",
+                rows,
+            )
+            if overwrite:
+                self.conn.executemany(
+                    "UPDATE jobs SET state = 'pending', attempts = 0, next_attempt_at = 0 WHERE image = ?",
+                    [(str(image),) for image in images],
+                )
+        return len(rows)
+
+    def outstanding(self, failed_only: bool = False) -> List[Path]:
+        """Pending jobs plus failed jobs whose backoff has elapsed.
+
+        With ``failed_only`` every failed job is returned regardless of backoff
+        or attempt limits.
+        """
+        with self._lock:
+            if failed_only:
+                rows = self.conn.execute("SELECT image FROM jobs WHERE state = 'failed' ORDER BY image")
+            else:
+                rows = self.conn.execute(
+                    "SELECT image FROM jobs WHERE state = 'pending' "
+                    "OR (state = 'failed' AND attempts < ? AND next_attempt_at <= ?) ORDER BY image",
+                    (self.max_attempts, time.time()),
+                )
+            return [Path(row[0]) for row in rows.fetchall()]
+
+    def start(self, image: Path) -> None:
+        self._set(image, "UPDATE jobs SET state = 'running', updated_at = ? WHERE image = ?")
+
+    def finish(self, image: Path) -> None:
+        self._set(image, "UPDATE jobs SET state = 'done', last_error = NULL, updated_at = ? WHERE image = ?")
+
+    def fail(self, image: Path, error: str) -> None:
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT attempts FROM jobs WHERE image = ?", (str(image),)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            self.conn.execute(
+                "UPDATE jobs SET state = 'failed', attempts = ?, last_error = ?, next_attempt_at = ?, "
+                "updated_at = ? WHERE image = ?",
+                (attempts, error, now + self.backoff * 2 ** (attempts - 1), now, str(image)),
+            )
+
+    def _set(self, image: Path, statement: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(statement, (time.time(), str(image)))
+
+    def track(self, image: Path, task: Callable[[], None]) -> Callable[[], None]:
+        """Wrap ``task`` so its outcome is recorded; errors still propagate to the caller."""
+
+        def _tracked() -> None:
+            self.start(image)
+            try:
+                task()
+            except Exception as exc:
+                self.fail(image, f"{type(exc).__name__}: {exc}")
+                raise
+            self.finish(image)
+
+        return _tracked
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            exhausted = self.conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state = 'failed' AND attempts >= ?",
+                (self.max_attempts,),
+            ).fetchone()[0]
+            failures = self.conn.execute(
+                "SELECT image, attempts, last_error, next_attempt_at FROM jobs "
+                "WHERE state = 'failed' ORDER BY updated_at DESC LIMIT 20"
+            ).fetchall()
+        return {
+            "counts": {state: counts.get(state, 0) for state in self.STATES},
+            "exhausted": exhausted,
+            "recent_failures": [
+                {"image": image, "attempts": attempts, "last_error": error, "next_attempt_at": due}
+                for image, attempts, error, due in failures
+            ],
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+
+def print_job_status(queue: JobQueue) -> None:
+    status = queue.status()
+    counts = status["counts"]
+    total = sum(counts.values())
+    print(f"Job queue {queue.path}: {total} jobs")
+    for state in JobQueue.STATES:
+        print(f"  {state:<8} {counts[state]}")
+    if status["exhausted"]:
+        print(f"  {status['exhausted']} failed job(s) reached --max-attempts; use --retry-failed to force a retry.")
+    now = time.time()
+    for failure in status["recent_failures"]:
+        wait_s = max(0, int(failure["next_attempt_at"] - now))
+        print(f"  - {failure['image']} (attempts: {failure['attempts']}, retry in {wait_s}s): {failure['last_error']}")
+
+
+def parse_box(value: str) -> Tuple[float, float, float, float]:
+    """Parse ``left,top,right,bottom`` given as fractions of the image size."""
+    try:
+        left, top, right, bottom = (float(part) for part in value.split(","))
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"Expected left,top,right,bottom fractions, got {value!r}") from exc
+    if not (0 <= left < right <= 1 and 0 <= top < bottom <= 1):
+        raise argparse.ArgumentTypeError(f"Box fractions must satisfy 0 <= left < right <= 1 and 0 <= top < bottom <= 1: {value!r}")
+    return left, top, right, bottom
+
+
+class ImagePreprocessor:
+    """Crop phone chrome, mask boilerplate and downscale screenshots before OCR."""
+
+    def __init__(
+        self,
+        crop_top: float,
+        crop_bottom: float,
+        max_side: int,
+        masks: Sequence[Tuple[float, float, float, float]],
+        quality: int,
+    ) -> None:
+        if Image is None:
+            raise SystemExit("Missing dependency: Pillow. Install it with 'pip install pillow' to use --preprocess.")
+        if crop_top + crop_bottom >= 1:
+            raise SystemExit("--crop-top plus --crop-bottom must leave part of the image.")
+        self.crop_top = crop_top
+        self.crop_bottom = crop_bottom
+        self.max_side = max_side
+        self.masks = list(masks)
+        self.quality = quality
+        self.totals = {"images": 0, "bytes_in": 0, "bytes_out": 0, "pixels_in": 0, "pixels_out": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def signature(self) -> str:
+        """Stable description of the settings, used to key cached OCR results."""
+        masks = ";".join(",".join(f"{v:g}" for v in box) for box in self.masks)
+        return (
+            f"crop={self.crop_top:g},{self.crop_bottom:g}|max={self.max_side}"
+            f"|masks={masks}|q={self.quality}"
+        )
+
+    def process(self, image_path: Path) -> Tuple[bytes, Dict[str, int]]:
+        bytes_in = image_path.stat().st_size
+        with Image.open(image_path) as source:
+            img = ImageOps.exif_transpose(source).convert("RGB")
+        width, height = img.size
+        if self.masks:
+            draw = ImageDraw.Draw(img)
+            for left, top, right, bottom in self.masks:
+                draw.rectangle(
+                    (int(left * width), int(top * height), int(right * width), int(bottom * height)),
+                    fill="white",
+                )
+        img = img.crop((0, int(height * self.crop_top), width, height - int(height * self.crop_bottom)))
+        if max(img.size) > self.max_side:
+            img.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=self.quality, optimize=True)
+        data = buffer.getvalue()
+        stats = {
+            "bytes_in": bytes_in,
+            "bytes_out": len(data),
+            "pixels_in": width * height,
+            "pixels_out": img.size[0] * img.size[1],
+        }
+        with self._lock:
+            self.totals["images"] += 1
+            for key, value in stats.items():
+                self.totals[key] += value
+        return data, stats
+
+    def summary(self) -> str:
+        totals = self.totals
+
+        def _pct(before: int, after: int) -> str:
+            return f"{100 * (1 - after / before):.1f}%" if before else "n/a"
+
+        return (
+            f"Pre-processed {totals['images']} images: "
+            f"{totals['bytes_in']} -> {totals['bytes_out']} bytes (-{_pct(totals['bytes_in'], totals['bytes_out'])}), "
+            f"{totals['pixels_in']} -> {totals['pixels_out']} pixels (-{_pct(totals['pixels_in'], totals['pixels_out'])})"
+        )
+
+
+def _cache_key(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class OCRCache:
+    """SQLite store of OCR text and structured payloads keyed by image content hash.
+
+    A single connection is shared by all workers and guarded by a lock; duplicate
+    images processed at the same time wait on a per-key lock so only one of them
+    reaches the model.
+    """
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(str(path), check_same_thread=False)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        with self._lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS ocr ("
+                "key TEXT PRIMARY KEY, image_sha256 TEXT NOT NULL, model TEXT NOT NULL, "
+                "raw_text TEXT NOT NULL, source TEXT, created_at REAL NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS structured ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS dhash ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def ocr_key(image_sha256: str, model: str, prompt: str) -> str:
+        return _cache_key("ocr", image_sha256, model, prompt)
+
+    @staticmethod
+    def structured_key(raw_text: str, models: Sequence[str], coordinator: str | None) -> str:
+        return _cache_key("structured", raw_text, ",".join(models), coordinator or "", DEFAULT_PROMPT)
+
+    @contextmanager
+    def key_lock(self, key: str) -> Iterator[None]:
+        with self._lock:
+            lock = self._key_locks.setdefault(key, threading.Lock())
+        with lock:
+            yield
+
+    def get_ocr(self, key: str) -> Tuple[str, str | None] | None:
+        with self._lock:
+            row = self.conn.execute("SELECT raw_text, source FROM ocr WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0], row[1]
+
+    def put_ocr(self, key: str, image_sha256: str, model: str, raw_text: str, source: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO ocr VALUES (?, ?, ?, ?, ?, ?)",
+                (key, image_sha256, model, raw_text, source, time.time()),
+            )
+
+    def get_structured(self, key: str) -> Dict | None:
+        with self._lock:
+            row = self.conn.execute("SELECT payload FROM structured WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_structured(self, key: str, payload: Dict) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO structured VALUES (?, ?, ?)",
+                (key, json.dumps(payload, ensure_ascii=False), time.time()),
+            )
+
+    def get_dhash(self, image_sha256: str, hash_size: int) -> int | None:
+        key = _cache_key("dhash", image_sha256, str(hash_size))
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM dhash WHERE key = ?", (key,)).fetchone()
+        # Stored as hex: a 64-bit hash does not fit SQLite's signed integers.
+        return int(row[0], 16) if row else None
+
+    def put_dhash(self, image_sha256: str, hash_size: int, value: int) -> None:
+        key = _cache_key("dhash", image_sha256, str(hash_size))
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO dhash VALUES (?, ?, ?)", (key, f"{value:x}", time.time()))
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
 
 
 def discover_images(root: Path) -> List[Path]:
@@ -100,30 +890,243 @@ def discover_images(root: Path) -> List[Path]:
     return sorted(p for p in root.rglob("Screenshot_*.jpg") if p.is_file())
 
 
+def dhash(image_path: Path, hash_size: int) -> int:
+    """Difference hash: one bit per horizontally adjacent pixel pair of a tiny grayscale copy."""
+    with Image.open(image_path) as source:
+        small = source.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def cluster_near_duplicates(
+    images: Sequence[Path],
+    threshold: int,
+    hash_size: int,
+    workers: int = 1,
+    cache: OCRCache | None = None,
+) -> List[Dict[str, Any]]:
+    """Group screenshots of the same folder whose dHashes differ by at most ``threshold`` bits.
+
+    The first image (in sorted order) of each cluster is its representative;
+    every cluster, including singletons, is returned so callers can schedule
+    representatives first. With a ``cache`` each image is decoded and hashed
+    only the first time its content is seen.
+    """
+    if Image is None:
+        raise SystemExit("Missing dependency: Pillow. Install it with 'pip install pillow' to use --near-dup-threshold.")
+
+    def image_hash(path: Path) -> int:
+        if cache is None:
+            return dhash(path, hash_size)
+        content = file_digest(path)
+        value = cache.get_dhash(content, hash_size)
+        if value is None:
+            value = dhash(path, hash_size)
+            cache.put_dhash(content, hash_size, value)
+        return value
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        hashes = dict(zip(images, executor.map(image_hash, images)))
+
+    by_folder: Dict[Path, List[Path]] = {}
+    for image in images:
+        by_folder.setdefault(image.parent, []).append(image)
+
+    clusters: List[Dict[str, Any]] = []
+    for folder in sorted(by_folder):
+        folder_clusters: List[Dict[str, Any]] = []
+        for image in sorted(by_folder[folder]):
+            image_hash = hashes[image]
+            for cluster in folder_clusters:
+                distance = bin(image_hash ^ cluster["_hash"]).count("1")
+                if distance <= threshold:
+                    cluster["duplicates"].append({"image": image, "distance": distance})
+                    break
+            else:
+                folder_clusters.append(
+                    {"representative": image, "_hash": image_hash, "duplicates": []}
+                )
+        clusters.extend(folder_clusters)
+    for cluster in clusters:
+        cluster["hash"] = f"{cluster.pop('_hash'):0{hash_size * hash_size // 4}x}"
+    return clusters
+
+
+def write_near_duplicate_report(clusters: Sequence[Dict[str, Any]], target: Path, threshold: int) -> None:
+    grouped = [cluster for cluster in clusters if cluster["duplicates"]]
+    payload = {
+        "threshold": threshold,
+        "clusters": len(grouped),
+        "skipped_images": sum(len(cluster["duplicates"]) for cluster in grouped),
+        "groups": [
+            {
+                "representative": str(cluster["representative"]),
+                "hash": cluster["hash"],
+                "duplicates": [
+                    {"image": str(dup["image"]), "distance": dup["distance"]}
+                    for dup in cluster["duplicates"]
+                ],
+            }
+            for cluster in grouped
+        ],
+    }
+    target.parent.mkdir(parents=True, exist_ok=True)
+    save_json(target, payload, 2)
+
+
 def save_json(target: Path, payload: Dict, indent: int) -> None:
-    target.write_text(json.dumps(payload, indent=indent, ensure_ascii=False))
+    """Write ``payload`` atomically so concurrent workers never leave partial sidecars."""
+    atomic_write_text(target, json.dumps(payload, indent=indent, ensure_ascii=False))
+
+
+class RecordSink:
+    """Collect sidecar records keyed by their ``.json`` path.
+
+    With ``write`` set every record is also saved next to its screenshot as soon
+    as it is produced; ``--keep-sidecars-in-memory`` runs turn it off and hand
+    ``records`` straight to the metadata stage. ``run_ocr`` still flushes what
+    finished if the run is interrupted, so no OCR work is lost.
+    """
+
+    def __init__(self, indent: int, write: bool = True) -> None:
+        self.indent = indent
+        self.write = write
+        self.records: Dict[Path, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, target: Path) -> Dict[str, Any] | None:
+        with self._lock:
+            record = self.records.get(target)
+        if record is not None:
+            return dict(record)
+        if target.exists():
+            return json.loads(target.read_text())
+        return None
+
+    def records_in(self, folder: Path) -> Dict[Path, Dict[str, Any]]:
+        """Return the records produced so far for sidecars directly inside ``folder``."""
+        with self._lock:
+            return {path: record for path, record in self.records.items() if path.parent == folder}
+
+    def put(self, target: Path, record: Dict[str, Any], note: str = "") -> None:
+        with self._lock:
+            self.records[target] = record
+        if self.write:
+            save_json(target, record, self.indent)
+            print(f"Wrote {target}{note}")
+
+    def flush(self) -> int:
+        """Save records held only in memory; returns how many were written."""
+        if self.write:
+            return 0
+        with self._lock:
+            records = dict(self.records)
+        for target, record in records.items():
+            save_json(target, record, self.indent)
+        return len(records)
+
+
+def recognize_text(
+    image_path: Path,
+    args: argparse.Namespace,
+    backend: CLIBackend | HTTPBackend,
+    cache: OCRCache | None,
+    preprocessor: ImagePreprocessor | None = None,
+) -> Tuple[str, Dict[str, Any], str | None]:
+    """Return OCR text, per-image stats and, on a cache hit, the image that produced it."""
+    stats: Dict[str, Any] = {}
+
+    def _ocr() -> str:
+        image: Path | bytes = image_path
+        if preprocessor is not None:
+            image, stats["preprocess"] = preprocessor.process(image_path)
+        raw = backend.generate(args.ocr_model, OCR_PROMPT, image=image)
+        usage = backend.last_usage()
+        if usage:
+            stats["ocr_usage"] = usage
+        return raw
+
+    if cache is None:
+        return _ocr(), stats, None
+    image_sha256 = file_digest(image_path)
+    prompt_key = OCR_PROMPT if preprocessor is None else f"{OCR_PROMPT}|{preprocessor.signature}"
+    key = cache.ocr_key(image_sha256, args.ocr_model, prompt_key)
+    with cache.key_lock(key):
+        hit = cache.get_ocr(key)
+        if hit is not None:
+            return hit[0], stats, hit[1]
+        raw_text = _ocr()
+        cache.put_ocr(key, image_sha256, args.ocr_model, raw_text, str(image_path))
+    return raw_text, stats, None
+
+
+def structure_text(
+    raw_text: str,
+    args: argparse.Namespace,
+    backend: CLIBackend | HTTPBackend,
+    cache: OCRCache | None,
+) -> Tuple[Dict | None, Dict[str, Any] | None]:
+    """Return the structured payload and stats describing how it was produced.
+
+    With ``--fast-path`` the regex extractor runs first and the LLMs are only
+    called when a required field is missing or below ``--min-confidence``.
+    """
+    fast_stats: Dict[str, Any] | None = None
+    if args.fast_path:
+        heuristic, confidence = heuristic_structure(raw_text)
+        weak = [field for field in args.required_fields if confidence.get(field, 0.0) < args.min_confidence]
+        fast_stats = {"field_confidence": confidence, "weak_fields": weak}
+        if not weak or not args.llm:
+            return heuristic, {"structured_by": "heuristic", **fast_stats}
+    if not args.llm:
+        return None, None
+    structured, stats = _structure_with_llm(raw_text, args, backend, cache)
+    stats = {"structured_by": "llm", **(fast_stats or {}), **(stats or {})}
+    return structured, stats
+
+
+def _structure_with_llm(
+    raw_text: str,
+    args: argparse.Namespace,
+    backend: CLIBackend | HTTPBackend,
+    cache: OCRCache | None,
+) -> Tuple[Dict, Dict[str, Any] | None]:
+    model_timeout = args.llm_timeout or args.timeout
+    if cache is None:
+        return structure_with_models(raw_text, backend, args.llm, args.coordinator, model_timeout)
+    key = cache.structured_key(raw_text, args.llm, args.coordinator)
+    stats = None
+    with cache.key_lock(key):
+        structured = cache.get_structured(key)
+        if structured is None:
+            structured, stats = structure_with_models(
+                raw_text, backend, args.llm, args.coordinator, model_timeout
+            )
+            # A reconciliation missing some proposals is kept for this record only, so a later run retries it.
+            if all(model["status"] == "ok" for model in stats["models"].values()):
+                cache.put_structured(key, structured)
+    return structured, stats
 
 
 def process_image(
     image_path: Path,
     args: argparse.Namespace,
+    backend: CLIBackend | HTTPBackend,
+    cache: OCRCache | None = None,
+    preprocessor: ImagePreprocessor | None = None,
+    sink: RecordSink | None = None,
 ) -> None:
     target = image_path.with_suffix(".json")
     if target.exists() and not args.overwrite:
         return
 
-    prompt = f"Text Recognition: {image_path}"
-    raw_text = run_ollama(args.ollama_bin, args.ocr_model, prompt, args.timeout)
-
-    structured = None
-    if args.llm:
-        structured = structure_with_models(
-            raw_text,
-            args.ollama_bin,
-            args.llm,
-            args.coordinator,
-            args.timeout,
-        )
+    raw_text, ocr_stats, cache_source = recognize_text(image_path, args, backend, cache, preprocessor)
+    structured, structuring_stats = structure_text(raw_text, args, backend, cache)
     cleaned_text = DISCLAIMER_PATTERN.sub("", raw_text).strip().replace("€", "₡")
 
     image_str = str(image_path)
@@ -134,22 +1137,67 @@ def process_image(
         "raw_response": cleaned_text,
         "structured_data": structured,
     }
-    save_json(target, record, args.indent)
-    print(f"Wrote {target}")
+    record.update(ocr_stats)
+    if cache_source:
+        record["ocr_cache_source"] = cache_source
+    if structuring_stats:
+        record["structured_by"] = structuring_stats.pop("structured_by")
+        if structuring_stats:
+            record["structuring"] = structuring_stats
+    (sink or RecordSink(args.indent)).put(target, record)
+
+
+def process_near_duplicate(
+    image_path: Path,
+    representative: Path,
+    distance: int,
+    args: argparse.Namespace,
+    backend: CLIBackend | HTTPBackend,
+    cache: OCRCache | None = None,
+    preprocessor: ImagePreprocessor | None = None,
+    sink: RecordSink | None = None,
+) -> None:
+    """Reuse the representative's sidecar; fall back to real OCR if it has none."""
+    target = image_path.with_suffix(".json")
+    if target.exists() and not args.overwrite:
+        return
+    sink = sink or RecordSink(args.indent)
+    record = sink.get(representative.with_suffix(".json"))
+    if record is None:
+        process_image(image_path, args, backend, cache, preprocessor, sink)
+        return
+    image_str = str(image_path)
+    record["ocr"] = image_str
+    record["image"] = image_str
+    record["near_duplicate_of"] = str(representative)
+    record["phash_distance"] = distance
+    for key in ("ocr_usage", "structuring", "preprocess"):
+        record.pop(key, None)
+    sink.put(target, record, f" (near-duplicate of {representative.name})")
 
 
 APP_ROOT = Path(__file__).resolve().parent
 DEFAULT_ROOT = APP_ROOT / "PATRON"
+DEFAULT_CACHE_DB = APP_ROOT / "ocr_cache.sqlite3"
+DEFAULT_NEAR_DUP_REPORT = APP_ROOT / "near_duplicates.json"
+DEFAULT_JOBS_DB = APP_ROOT / "ocr_jobs.sqlite3"
 DISCLAIMER_PATTERN = re.compile(
     r"INFORMACIÓN EMANADA DIRECTAMENTE[\s\S]*?CLUB PATR[ÓO]N[\s\S]*?se limita a proporcionarle el contacto\.\s*",
     re.IGNORECASE,
 )
 
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Generate OCR JSON files for Screenshot_*.jpg using Ollama.",
     )
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=("run", "status"),
+        default="run",
+        help="'run' processes screenshots (default); 'status' summarises the --jobs-db queue and exits.",
+    )
     parser.add_argument(
         "--root",
         type=Path,
@@ -161,6 +1209,21 @@ def parse_args() -> argparse.Namespace:
         default="ollama",
         help="Path to the Ollama binary (default: ollama).",
     )
+    parser.add_argument(
+        "--backend",
+        choices=("auto", "http", "cli"),
+        default="auto",
+        help="How to reach Ollama: pooled HTTP client, 'ollama run' subprocesses, or HTTP when available (default: auto).",
+    )
+    parser.add_argument(
+        "--ollama-host",
+        help="Ollama API host for the HTTP backend (default: OLLAMA_HOST or http://127.0.0.1:11434).",
+    )
+    parser.add_argument(
+        "--keep-alive",
+        default="30m",
+        help="How long the HTTP backend asks Ollama to keep models loaded (default: 30m).",
+    )
     parser.add_argument(
         "--ocr-model",
         default="glm-ocr",
@@ -175,12 +1238,35 @@ def parse_args() -> argparse.Namespace:
         "--coordinator",
         help="LLM responsible for building consensus when multiple --llm values are provided.",
     )
+    parser.add_argument(
+        "--fast-path",
+        action="store_true",
+        help="Try a regex extractor first and only call --llm models when required fields are missing or weak.",
+    )
+    parser.add_argument(
+        "--required-fields",
+        type=lambda value: [field.strip() for field in value.split(",") if field.strip()],
+        default=["name", "age", "prices"],
+        help=f"Comma-separated fields the fast path must fill confidently (default: name,age,prices; "
+        f"choices: {','.join(HEURISTIC_FIELDS)}).",
+    )
+    parser.add_argument(
+        "--min-confidence",
+        type=float,
+        default=0.8,
+        help="Minimum fast-path confidence (0-1) for a required field to skip the LLM (default: 0.8).",
+    )
     parser.add_argument(
         "--timeout",
         type=int,
         default=300,
         help="Timeout (seconds) for each Ollama invocation.",
     )
+    parser.add_argument(
+        "--llm-timeout",
+        type=float,
+        help="Seconds to wait for concurrent --llm proposals before running the coordinator (default: --timeout).",
+    )
     parser.add_argument(
         "--indent",
         type=int,
@@ -192,11 +1278,108 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Overwrite existing Screenshot_*.json files (default: skip already processed images).",
     )
-    return parser.parse_args()
-
-
-def main() -> None:
-    args = parse_args()
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream structuring responses and stop generation once a complete JSON object has closed.",
+    )
+    parser.add_argument(
+        "--preprocess",
+        action="store_true",
+        help="Crop UI chrome, mask boilerplate and downscale screenshots before OCR (requires Pillow).",
+    )
+    parser.add_argument(
+        "--crop-top",
+        type=float,
+        default=0.04,
+        help="Fraction of the image height removed from the top (status bar) when pre-processing (default: 0.04).",
+    )
+    parser.add_argument(
+        "--crop-bottom",
+        type=float,
+        default=0.06,
+        help="Fraction of the image height removed from the bottom (navigation bar) when pre-processing (default: 0.06).",
+    )
+    parser.add_argument(
+        "--max-side",
+        type=int,
+        default=1600,
+        help="Downscale pre-processed images so the longest side is at most this many pixels (default: 1600).",
+    )
+    parser.add_argument(
+        "--mask",
+        type=parse_box,
+        action="append",
+        default=[],
+        help="Blank out a boilerplate region given as left,top,right,bottom fractions. Repeat for more regions.",
+    )
+    parser.add_argument(
+        "--jpeg-quality",
+        type=int,
+        default=85,
+        help="JPEG quality of pre-processed images (default: 85).",
+    )
+    parser.add_argument(
+        "--near-dup-threshold",
+        type=int,
+        help="Reuse OCR results for screenshots in the same folder whose perceptual hash differs "
+        "by at most this many bits (requires Pillow; disabled by default).",
+    )
+    parser.add_argument(
+        "--hash-size",
+        type=int,
+        default=16,
+        help="Perceptual hash grid size; the hash has hash_size^2 bits (default: 16).",
+    )
+    parser.add_argument(
+        "--near-dup-report",
+        type=Path,
+        default=DEFAULT_NEAR_DUP_REPORT,
+        help=f"Where to write the near-duplicate cluster report (default: {DEFAULT_NEAR_DUP_REPORT}).",
+    )
+    parser.add_argument(
+        "--cache-db",
+        type=Path,
+        default=DEFAULT_CACHE_DB,
+        help=f"SQLite file caching OCR results by image content hash (default: {DEFAULT_CACHE_DB}).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always call the OCR model, ignoring and not updating the result cache.",
+    )
+    parser.add_argument(
+        "--jobs-db",
+        type=Path,
+        nargs="?",
+        const=DEFAULT_JOBS_DB,
+        help=f"Track every image in a persistent SQLite job queue with retries (default path when given "
+        f"without a value: {DEFAULT_JOBS_DB}).",
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="With --jobs-db, skip discovery and retry only failed jobs, ignoring backoff and attempt limits.",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=5,
+        help="Failed jobs are retried automatically until they reach this many attempts (default: 5).",
+    )
+    parser.add_argument(
+        "--retry-backoff",
+        type=float,
+        default=60.0,
+        help="Base delay in seconds before retrying a failed job; doubles on every attempt (default: 60).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of images processed concurrently (default: 1, sequential).",
+    )
+    args = parser.parse_args(argv)
     if args.llm and len(args.llm) > 1 and not args.coordinator:
         raise SystemExit("--coordinator is required when multiple --llm values are provided.")
     llms: List[str] = []
@@ -205,20 +1388,188 @@ def main() -> None:
             parts = [p.strip() for p in entry.split(",") if p.strip()]
             llms.extend(parts)
     args.llm = llms
+    unknown_fields = sorted(set(args.required_fields) - set(HEURISTIC_FIELDS))
+    if unknown_fields:
+        raise SystemExit(f"Unknown --required-fields: {', '.join(unknown_fields)}")
+    return args
 
-    images = discover_images(args.root)
+
+def main() -> None:
+    args = parse_args()
+
+    if args.command == "status":
+        jobs_db = args.jobs_db or DEFAULT_JOBS_DB
+        if not jobs_db.exists():
+            raise SystemExit(f"Job queue not found: {jobs_db}")
+        queue = JobQueue(jobs_db, args.max_attempts, args.retry_backoff)
+        print_job_status(queue)
+        queue.close()
+        return
+    run_ocr(args)
+
+
+def run_ocr(
+    args: argparse.Namespace,
+    sink: RecordSink | None = None,
+    on_scheduled: Callable[[Sequence[Path]], None] | None = None,
+    on_done: Callable[[Path, float], None] | None = None,
+    images: Sequence[Path] | None = None,
+) -> RecordSink:
+    """Run the OCR stage for ``args``; new records land in ``sink`` (written to disk by default).
+
+    ``on_scheduled`` receives every image that will be worked on before the
+    first one starts, and ``on_done`` is called with the image and its elapsed
+    seconds as each finishes (even when it failed or was skipped), so callers
+    can tell when a folder is complete. ``images`` restricts the run to those
+    screenshots instead of discovering everything under ``args.root``.
+    """
+    sink = sink or RecordSink(args.indent)
+    if args.retry_failed and not args.jobs_db:
+        raise SystemExit("--retry-failed requires --jobs-db.")
+    if args.workers < 1:
+        raise SystemExit("--workers must be at least 1.")
+
+    queue = JobQueue(args.jobs_db, args.max_attempts, args.retry_backoff) if args.jobs_db else None
+    if queue is not None and args.retry_failed:
+        images = queue.outstanding(failed_only=True)
+        print(f"Retrying {len(images)} failed jobs from {queue.path}")
+    else:
+        selected = images is not None
+        if selected:
+            images = sorted(images)
+            print(f"Processing {len(images)} selected images")
+        else:
+            images = discover_images(args.root)
+            if not images:
+                raise SystemExit(f"No Screenshot_*.jpg files found under {args.root}")
+            print(f"Found {len(images)} images under {args.root}")
+        if queue is not None and images:
+            added = queue.enqueue(images, args.overwrite)
+            outstanding = queue.outstanding()
+            if selected:
+                wanted = set(images)
+                outstanding = [image for image in outstanding if image in wanted]
+            images = outstanding
+            print(f"Job queue {queue.path}: {added} new, {len(images)} outstanding")
     if not images:
-        raise SystemExit(f"No Screenshot_*.jpg files found under {args.root}")
-    print(f"Found {len(images)} images under {args.root}")
+        if queue is not None:
+            queue.close()
+        return sink
+    backend = build_backend(args)
+    cache = None if args.no_cache else OCRCache(args.cache_db)
+    preprocessor = None
+    if args.preprocess:
+        preprocessor = ImagePreprocessor(
+            args.crop_top,
+            args.crop_bottom,
+            args.max_side,
+            args.mask,
+            args.jpeg_quality,
+        )
+
+    duplicates: List[Tuple[Path, Path, int]] = []
+    if args.near_dup_threshold is not None:
+        # Only folders with screenshots still lacking a sidecar are clustered; their finished
+        # screenshots stay in so a new duplicate can still reuse an existing sidecar.
+        pending_folders = {image.parent for image in images if args.overwrite or not image.with_suffix(".json").exists()}
+        finished = [image for image in images if image.parent not in pending_folders]
+        clustered = [image for image in images if image.parent in pending_folders]
+        clusters = cluster_near_duplicates(clustered, args.near_dup_threshold, args.hash_size, args.workers, cache)
+        write_near_duplicate_report(clusters, args.near_dup_report, args.near_dup_threshold)
+        images = sorted(finished + [cluster["representative"] for cluster in clusters])
+        duplicates = [
+            (dup["image"], cluster["representative"], dup["distance"])
+            for cluster in clusters
+            for dup in cluster["duplicates"]
+        ]
+        print(
+            f"Near-duplicate index: {len(clusters)} representatives, {len(duplicates)} duplicates, "
+            f"{len(finished)} in finished folders "
+            f"(report: {args.near_dup_report})"
+        )
+
+    tasks: List[Callable[[], None]] = [
+        lambda image=image: process_image(image, args, backend, cache, preprocessor, sink) for image in images
+    ]
+    duplicate_tasks: List[Callable[[], None]] = [
+        lambda dup=dup: process_near_duplicate(*dup, args, backend, cache, preprocessor, sink)
+        for dup in duplicates
+    ]
+    duplicate_images = [dup[0] for dup in duplicates]
+    if queue is not None:
+        tasks = [queue.track(image, task) for image, task in zip(images, tasks)]
+        duplicate_tasks = [queue.track(image, task) for image, task in zip(duplicate_images, duplicate_tasks)]
+    if on_scheduled is not None:
+        on_scheduled(list(images) + duplicate_images)
+    if on_done is not None:
+        tasks = [_notify_after(task, image, on_done) for image, task in zip(images, tasks)]
+        duplicate_tasks = [
+            _notify_after(task, image, on_done) for image, task in zip(duplicate_images, duplicate_tasks)
+        ]
+
+    try:
+        _run_pool(tasks, images, args.workers, "Processing")
+        if duplicates:
+            _run_pool(duplicate_tasks, duplicate_images, args.workers, "Near-duplicates")
+    except BaseException:
+        flushed = sink.flush()
+        if flushed:
+            print(f"Interrupted: saved {flushed} finished sidecars")
+        raise
+
+    if isinstance(backend, HTTPBackend):
+        totals = backend.totals
+        print(
+            f"Ollama HTTP requests: {totals['requests']} "
+            f"(prompt tokens: {totals['prompt_eval_count']}, generated tokens: {totals['eval_count']})"
+        )
+    backend.close()
+    if preprocessor is not None:
+        print(preprocessor.summary())
+    if cache is not None:
+        print(f"OCR cache {cache.path}: {cache.hits} hits, {cache.misses} misses")
+        cache.close()
+    if queue is not None:
+        print_job_status(queue)
+        queue.close()
+    return sink
+
 
-    progress = tqdm(images, desc="Processing", unit="img")
-    for image in progress:
+def _notify_after(
+    task: Callable[[], None],
+    image: Path,
+    on_done: Callable[[Path, float], None],
+) -> Callable[[], None]:
+    def run() -> None:
+        started = time.perf_counter()
         try:
-            process_image(image, args)
-        except subprocess.CalledProcessError as exc:
-            print(f"Failed on {image}: {exc}")
-        except Exception as exc:  # noqa: BLE001
-            print(f"Unexpected error for {image}: {exc}")
+            task()
+        finally:
+            on_done(image, time.perf_counter() - started)
+
+    return run
+
+
+def _run_pool(tasks: Sequence[Callable[[], None]], images: Sequence[Path], workers: int, desc: str) -> None:
+    if workers == 1:
+        for task, image in tqdm(list(zip(tasks, images)), desc=desc, unit="img"):
+            _run_one(task, image)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_one, task, image) for task, image in zip(tasks, images)]
+        with tqdm(total=len(futures), desc=desc, unit="img") as progress:
+            for future in as_completed(futures):
+                future.result()
+                progress.update(1)
+
+
+def _run_one(task: Callable[[], None], image: Path) -> None:
+    try:
+        task()
+    except BACKEND_ERRORS as exc:
+        print(f"Failed on {image}: {exc}")
+    except Exception as exc:  # noqa: BLE001
+        print(f"Unexpected error for {image}: {exc}")
 
 
 if __name__ == "__main__":
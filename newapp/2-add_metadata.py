@@ -3,21 +3,16 @@
 
 from __future__ import annotations
 
+import argparse
 import json
-import re
 from pathlib import Path
-from typing import Dict, List
+from typing import Any, Dict, List, Sequence
+
+from atomic_io import write_if_changed
+from folder_labels import default_index
 
 APP_ROOT = Path(__file__).resolve().parent
 PATRON_ROOT = APP_ROOT / "PATRON"
-EMOJI_PATTERN = re.compile(
-    r"[\u2600-\u27BF\u2B50\u231A-\u231B\u23E9-\u23EC\u23F0\u23F3\u25FD-\u25FE"
-    r"\U0001F004\U0001F0CF\U0001F170-\U0001F251\U0001F300-\U0001FAD6"
-    r"\U0001F680-\U0001F6FF\U0001F900-\U0001F9FF\U0001FA70-\U0001FAFF]+",
-    flags=re.UNICODE,
-)
-DIGIT_PATTERN = re.compile(r"\d+")
-PAREN_CONTENT_PATTERN = re.compile(r"\(([^()]+)\)")
 
 
 def discover_json_files(root: Path) -> List[Path]:
@@ -27,64 +22,31 @@ def discover_json_files(root: Path) -> List[Path]:
     return sorted(root.rglob("Screenshot_*.json"))
 
 
-def _prefer_parenthetical(text: str) -> str:
-    """Return the inner text of the first parentheses if available."""
-    match = PAREN_CONTENT_PATTERN.search(text)
-    if match:
-        inner = match.group(1).strip()
-        if inner:
-            return inner
-    return text.strip()
-
-
-def _strip_prefix(folder: str) -> str:
-    parts = folder.split("-", 1)
-    base = parts[1].strip() if len(parts) == 2 else folder
-    return _prefer_parenthetical(base)
-
-
-def _separate_emojis(text: str) -> tuple[str, str]:
-    emojis = "".join(EMOJI_PATTERN.findall(text))
-    base = EMOJI_PATTERN.sub("", text).strip()
-    digits_only = DIGIT_PATTERN.fullmatch(base)
-    if digits_only and emojis:
-        digits = digits_only.group(0)
-        if emojis.endswith(digits):
-            emojis = emojis[:-len(digits)]
-        base = base[len(digits):].strip()
-    return (base or text.strip(), emojis)
-
-
-def derive_metadata(path: Path) -> tuple[Dict[str, str], str]:
-    relative_parts = path.relative_to(PATRON_ROOT).parts
+def derive_metadata(path: Path, root: Path = PATRON_ROOT) -> tuple[Dict[str, str], str]:
+    relative_parts = path.relative_to(root).parts
     folders = list(relative_parts[:-1])
 
     metadata: Dict[str, str] = {}
+    if not folders:
+        return metadata, ""
+    entry = default_index().directory(path.parent, root)
 
     if len(folders) == 1:
         metadata["Recomendacion"] = "true"
     else:
-        for folder in folders[:-1]:
-            label_raw = _strip_prefix(folder)
-            label_clean, emojis = _separate_emojis(label_raw)
-            key = label_clean or label_raw
-            metadata[key] = label_clean or label_raw
-            if emojis:
-                metadata[f"{key}_emoji"] = emojis
-
-    profile = ""
-    if folders:
-        profile_base = _strip_prefix(folders[-1])
-        profile_clean, profile_emoji = _separate_emojis(profile_base)
-        profile = profile_clean
-        if profile_emoji:
-            metadata["profile_emoji"] = profile_emoji
-    return metadata, profile
-
-
-def process_json_file(json_path: Path, indent: int) -> None:
-    data = json.loads(json_path.read_text())
-    metadata, profile = derive_metadata(json_path)
+        for label in entry.categories:
+            metadata[label.display] = label.display
+            if label.emoji:
+                metadata[f"{label.display}_emoji"] = label.emoji
+
+    if entry.emoji:
+        metadata["profile_emoji"] = entry.emoji
+    return metadata, entry.display
+
+
+def apply_metadata(data: Dict[str, Any], json_path: Path, root: Path = PATRON_ROOT) -> Dict[str, Any]:
+    """Merge the folder-derived metadata for ``json_path`` into ``data`` in place."""
+    metadata, profile = derive_metadata(json_path, root)
     metadata_block = data.setdefault("metadata", {})
 
     # Drop stale *_emoji entries that are no longer produced.
@@ -101,17 +63,64 @@ def process_json_file(json_path: Path, indent: int) -> None:
     data["metadata"] = metadata_block
     if profile:
         data["profile"] = profile
-    json_path.write_text(json.dumps(data, indent=indent, ensure_ascii=False))
+    return data
+
+
+def process_json_file(json_path: Path, indent: int, root: Path = PATRON_ROOT) -> bool:
+    """Refresh one sidecar's metadata; returns True when the file had to be rewritten."""
+    original = json_path.read_text()
+    data = apply_metadata(json.loads(original), json_path, root)
+    if not write_if_changed(json_path, json.dumps(data, indent=indent, ensure_ascii=False), original):
+        return False
     print(f"Updated {json_path}")
+    return True
+
+
+def annotate_records(
+    records: Dict[Path, Dict[str, Any]],
+    root: Path,
+    indent: int,
+    write: bool = True,
+) -> Dict[Path, Dict[str, Any]]:
+    """Apply metadata to in-memory ``{sidecar path: record}`` pairs, optionally saving changed ones."""
+    root = root.resolve()
+    updated = 0
+    for json_path in sorted(records):
+        apply_metadata(records[json_path], json_path, root)
+        text = json.dumps(records[json_path], indent=indent, ensure_ascii=False)
+        if write and write_if_changed(json_path, text):
+            updated += 1
+            print(f"Updated {json_path}")
+    default_index().save()
+    if write:
+        print(f"Metadata: {updated} updated, {len(records) - updated} unchanged")
+    return records
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Add folder-derived metadata to Screenshot_*.json files.")
+    parser.add_argument(
+        "--root",
+        type=Path,
+        default=PATRON_ROOT,
+        help=f"Root directory that contains Screenshot_*.json files (default: {PATRON_ROOT}).",
+    )
+    parser.add_argument("--indent", type=int, default=2, help="Indentation for rewritten JSON files (default: 2).")
+    return parser.parse_args(argv)
 
 
 def main() -> None:
-    files = discover_json_files(PATRON_ROOT)
+    args = parse_args()
+    root = args.root.resolve()
+    files = discover_json_files(root)
     if not files:
-        raise SystemExit(f"No Screenshot_*.json files found under {PATRON_ROOT}")
+        raise SystemExit(f"No Screenshot_*.json files found under {root}")
 
-    for json_file in files:
-        process_json_file(json_file, indent=2)
+    labels = default_index()
+    labels.scan(root)
+    updated = sum(1 for json_file in files if process_json_file(json_file, args.indent, root))
+    labels.save()
+    print(f"Metadata: {updated} updated, {len(files) - updated} unchanged")
 
 
 if __name__ == "__main__":
@@ -4,30 +4,38 @@
 from __future__ import annotations
 
 import argparse
+import difflib
 import json
+import os
 import re
 import shutil
 from pathlib import Path
-from typing import Any, Dict, List, Set, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no ioctl; reflinks are skipped
+    fcntl = None
+
+from atomic_io import write_if_changed
+from build_manifest import file_digest, json_digest
+from folder_labels import RULES_VERSION, default_index, normalize_token
+from profile_io import is_ndjson, load_payload, write_profiles
+from text_table import TEXT_TABLE_MODES, render
 
 APP_ROOT = Path(__file__).resolve().parent
 DEFAULT_ROOT = APP_ROOT / "PATRON"
 DEFAULT_OUTPUT = APP_ROOT / "consolidated_profiles.json"
-MEDIA_EXTENSIONS = {
-    ".jpg",
-    ".jpeg",
-    ".png",
-    ".gif",
-    ".bmp",
-    ".webp",
-    ".heic",
-    ".mp4",
-    ".mov",
-    ".m4v",
-    ".avi",
-    ".mkv",
-    ".webm",
-}
+DEFAULT_STATE = APP_ROOT / "consolidation_state.json"
+DEFAULT_IDENTITY_REVIEW = APP_ROOT / "identity_review.json"
+STATE_VERSION = 2
+FOLDER_CODE_PATTERN = re.compile(r"^\s*(\d+)(?!\d)")
+IDENTITY_MAX_BLOCK = 12
+IDENTITY_NAME_PREFIX = 4
+IDENTITY_NAME_SIMILARITY = 0.85
+# Linux ioctl that clones a file's extents (_IOW(0x94, 9, int)).
+FICLONE = 0x40049409
+MEDIA_LINK_MODES = ("auto", "reflink", "hardlink", "copy")
 MEDIA_EXTENSIONS = {
     ".jpg",
     ".jpeg",
@@ -52,24 +60,6 @@ def discover_json_files(root: Path) -> List[Path]:
     return sorted(p for p in root.rglob("Screenshot_*.json") if p.is_file())
 
 
-PAREN_CONTENT_PATTERN = re.compile(r"\(([^()]+)\)")
-
-
-def _prefer_parenthetical(text: str) -> str:
-    match = PAREN_CONTENT_PATTERN.search(text)
-    if match:
-        inner = match.group(1).strip()
-        if inner:
-            return inner
-    return text.strip()
-
-
-def _strip_prefix(folder: str) -> str:
-    parts = folder.split("-", 1)
-    base = parts[1].strip() if len(parts) == 2 else folder
-    return _prefer_parenthetical(base)
-
-
 def _normalize_string(value: Any) -> str | None:
     if isinstance(value, str):
         stripped = value.strip()
@@ -91,8 +81,7 @@ def canonical_profile(path: Path, payload: Dict[str, Any]) -> Tuple[str, str]:
         normalized = _normalize_string(candidate)
         if normalized and normalized.lower() != "true":
             return normalized.casefold(), normalized
-    folder_name = _strip_prefix(path.parent.name)
-    fallback = _normalize_string(folder_name) or path.stem
+    fallback = _normalize_string(default_index().directory(path.parent).label.base) or path.stem
     return fallback.casefold(), fallback
 
 
@@ -118,7 +107,16 @@ def _merge_dict(
     conflicts: List[Dict[str, Any]],
     path: List[str],
     source: str,
+    seen: Dict[Tuple[str, ...], Set[str]] | None = None,
 ) -> None:
+    """Merge ``incoming`` into ``target``, recording disagreements in ``conflicts``.
+
+    ``seen`` holds the fingerprints of the items already in each merged list,
+    keyed by field path; pass the same dict for every merge into one target so
+    lists are not re-serialised on each call.
+    """
+    if seen is None:
+        seen = {}
     for key, value in incoming.items():
         if _is_blank(value):
             continue
@@ -137,7 +135,7 @@ def _merge_dict(
                     )
                     continue
                 target[key] = {}
-            _merge_dict(target[key], value, conflicts, field_path, source)
+            _merge_dict(target[key], value, conflicts, field_path, source, seen)
         elif isinstance(value, list):
             current = target.setdefault(key, [])
             if not isinstance(current, list):
@@ -150,12 +148,14 @@ def _merge_dict(
                     }
                 )
                 continue
-            seen = {_serialize_for_set(item) for item in current}
+            markers = seen.get(tuple(field_path))
+            if markers is None:
+                markers = seen[tuple(field_path)] = {_serialize_for_set(item) for item in current}
             for item in value:
                 marker = _serialize_for_set(item)
-                if marker not in seen:
+                if marker not in markers:
                     current.append(item)
-                    seen.add(marker)
+                    markers.add(marker)
         else:
             if key not in target or _is_blank(target[key]):
                 target[key] = value
@@ -170,117 +170,623 @@ def _merge_dict(
                 )
 
 
+def _read_json(path: Path) -> Dict[str, Any]:
+    return json.loads(path.read_text())
+
+
 def consolidate_profiles(files: List[Path], root: Path) -> Dict[str, Any]:
-    buckets: Dict[str, Dict[str, Any]] = {}
-    for json_file in files:
-        payload = json.loads(json_file.read_text())
-        canonical_key, display_name = canonical_profile(json_file, payload)
-        rel_path = str(json_file.relative_to(root))
-        bucket = buckets.setdefault(
-            canonical_key,
-            {
-                "profile": display_name,
-                "sources": [],
-                "raw_responses": [],
-                "merged_metadata": {},
-                "merged_structured_data": {},
-                "conflicts": [],
-                "media": [],
-                "_media_seen": set(),
-            },
+    return consolidate_records(((path, json.loads(path.read_text())) for path in files), root)
+
+
+def _new_bucket(display_name: str) -> Dict[str, Any]:
+    return {
+        "profile": display_name,
+        "sources": [],
+        "raw_responses": [],
+        "merged_metadata": {},
+        "merged_structured_data": {},
+        "conflicts": [],
+        "media": [],
+        "_media_seen": set(),
+        "_list_seen": {},
+    }
+
+
+def _add_source(
+    bucket: Dict[str, Any],
+    json_file: Path,
+    payload: Dict[str, Any],
+    display_name: str,
+    root: Path,
+    media_cache: MediaScanCache,
+) -> None:
+    rel_path = str(json_file.relative_to(root))
+    # prefer earlier display name unless empty, otherwise keep first seen
+    if not bucket["profile"] and display_name:
+        bucket["profile"] = display_name
+    image_path_raw = payload.get("image") or payload.get("ocr")
+    exclude_media: Set[str] = set()
+    if image_path_raw:
+        try:
+            exclude_media.add(str(Path(image_path_raw).resolve()))
+        except FileNotFoundError:
+            exclude_media.add(str(Path(image_path_raw)))
+    profile_folder = json_file.parent
+    media_items = media_cache.list(profile_folder, exclude_media)
+    entry = {
+        "path": rel_path,
+        "folders": list(json_file.relative_to(root).parts[:-1]),
+        "ocr": image_path_raw,
+        "media": media_items,
+        "raw_response": payload.get("raw_response"),
+    }
+    bucket["sources"].append(entry)
+    for media_item in media_items:
+        if media_item not in bucket["_media_seen"]:
+            bucket["media"].append(media_item)
+            bucket["_media_seen"].add(media_item)
+    raw_text = payload.get("raw_response")
+    if raw_text and raw_text not in bucket["raw_responses"]:
+        bucket["raw_responses"].append(raw_text)
+    metadata = payload.get("metadata")
+    if isinstance(metadata, dict):
+        _merge_dict(
+            bucket["merged_metadata"],
+            metadata,
+            bucket["conflicts"],
+            ["metadata"],
+            rel_path,
+            bucket["_list_seen"],
         )
-        # prefer earlier display name unless empty, otherwise keep first seen
-        if not bucket["profile"] and display_name:
-            bucket["profile"] = display_name
-        image_path_raw = payload.get("image") or payload.get("ocr")
-        exclude_media: Set[str] = set()
-        if image_path_raw:
-            try:
-                exclude_media.add(str(Path(image_path_raw).resolve()))
-            except FileNotFoundError:
-                exclude_media.add(str(Path(image_path_raw)))
-        profile_folder = json_file.parent
-        media_items = _list_media_files(profile_folder, root, exclude_media)
-        entry = {
-            "path": rel_path,
-            "folders": list(json_file.relative_to(root).parts[:-1]),
-            "ocr": image_path_raw,
-            "media": media_items,
-            "raw_response": payload.get("raw_response"),
-        }
-        bucket["sources"].append(entry)
-        for media_item in media_items:
-            if media_item not in bucket["_media_seen"]:
-                bucket["media"].append(media_item)
-                bucket["_media_seen"].add(media_item)
-        raw_text = payload.get("raw_response")
-        if raw_text and raw_text not in bucket["raw_responses"]:
-            bucket["raw_responses"].append(raw_text)
-        metadata = payload.get("metadata")
-        if isinstance(metadata, dict):
-            _merge_dict(
-                bucket["merged_metadata"],
-                metadata,
-                bucket["conflicts"],
-                ["metadata"],
-                rel_path,
-            )
-        structured = payload.get("structured_data")
-        if isinstance(structured, dict):
-            _merge_dict(
-                bucket["merged_structured_data"],
-                structured,
-                bucket["conflicts"],
-                ["structured_data"],
-                rel_path,
-            )
-    profiles = []
-    for key in sorted(buckets.keys()):
-        bucket = buckets[key]
-        profiles.append(
-            {
-                "profile": bucket["profile"],
-                "occurrence_count": len(bucket["sources"]),
-                "sources": bucket["sources"],
-                "raw_responses": bucket["raw_responses"],
-                "merged_metadata": bucket["merged_metadata"] or None,
-                "merged_structured_data": bucket["merged_structured_data"] or None,
-                "conflicts": bucket["conflicts"] or None,
-                "media": bucket["media"],
-            }
+    structured = payload.get("structured_data")
+    if isinstance(structured, dict):
+        _merge_dict(
+            bucket["merged_structured_data"],
+            structured,
+            bucket["conflicts"],
+            ["structured_data"],
+            rel_path,
+            bucket["_list_seen"],
         )
-    payload = {
+
+
+def _bucket_profile(bucket: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "profile": bucket["profile"],
+        "occurrence_count": len(bucket["sources"]),
+        "sources": bucket["sources"],
+        "raw_responses": bucket["raw_responses"],
+        "merged_metadata": bucket["merged_metadata"] or None,
+        "merged_structured_data": bucket["merged_structured_data"] or None,
+        "conflicts": bucket["conflicts"] or None,
+        "media": bucket["media"],
+    }
+
+
+def _consolidated_payload(root: Path, total_files: int, profiles: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
         "summary": {
             "root": str(root),
-            "total_files": len(files),
+            "total_files": total_files,
             "unique_profiles": len(profiles),
         },
         "profiles": profiles,
     }
-    return payload
 
 
-def _list_media_files(folder: Path, root: Path, exclude: Set[str]) -> List[str]:
-    media: List[str] = []
-    if not folder.exists():
-        return media
-    for candidate in sorted(folder.rglob("*")):
-        if not candidate.is_file():
-            continue
-        if candidate.suffix.lower() not in MEDIA_EXTENSIONS:
-            continue
+def normalize_phone(value: Any) -> str | None:
+    """Digits of a phone/WhatsApp number without the Costa Rican country code; None if it is not one."""
+    if not isinstance(value, (str, int)):
+        return None
+    digits = re.sub(r"\D", "", str(value))
+    if len(digits) == 11 and digits.startswith("506"):
+        digits = digits[3:]
+    return digits if 8 <= len(digits) <= 15 else None
+
+
+def folder_code(rel_parts: Sequence[str]) -> str | None:
+    """``parent/#N`` for a sidecar whose profile folder starts with a number (``4 - KIMBERLY``, ``4``)."""
+    folders = list(rel_parts[:-1])
+    if not folders:
+        return None
+    match = FOLDER_CODE_PATTERN.match(folders[-1])
+    if not match:
+        return None
+    return "/".join(folders[:-1] + [f"#{match.group(1)}"])
+
+
+def source_identity(json_file: Path, payload: Dict[str, Any], root: Path) -> Dict[str, Any]:
+    """The identity evidence one sidecar contributes: its name bucket, phones and folder code."""
+    key, display_name = canonical_profile(json_file, payload)
+    phones: Set[str] = set()
+    structured = payload.get("structured_data")
+    contact = structured.get("contact") if isinstance(structured, dict) else None
+    if isinstance(contact, dict):
+        for field in ("whatsapp", "phone"):
+            values = contact.get(field)
+            for value in values if isinstance(values, list) else [values]:
+                phone = normalize_phone(value)
+                if phone:
+                    phones.add(phone)
+    return {
+        "key": key,
+        "name": display_name,
+        "phones": sorted(phones),
+        "folder": folder_code(json_file.relative_to(root).parts),
+    }
+
+
+def _generic_name(key: str) -> bool:
+    token = normalize_token(key)
+    return not token or token.replace("_", "").isdigit() or token == "true"
+
+
+def _names_compatible(left: str, right: str) -> bool:
+    """Whether two name keys can belong to one person: either is generic or one's tokens contain the other's."""
+    if _generic_name(left) or _generic_name(right):
+        return True
+    left_tokens, right_tokens = set(normalize_token(left).split("_")), set(normalize_token(right).split("_"))
+    return left_tokens <= right_tokens or right_tokens <= left_tokens
+
+
+class IdentityIndex:
+    """Group name buckets that describe the same person.
+
+    Buckets are blocked by phone number, folder code, accent- and emoji-folded
+    name and name prefix, and only buckets sharing a block are compared, so the
+    work grows with the number of buckets rather than its square. Blocks larger
+    than ``max_block`` (agency numbers shared by many profiles, common name
+    prefixes) are not compared. The same folded name, or a shared phone or
+    folder code with compatible names, is a confident match and is merged,
+    provided every named member of one group fits every named member of the
+    other; a bare folder number matching two conflicting names joins neither.
+    The same evidence with different names, or names that are merely similar,
+    goes to the review list as one group per shared phone, folder code or prefix.
+    """
+
+    def __init__(self, max_block: int = IDENTITY_MAX_BLOCK) -> None:
+        self.max_block = max_block
+        self.items: Dict[str, Dict[str, Any]] = {}
+        self._parent: Dict[str, str] = {}
+        # Named (non-generic) member keys of each group, by group root.
+        self._names: Dict[str, Set[str]] = {}
+        # Block members, kept between resolve_new() calls.
+        self._block_members: Dict[str, Set[str]] = {}
+
+    def add(self, identity: Dict[str, Any]) -> bool:
+        """Record one source; returns whether it brought a new bucket, phone or folder code."""
+        key = identity["key"]
+        new = key not in self.items
+        item = self.items.setdefault(key, {"name": identity["name"], "count": 0, "phones": set(), "folders": set()})
+        item["count"] += 1
+        before = len(item["phones"]) + len(item["folders"])
+        item["phones"].update(identity["phones"])
+        if identity["folder"]:
+            item["folders"].add(identity["folder"])
+        return new or len(item["phones"]) + len(item["folders"]) != before
+
+    def _find(self, key: str) -> str:
+        root = key
+        while self._parent.get(root, root) != root:
+            root = self._parent[root]
+        while key != root:
+            parent = self._parent[key]
+            self._parent[key] = root
+            key = parent
+        return root
+
+    def _group_names(self, roots: Iterable[str]) -> Set[str]:
+        names: Set[str] = set()
+        for root in roots:
+            names |= self._names.get(root, set())
+        return names
+
+    @staticmethod
+    def _consistent(names: Set[str]) -> bool:
+        ordered = sorted(names)
+        return all(_names_compatible(a, b) for idx, a in enumerate(ordered) for b in ordered[idx + 1 :])
+
+    def _union(self, left: str, right: str) -> bool:
+        """Join the groups of ``left`` and ``right``; refuses (returns False) when their names conflict."""
+        left_root, right_root = self._find(left), self._find(right)
+        if left_root == right_root:
+            return True
+        names = self._group_names((left_root, right_root))
+        if not self._consistent(names):
+            return False
+        root, child = min(left_root, right_root), max(left_root, right_root)
+        self._parent[child] = root
+        self._names.pop(child, None)
+        if names:
+            self._names[root] = names
+        return True
+
+    def _merge(
+        self,
+        matches: List[Tuple[str, str, str, str]],
+        candidates: List[Tuple[str, str, str, str, float]],
+    ) -> None:
+        """Union confident ``(shared, left, right, reason)`` matches; refused ones go to ``candidates``.
+
+        Named buckets are joined first, so a bare folder number is then checked
+        against whole groups: it joins only if all the names it matched fit
+        together, otherwise none of its matches is merged.
+        """
+        links: Dict[str, List[Tuple[str, str, str, str]]] = {}
+        unnamed: List[Tuple[str, str, str, str]] = []
+        for match in matches:
+            shared, left, right, reason = match
+            left_generic, right_generic = _generic_name(left), _generic_name(right)
+            if left_generic and right_generic:
+                unnamed.append(match)
+            elif left_generic or right_generic:
+                links.setdefault(left if left_generic else right, []).append(match)
+            elif not self._union(left, right):
+                candidates.append((shared, left, right, f"{reason}, conflicting names", 0.5))
+        for key, edges in sorted(links.items()):
+            named = {self._find(right if left == key else left) for _, left, right, _ in edges}
+            if self._consistent(self._group_names(named | {self._find(key)})):
+                for _, left, right, _ in edges:
+                    self._union(left, right)
+                continue
+            for shared, left, right, reason in edges:
+                candidates.append((shared, left, right, f"{reason}, conflicting names", 0.5))
+        for shared, left, right, reason in unnamed:
+            if not self._union(left, right):
+                candidates.append((shared, left, right, f"{reason}, conflicting names", 0.5))
+
+    def _block_keys(self, key: str) -> List[str]:
+        item = self.items[key]
+        block_keys = [f"phone:{phone}" for phone in item["phones"]]
+        block_keys += [f"folder:{code}" for code in item["folders"]]
+        if not _generic_name(key):
+            folded = normalize_token(key)
+            block_keys += [f"same:{folded}", f"name:{folded[:IDENTITY_NAME_PREFIX]}"]
+        return block_keys
+
+    def _blocks(self) -> Dict[str, List[str]]:
+        blocks: Dict[str, List[str]] = {}
+        for key in sorted(self.items):
+            for block_key in self._block_keys(key):
+                blocks.setdefault(block_key, []).append(key)
+        return blocks
+
+    def _compare(
+        self,
+        block_key: str,
+        left: str,
+        right: str,
+        merge: bool,
+        matches: List[Tuple[str, str, str, str]],
+        candidates: List[Tuple[str, str, str, str, float]],
+    ) -> None:
+        """Classify one pair as a confident match, a review candidate or unrelated."""
+        a, b = self.items[left], self.items[right]
+        phones, folders = a["phones"] & b["phones"], a["folders"] & b["folders"]
+        evidence = []
+        if phones:
+            evidence.append("phone")
+        if folders:
+            evidence.append("folder code")
+        # Review groups are keyed by the evidence itself, whichever block found the pair.
+        shared = f"phone:{min(phones)}" if phones else f"folder:{min(folders)}" if folders else block_key
+        same_name = not _generic_name(left) and normalize_token(left) == normalize_token(right)
+        if same_name or (evidence and _names_compatible(left, right)):
+            reason = "shared " + " and ".join(evidence) if evidence else "same name"
+            if merge:
+                matches.append((shared, left, right, reason))
+            else:
+                candidates.append((shared, left, right, reason, 1.0))
+        elif evidence:
+            reason = f"shared {' and '.join(evidence)}, different names"
+            candidates.append((shared, left, right, reason, 0.5))
+        else:
+            score = difflib.SequenceMatcher(None, normalize_token(left), normalize_token(right)).ratio()
+            if score >= IDENTITY_NAME_SIMILARITY or _names_compatible(left, right):
+                candidates.append((shared, left, right, "similar names", round(score, 2)))
+
+    def _mapping(self) -> Dict[str, str]:
+        groups: Dict[str, List[str]] = {}
+        for key in self.items:
+            groups.setdefault(self._find(key), []).append(key)
+        mapping: Dict[str, str] = {}
+        for members in groups.values():
+            # Prefer a real name over a bare folder number, then the best-attested bucket.
+            representative = min(members, key=lambda key: (_generic_name(key), -self.items[key]["count"], key))
+            for key in members:
+                mapping[key] = representative
+        return mapping
+
+    def resolve(self, merge: bool = True) -> Tuple[Dict[str, str], List[Dict[str, Any]]]:
+        """Return ``{bucket key: representative key}`` and the review groups, one per shared key."""
+        self._parent = {}
+        self._names = {key: {key} for key in self.items if not _generic_name(key)}
+        candidates: List[Tuple[str, str, str, str, float]] = []
+        matches: List[Tuple[str, str, str, str]] = []
+        compared: Set[Tuple[str, str]] = set()
+        for block_key, members in sorted(self._blocks().items()):
+            if len(members) < 2 or len(members) > self.max_block:
+                continue
+            for idx, left in enumerate(members):
+                for right in members[idx + 1 :]:
+                    if (left, right) in compared:
+                        continue
+                    compared.add((left, right))
+                    self._compare(block_key, left, right, merge, matches, candidates)
+        self._merge(matches, candidates)
+        mapping = self._mapping()
+        # One group per shared key, listing the resulting profiles by their representatives.
+        shared_groups: Dict[str, Dict[str, Any]] = {}
+        for shared, left, right, reason, score in candidates:
+            if mapping[left] == mapping[right]:
+                continue
+            group = shared_groups.setdefault(shared, {"keys": set(), "reasons": set(), "score": 0.0})
+            group["keys"].update((mapping[left], mapping[right]))
+            group["reasons"].add(reason)
+            group["score"] = max(group["score"], score)
+        review: List[Dict[str, Any]] = []
+        listed: Set[Tuple[str, ...]] = set()
+        for shared, group in sorted(shared_groups.items()):
+            keys = tuple(sorted(group["keys"]))
+            if keys in listed:
+                continue
+            listed.add(keys)
+            review.append(
+                {
+                    "shared": shared,
+                    "profiles": [self.items[key]["name"] for key in keys],
+                    "keys": list(keys),
+                    "reason": "; ".join(sorted(group["reasons"])),
+                    "score": group["score"],
+                }
+            )
+        return mapping, review
+
+    def resolve_new(self, identities: Iterable[Dict[str, Any]]) -> Dict[str, str]:
+        """Add ``identities`` to the groups merged so far and return ``{bucket key: representative key}``.
+
+        Only pairs involving a new bucket, or one that gained a phone or folder
+        code, are compared; the union-find is kept between calls, so each call
+        costs what the new sources touch rather than a full ``resolve``. Groups
+        are never split again, so evidence arriving later can leave a merge
+        that a full ``resolve`` would refuse; the final consolidation runs one.
+        """
+        changed: Set[str] = set()
+        for identity in identities:
+            if self.add(identity):
+                changed.add(identity["key"])
+        touched: Set[str] = set()
+        for key in sorted(changed):
+            if not _generic_name(key):
+                self._names.setdefault(self._find(key), set()).add(key)
+            for block_key in self._block_keys(key):
+                self._block_members.setdefault(block_key, set()).add(key)
+                touched.add(block_key)
+        matches: List[Tuple[str, str, str, str]] = []
+        candidates: List[Tuple[str, str, str, str, float]] = []
+        compared: Set[Tuple[str, str]] = set()
+        for block_key in sorted(touched):
+            members = sorted(self._block_members[block_key])
+            if len(members) < 2 or len(members) > self.max_block:
+                continue
+            for idx, left in enumerate(members):
+                for right in members[idx + 1 :]:
+                    if (left, right) in compared or not {left, right} & changed:
+                        continue
+                    compared.add((left, right))
+                    self._compare(block_key, left, right, True, matches, candidates)
+        self._merge(matches, candidates)
+        return self._mapping()
+
+
+def resolve_identities(
+    identities: Iterable[Dict[str, Any]], merge: bool = True
+) -> Tuple[Dict[str, str], Dict[str, str], List[Dict[str, Any]]]:
+    """Map every bucket key to its merged key; also returns each merged key's display name and the review list."""
+    index = IdentityIndex()
+    for identity in identities:
+        index.add(identity)
+    mapping, review = index.resolve(merge)
+    names = {key: index.items[key]["name"] for key in set(mapping.values())}
+    return mapping, names, review
+
+
+def consolidate_records(
+    records: Iterable[Tuple[Path, Dict[str, Any]]],
+    root: Path,
+    merge_identities: bool = True,
+    review: List[Dict[str, Any]] | None = None,
+) -> Dict[str, Any]:
+    """Consolidate already-loaded ``(sidecar path, payload)`` pairs.
+
+    Buckets that the identity index recognises as one person are merged;
+    borderline matches are appended to ``review`` when given.
+    """
+    items = list(records)
+    identities = [source_identity(json_file, payload, root) for json_file, payload in items]
+    mapping, names, groups = resolve_identities(identities, merge_identities)
+    if review is not None:
+        review.extend(groups)
+    buckets: Dict[str, Dict[str, Any]] = {}
+    media_cache = MediaScanCache(root)
+    for (json_file, payload), identity in zip(items, identities):
+        key = mapping[identity["key"]]
+        bucket = buckets.setdefault(key, _new_bucket(names[key]))
+        _add_source(bucket, json_file, payload, names[key], root, media_cache)
+    profiles = [_bucket_profile(buckets[key]) for key in sorted(buckets)]
+    return _consolidated_payload(root, len(items), profiles)
+
+
+class ConsolidationState:
+    """Which sources (path + content hash) fed each bucket of the last written output.
+
+    The previous profiles themselves are read back from the output file, which
+    is only trusted while its hash matches the one recorded here.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.sources: Dict[str, Dict[str, str]] = {}
+        self.keys: List[str] = []
+        self.root = ""
+        self.output = ""
+        self.output_digest = ""
+        if path.exists():
+            try:
+                payload = json.loads(path.read_text())
+            except json.JSONDecodeError:
+                payload = {}
+            # Bucket keys come from the folder-label rules, so a rules change invalidates them.
+            if payload.get("version") == STATE_VERSION and payload.get("label_rules") == RULES_VERSION:
+                self.sources = payload.get("sources") or {}
+                self.keys = payload.get("keys") or []
+                self.root = payload.get("root") or ""
+                self.output = payload.get("output") or ""
+                self.output_digest = payload.get("output_digest") or ""
+
+    def previous_profiles(self, root: Path, output_file: Path) -> Dict[str, Dict[str, Any]]:
+        """Profiles of the last run by bucket key, or nothing when the output no longer matches."""
+        if self.root != str(root) or self.output != str(output_file.resolve()) or not output_file.exists():
+            return {}
+        if file_digest(output_file) != self.output_digest:
+            return {}
         try:
-            candidate_resolved = str(candidate.resolve())
-        except FileNotFoundError:
-            candidate_resolved = str(candidate)
-        if candidate_resolved in exclude:
+            profiles = load_payload(output_file).get("profiles") or []
+        except (OSError, KeyError, json.JSONDecodeError):
+            return {}
+        if len(profiles) != len(self.keys):
+            return {}
+        return dict(zip(self.keys, profiles))
+
+    def save(self, root: Path, output_file: Path) -> None:
+        self.root = str(root)
+        self.output = str(output_file.resolve())
+        self.output_digest = file_digest(output_file)
+        payload = {
+            "version": STATE_VERSION,
+            "label_rules": RULES_VERSION,
+            "root": self.root,
+            "output": self.output,
+            "output_digest": self.output_digest,
+            "keys": self.keys,
+            "sources": self.sources,
+        }
+        write_if_changed(self.path, json.dumps(payload, indent=2, ensure_ascii=False))
+
+
+def consolidate_incremental(
+    files: Sequence[Path],
+    load: Callable[[Path], Dict[str, Any]],
+    content_digest: Callable[[Path], str],
+    root: Path,
+    state: ConsolidationState,
+    previous: Dict[str, Dict[str, Any]],
+    merge_identities: bool = True,
+    review: List[Dict[str, Any]] | None = None,
+) -> Tuple[Dict[str, Any], Set[str]]:
+    """Re-merge only buckets whose sources were added, changed, removed or regrouped.
+
+    Identity evidence of unchanged sources comes from ``state``, so only changed
+    sidecars are read before identities are resolved again. Every other profile
+    is taken verbatim from ``previous``. Returns the consolidated payload and the
+    keys of the re-merged buckets; ``state`` is updated to describe the result.
+    """
+    media_cache = MediaScanCache(root)
+    digests: Dict[str, str] = {}
+    identities: Dict[str, Dict[str, Any]] = {}
+    loaded: Dict[Path, Dict[str, Any]] = {}
+    for json_file in files:
+        rel_path = str(json_file.relative_to(root))
+        # The source's media listing comes from its folder, so it is part of the fingerprint.
+        digest = json_digest([content_digest(json_file), media_cache.list(json_file.parent, set())])
+        digests[rel_path] = digest
+        known = state.sources.get(rel_path)
+        if known is not None and known["hash"] == digest:
+            identities[rel_path] = known["identity"]
             continue
+        loaded[json_file] = load(json_file)
+        identities[rel_path] = source_identity(json_file, loaded[json_file], root)
+    mapping, names, groups = resolve_identities(identities.values(), merge_identities)
+    if review is not None:
+        review.extend(groups)
+
+    sources: Dict[str, Dict[str, Any]] = {}
+    dirty: Set[str] = set()
+    for json_file in files:
+        rel_path = str(json_file.relative_to(root))
+        key = mapping[identities[rel_path]["key"]]
+        sources[rel_path] = {"hash": digests[rel_path], "bucket": key, "identity": identities[rel_path]}
+        known = state.sources.get(rel_path)
+        if json_file in loaded or known is None or known["bucket"] != key or key not in previous:
+            dirty.add(key)
+            if known is not None:
+                dirty.add(known["bucket"])
+    for rel_path, known in state.sources.items():
+        if rel_path not in sources:
+            dirty.add(known["bucket"])
+
+    buckets: Dict[str, Dict[str, Any]] = {}
+    for json_file in files:
+        key = sources[str(json_file.relative_to(root))]["bucket"]
+        if key not in dirty:
+            continue
+        payload = loaded[json_file] if json_file in loaded else load(json_file)
+        bucket = buckets.setdefault(key, _new_bucket(names[key]))
+        _add_source(bucket, json_file, payload, names[key], root, media_cache)
+
+    keys = sorted({known["bucket"] for known in sources.values()})
+    profiles = [_bucket_profile(buckets[key]) if key in buckets else previous[key] for key in keys]
+    state.sources = sources
+    state.keys = keys
+    return _consolidated_payload(root, len(files), profiles), set(buckets)
+
+
+class MediaScanCache:
+    """Media listings per directory, each scanned once per run with ``os.scandir``.
+
+    A listing covers the directory and everything below it, in the order
+    ``sorted(folder.rglob("*"))`` would give, as ``(resolved path, path relative
+    to root)`` pairs plus the set of resolved paths used for exclusion.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._listings: Dict[Path, Tuple[List[Tuple[str, str]], Set[str]]] = {}
+
+    def _scan(self, folder: Path) -> Tuple[List[Tuple[str, str]], Set[str]]:
+        cached = self._listings.get(folder)
+        if cached is not None:
+            return cached
+        found: List[Tuple[str, str]] = []
         try:
-            rel = str(candidate.relative_to(root))
-        except ValueError:
-            rel = str(candidate)
-        media.append(rel)
-    return media
+            resolved_folder = folder.resolve()
+            entries = list(os.scandir(folder))
+        except (FileNotFoundError, NotADirectoryError):
+            entries = []
+        for entry in entries:
+            path = folder / entry.name
+            if entry.is_dir(follow_symlinks=False):
+                found.extend(self._scan(path)[0])
+                continue
+            if not entry.is_file() or os.path.splitext(entry.name)[1].lower() not in MEDIA_EXTENSIONS:
+                continue
+            resolved = str(path.resolve()) if entry.is_symlink() else str(resolved_folder / entry.name)
+            try:
+                rel = str(path.relative_to(self.root))
+            except ValueError:
+                rel = str(path)
+            found.append((resolved, rel))
+        # Path ordering compares component-wise, matching sorted(folder.rglob("*")).
+        found.sort(key=lambda item: Path(item[1]))
+        listing = self._listings[folder] = (found, {resolved for resolved, _ in found})
+        return listing
+
+    def list(self, folder: Path, exclude: Set[str]) -> List[str]:
+        found, resolved_paths = self._scan(folder)
+        hidden = exclude & resolved_paths
+        if not hidden:
+            return [rel for _, rel in found]
+        return [rel for resolved, rel in found if resolved not in hidden]
 
 
 def slugify(value: str) -> str:
@@ -289,7 +795,7 @@ def slugify(value: str) -> str:
     return safe or "profile"
 
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Consolidate duplicate Screenshot_*.json profile files.",
     )
@@ -303,7 +809,15 @@ def parse_args() -> argparse.Namespace:
         "--output",
         type=Path,
         default=DEFAULT_OUTPUT,
-        help=f"Path to the consolidated summary JSON (default: {DEFAULT_OUTPUT}).",
+        help=(
+            f"Path to the consolidated summary (default: {DEFAULT_OUTPUT}). "
+            "A .ndjson/.jsonl path writes one profile per line."
+        ),
+    )
+    parser.add_argument(
+        "--export-json",
+        type=Path,
+        help="Also write the consolidated summary as a single JSON document here (e.g. next to an NDJSON output).",
     )
     parser.add_argument(
         "--per-profile-dir",
@@ -315,13 +829,57 @@ def parse_args() -> argparse.Namespace:
         type=Path,
         help="Optional root directory to copy each profile's media assets into profile-specific folders.",
     )
+    parser.add_argument(
+        "--media-link",
+        choices=MEDIA_LINK_MODES,
+        default="copy",
+        help=(
+            "How exported media is materialised from the source tree: copy copies; auto tries a reflink, "
+            "then a hardlink, then a copy; reflink/hardlink fall back to copying. Content already exported "
+            "for another profile is linked to that export in every mode (default: copy)."
+        ),
+    )
     parser.add_argument(
         "--indent",
         type=int,
         default=2,
         help="Indentation used for generated JSON files (default: 2).",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--text-table",
+        choices=TEXT_TABLE_MODES,
+        default="inline",
+        help=(
+            "How OCR texts are stored in the summary: inline (repeated per profile and source), "
+            "embedded (one content-addressed table in the file) or sidecar (table in <output>.texts.json)."
+        ),
+    )
+    parser.add_argument(
+        "--state",
+        type=Path,
+        default=DEFAULT_STATE,
+        help=f"Bucket state file used to re-merge only changed profiles (default: {DEFAULT_STATE}).",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore the bucket state and re-merge every profile.",
+    )
+    parser.add_argument(
+        "--identity-review",
+        type=Path,
+        default=DEFAULT_IDENTITY_REVIEW,
+        help=(
+            "Where to write groups of profiles that may be the same person but were not merged "
+            f"(default: {DEFAULT_IDENTITY_REVIEW})."
+        ),
+    )
+    parser.add_argument(
+        "--no-identity-merge",
+        action="store_true",
+        help="Only bucket by exact name; list folded-name, phone and folder-code matches for review instead.",
+    )
+    return parser.parse_args(argv)
 
 
 def write_outputs(
@@ -329,9 +887,20 @@ def write_outputs(
     output_file: Path,
     per_profile_dir: Path | None,
     indent: int,
-) -> None:
-    output_file.parent.mkdir(parents=True, exist_ok=True)
-    output_file.write_text(json.dumps(consolidated, indent=indent, ensure_ascii=False))
+    text_table: str = "inline",
+) -> int:
+    """Write the summary and per-profile files, skipping unchanged ones; returns per-profile files written.
+
+    ``text_table`` picks how OCR texts are stored in the summary (see text_table.py);
+    per-profile files always keep them inline. An ``.ndjson`` output gets one
+    profile per line.
+    """
+    if text_table == "inline" or is_ndjson(output_file):
+        write_profiles(output_file, consolidated, indent)
+    else:
+        for target, text in render(consolidated, output_file, text_table, indent).items():
+            write_if_changed(target, text)
+    written = 0
     if per_profile_dir:
         per_profile_dir.mkdir(parents=True, exist_ok=True)
         used_names: Dict[str, int] = {}
@@ -342,15 +911,80 @@ def write_outputs(
             used_names[base] = counter + 1
             filename = base if counter == 0 else f"{base}_{counter+1}"
             target = per_profile_dir / f"{filename}.json"
-            target.write_text(json.dumps(profile, indent=indent, ensure_ascii=False))
+            if write_if_changed(target, json.dumps(profile, indent=indent, ensure_ascii=False)):
+                written += 1
+    return written
+
+
+def _reflink(source: Path, dest: Path) -> bool:
+    """Clone ``source`` into a new ``dest`` sharing its data blocks (btrfs, XFS, ...); False if unsupported."""
+    if fcntl is None:
+        return False
+    with source.open("rb") as src, dest.open("xb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            cloned = False
+        else:
+            cloned = True
+    if not cloned:
+        dest.unlink()
+        return False
+    shutil.copystat(source, dest)
+    return True
+
+
+def _same_content(dest: Path, source: Path, digest: Callable[[Path], str]) -> bool:
+    """Whether an existing export already holds ``source``: the same inode, or the same size and digest."""
+    dest_stat, source_stat = dest.stat(), source.stat()
+    if dest_stat.st_size != source_stat.st_size:
+        return False
+    if (dest_stat.st_dev, dest_stat.st_ino) == (source_stat.st_dev, source_stat.st_ino):
+        return True
+    return digest(dest) == digest(source)
+
+
+def place_media(source: Path, dest: Path, link_mode: str) -> str:
+    """Create ``dest`` from ``source`` as cheaply as ``link_mode`` allows; returns the method used."""
+    if link_mode in ("auto", "reflink") and _reflink(source, dest):
+        return "reflinked"
+    if link_mode in ("auto", "hardlink"):
+        try:
+            os.link(source, dest)
+            return "hardlinked"
+        except OSError:
+            pass
+    shutil.copy2(source, dest)
+    return "copied"
 
 
 def export_profile_media(
     profiles: List[Dict[str, Any]],
     root: Path,
     media_root: Path,
-) -> None:
+    link_mode: str = "copy",
+) -> Dict[str, int]:
+    """Materialise each profile's media under ``media_root/<slug>`` and return counters.
+
+    Files are deduplicated by content across all profiles: identical content is
+    exported only once per profile, and content already exported for another
+    profile is linked to that export (a reflink or hardlink, copying only when
+    neither works) whatever ``link_mode`` says, so its bytes are written once.
+    ``link_mode`` decides how the first export is made from the source tree,
+    which ``copy`` keeps unlinked. Content is only hashed for files whose size
+    collides with another one.
+    """
     media_root.mkdir(parents=True, exist_ok=True)
+    stats = dict.fromkeys(("files", "reflinked", "hardlinked", "copied", "present", "duplicates", "bytes_avoided"), 0)
+    digests: Dict[str, str] = {}
+
+    def digest(path: Path) -> str:
+        key = str(path)
+        if key not in digests:
+            digests[key] = file_digest(path)
+        return digests[key]
+
+    plan: List[Tuple[Path, List[Path]]] = []
     used_names: Dict[str, int] = {}
     name_map: Dict[str, str] = {}
     for idx, profile in enumerate(profiles, start=1):
@@ -365,54 +999,123 @@ def export_profile_media(
             folder_name = base if count == 0 else f"{base}_{count+1}"
             if normalized_name:
                 name_map[normalized_name] = folder_name
-        profile_dir = media_root / folder_name
-        profile_dir.mkdir(parents=True, exist_ok=True)
+        sources: List[Path] = []
         seen_sources: Set[str] = set()
         for media_rel in profile.get("media") or []:
             source_path = Path(media_rel)
             if not source_path.is_absolute():
                 source_path = root / media_rel
-            try:
-                source_resolved = str(source_path.resolve())
-            except FileNotFoundError:
-                source_resolved = str(source_path)
-                source_path = Path(source_resolved)
-            if source_resolved in seen_sources:
+            candidate = source_path.resolve()
+            if str(candidate) in seen_sources or not candidate.is_file():
                 continue
-            seen_sources.add(source_resolved)
-            if not Path(source_resolved).exists():
-                continue
-            candidate = Path(source_resolved)
-            if not candidate.is_file():
+            seen_sources.add(str(candidate))
+            sources.append(candidate)
+        plan.append((media_root / folder_name, sources))
+
+    sizes: Dict[int, int] = {}
+    for _, sources in plan:
+        for candidate in sources:
+            size = candidate.stat().st_size
+            sizes[size] = sizes.get(size, 0) + 1
+
+    exported: Dict[str, Path] = {}
+    for profile_dir, sources in plan:
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        profile_content: Set[str] = set()
+        for candidate in sources:
+            size = candidate.stat().st_size
+            stats["files"] += 1
+            # Unique sizes cannot have duplicates, so only colliding ones pay for a hash.
+            content = digest(candidate) if sizes[size] > 1 else f"size:{size}"
+            if content in profile_content:
+                stats["duplicates"] += 1
+                stats["bytes_avoided"] += size
                 continue
-            dest_name = candidate.name
-            stem = candidate.stem
-            suffix = candidate.suffix
+            profile_content.add(content)
+            dest_path = profile_dir / candidate.name
             counter = 1
-            dest_path = profile_dir / dest_name
+            present = False
             while dest_path.exists():
-                if dest_path.samefile(candidate):
+                if _same_content(dest_path, candidate, digest):
+                    present = True
                     break
-                dest_name = f"{stem}_{counter}{suffix}"
-                dest_path = profile_dir / dest_name
+                dest_path = profile_dir / f"{candidate.stem}_{counter}{candidate.suffix}"
                 counter += 1
-            if not dest_path.exists() or not dest_path.samefile(candidate):
-                shutil.copy2(candidate, dest_path)
+            if present:
+                stats["present"] += 1
+                stats["bytes_avoided"] += size
+            else:
+                earlier = exported.get(content)
+                if earlier is None:
+                    method = place_media(candidate, dest_path, link_mode)
+                else:
+                    # Linking two exports never touches the source tree, so it happens in every mode.
+                    method = place_media(earlier, dest_path, "auto")
+                stats[method] += 1
+                if method != "copied":
+                    stats["bytes_avoided"] += size
+            exported.setdefault(content, dest_path)
+    return stats
 
 
-def main() -> None:
-    args = parse_args()
-    files = discover_json_files(args.root)
-    if not files:
-        raise SystemExit(f"No Screenshot_*.json files found under {args.root}")
-    consolidated = consolidate_profiles(files, args.root)
-    write_outputs(consolidated, args.output, args.per_profile_dir, args.indent)
+def run_consolidation(
+    args: argparse.Namespace,
+    records: Dict[Path, Dict[str, Any]] | None = None,
+) -> Dict[str, Any]:
+    """Consolidate sidecars under ``args.root`` (or the given in-memory records) and write outputs."""
+    if is_ndjson(args.output) and args.text_table != "inline":
+        raise SystemExit("--text-table only applies to single-document JSON outputs; use --export-json.")
+    root = args.root.resolve()
+    labels = default_index()
+    labels.scan(root)
+    if records is None:
+        files = discover_json_files(root)
+        if not files:
+            raise SystemExit(f"No Screenshot_*.json files found under {args.root}")
+        load: Callable[[Path], Dict[str, Any]] = _read_json
+        content_digest: Callable[[Path], str] = file_digest
+    else:
+        if not records:
+            raise SystemExit(f"No Screenshot_*.json records found under {args.root}")
+        files = sorted(records)
+        load = records.__getitem__
+
+        def content_digest(path: Path) -> str:
+            return json_digest(records[path])
+
+    state = ConsolidationState(args.state)
+    previous = {} if args.full else state.previous_profiles(root, args.output)
+    review: List[Dict[str, Any]] = []
+    consolidated, rebuilt = consolidate_incremental(
+        files, load, content_digest, root, state, previous, not args.no_identity_merge, review
+    )
+    labels.save()
+    if args.identity_review:
+        args.identity_review.parent.mkdir(parents=True, exist_ok=True)
+        write_if_changed(args.identity_review, json.dumps(review, indent=args.indent, ensure_ascii=False))
+    written = write_outputs(consolidated, args.output, args.per_profile_dir, args.indent, args.text_table)
+    if args.export_json:
+        write_outputs(consolidated, args.export_json, None, args.indent, args.text_table)
+    state.save(root, args.output)
     if args.media_output_root:
-        export_profile_media(consolidated["profiles"], args.root, args.media_output_root)
+        media = export_profile_media(consolidated["profiles"], root, args.media_output_root, args.media_link)
+        print(
+            f"Media export: {media['files']} files ({media['reflinked']} reflinked, {media['hardlinked']} hardlinked, "
+            f"{media['copied']} copied, {media['present']} already present, {media['duplicates']} duplicates skipped); "
+            f"avoided copying {media['bytes_avoided'] / (1024 * 1024):.1f} MB."
+        )
     print(
         f"Consolidated {consolidated['summary']['total_files']} files into "
-        f"{consolidated['summary']['unique_profiles']} unique profiles."
+        f"{consolidated['summary']['unique_profiles']} unique profiles "
+        f"({len(rebuilt)} re-merged, {written} per-profile files written)."
     )
+    if review:
+        print(f"{len(review)} groups of possible duplicate profiles listed for review in {args.identity_review}.")
+    return consolidated
+
+
+def main() -> None:
+    run_consolidation(parse_args())
 
 
 if __name__ == "__main__":
@@ -5,10 +5,18 @@ from __future__ import annotations
 
 import argparse
 import ast
+import asyncio
+import functools
+import hashlib
 import json
 import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set
+from types import TracebackType
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Type
 
 try:
     import ollama
@@ -24,6 +32,10 @@ except ImportError:  # pragma: no cover - convenience message
         "Missing dependency: tqdm. Install it with 'pip install tqdm' before running this script."
     )
 
+from llm_json import JSONObjectScanner, first_json_object, repair_json
+from profile_io import ProfileWriter, is_ndjson, open_profiles, write_profiles
+from text_table import TEXT_TABLE_MODES, read_payload, write_payload
+
 APP_ROOT = Path(__file__).resolve().parent
 DEFAULT_INPUT = APP_ROOT / "consolidated_profiles.json"
 DEFAULT_OUTPUT = APP_ROOT / "consolidated_profiles_enriched.json"
@@ -96,9 +108,26 @@ Texto de referencia:
 """
 
 
-def run_ollama(ollama_host: Optional[str], model: str, prompt: str, timeout: int) -> str:
-    client = ollama.Client(host=_normalize_host(ollama_host)) if ollama_host else ollama
-    response = client.generate(model=model, prompt=prompt, stream=False)
+def run_ollama(
+    ollama_host: Optional[str],
+    model: str,
+    prompt: str,
+    timeout: int,
+    stream: bool = False,
+) -> str:
+    client = _client(ollama_host, timeout)
+    if stream:
+        return _generate_until_json(client, model, prompt)
+    return _response_text(client.generate(model=model, prompt=prompt, stream=False))
+
+
+@functools.lru_cache(maxsize=None)
+def _client(ollama_host: Optional[str], timeout: int) -> Any:
+    """One client (and connection pool) per host and timeout, shared by every request."""
+    return ollama.Client(host=_normalize_host(ollama_host), timeout=timeout)
+
+
+def _response_text(response: Any) -> str:
     content = response.get("response")
     if isinstance(content, str):
         return content.strip()
@@ -107,6 +136,45 @@ def run_ollama(ollama_host: Optional[str], model: str, prompt: str, timeout: int
     return str(content).strip()
 
 
+def _generate_until_json(client: Any, model: str, prompt: str) -> str:
+    """Stream the response and hang up as soon as the first JSON object closes."""
+    chunks = client.generate(model=model, prompt=prompt, stream=True)
+    scanner = JSONObjectScanner()
+    try:
+        for chunk in chunks:
+            if scanner.feed(chunk.get("response") or ""):
+                break
+    finally:
+        chunks.close()
+    return scanner.json_text() or scanner.text.strip()
+
+
+async def run_ollama_async(client: Any, model: str, prompt: str, timeout: int, stream: bool = False) -> str:
+    """``run_ollama`` on an ``ollama.AsyncClient``; the whole request is abandoned after ``timeout`` seconds."""
+
+    async def request() -> str:
+        if stream:
+            return await _agenerate_until_json(client, model, prompt)
+        return _response_text(await client.generate(model=model, prompt=prompt, stream=False))
+
+    try:
+        return await asyncio.wait_for(request(), timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"no response within {timeout}s") from None
+
+
+async def _agenerate_until_json(client: Any, model: str, prompt: str) -> str:
+    chunks = await client.generate(model=model, prompt=prompt, stream=True)
+    scanner = JSONObjectScanner()
+    try:
+        async for chunk in chunks:
+            if scanner.feed(chunk.get("response") or ""):
+                break
+    finally:
+        await chunks.aclose()
+    return scanner.json_text() or scanner.text.strip()
+
+
 def _normalize_host(host: Optional[str]) -> Optional[str]:
     if not host or host == "ollama":
         return None
@@ -128,6 +196,9 @@ def clean_response(text: str) -> str:
 
 
 def _slice_json_object(text: str) -> str:
+    complete = first_json_object(text)
+    if complete is not None:
+        return complete
     start = text.find("{")
     end = text.rfind("}")
     if start != -1 and end != -1 and end >= start:
@@ -148,6 +219,10 @@ def ensure_json_payload(text: str) -> str:
         data = ast.literal_eval(candidate)
         return json.dumps(data, ensure_ascii=False)
     except (ValueError, SyntaxError):
+        pass
+    try:
+        return repair_json(text)
+    except json.JSONDecodeError:
         return candidate
 
 
@@ -166,7 +241,13 @@ def build_context(profile: Dict[str, Any]) -> str:
     return "\n\n".join(sections).strip()
 
 
-def parse_args() -> argparse.Namespace:
+def context_fingerprint(profile: Dict[str, Any], model: str) -> str:
+    """Hash everything the extraction depends on: the model and the prompt context."""
+    payload = f"{model}\0{build_context(profile)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description=SCHEMA_DESCRIPTION)
     parser.add_argument("--input", type=Path, default=DEFAULT_INPUT, help="Ruta a consolidated_profiles.json.")
     parser.add_argument(
@@ -182,6 +263,20 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument("--model", default="mistral-nemo:latest", help="Modelo Ollama para extracción estructurada.")
     parser.add_argument("--timeout", type=int, default=300, help="Timeout en segundos por solicitud al modelo.")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help=(
+            "Solicitudes simultáneas al modelo (ollama.AsyncClient). Los resultados se escriben "
+            "en el orden de los perfiles. Default: 1 (secuencial)."
+        ),
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Transmitir la respuesta y cortar la generación al cerrarse el primer objeto JSON.",
+    )
     parser.add_argument(
         "--limit",
         type=int,
@@ -214,7 +309,19 @@ def parse_args() -> argparse.Namespace:
         default=DEFAULT_MEDIA_ROOT,
         help="Directorio base donde viven las copias multimedia (default: media_profiles dentro de newapp).",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--text-table",
+        choices=("auto",) + TEXT_TABLE_MODES,
+        default="auto",
+        help=(
+            "Cómo guardar los textos OCR en la salida: inline, embedded (tabla única en el archivo) "
+            "o sidecar (<salida>.texts.json). 'auto' conserva el formato de la entrada."
+        ),
+    )
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error("--concurrency debe ser al menos 1.")
+    return args
 
 
 def _is_blank(value: Any) -> bool:
@@ -253,7 +360,8 @@ def extraction_has_gaps(extraction: Dict[str, Any]) -> bool:
     return False
 
 
-def assign_media_folders(profiles: List[Dict[str, Any]]) -> None:
+def iter_media_folders(profiles: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Yield each profile after tagging it with its media folder (which only depends on earlier profiles)."""
     slug_counts: Dict[str, int] = {}
     name_map: Dict[str, str] = {}
     for idx, profile in enumerate(profiles, start=1):
@@ -262,6 +370,7 @@ def assign_media_folders(profiles: List[Dict[str, Any]]) -> None:
         base = slugify(display)
         if normalized_name and normalized_name in name_map:
             profile["_media_folder"] = name_map[normalized_name]
+            yield profile
             continue
         counter = slug_counts.get(base, 0)
         slug_counts[base] = counter + 1
@@ -269,9 +378,15 @@ def assign_media_folders(profiles: List[Dict[str, Any]]) -> None:
         profile["_media_folder"] = folder
         if normalized_name:
             name_map[normalized_name] = folder
+        yield profile
+
+
+def assign_media_folders(profiles: List[Dict[str, Any]]) -> None:
+    for _ in iter_media_folders(profiles):
+        pass
 
 
-def rewrite_media_paths(profiles: List[Dict[str, Any]], media_root: Path) -> None:
+def rewrite_media_paths(profiles: Iterable[Dict[str, Any]], media_root: Path) -> None:
     prefix = Path(media_root.name) if media_root.name else Path("media_profiles")
     for profile in profiles:
         folder = profile.pop("_media_folder", None)
@@ -307,62 +422,257 @@ def _canonical_media_name(name: str) -> str:
     return (canonical_stem + (dot + ext if dot else "")).lower()
 
 
-def main() -> None:
-    args = parse_args()
-    if not args.input.exists():
-        raise SystemExit(f"No se encontró el archivo de entrada: {args.input}")
+def needs_extraction(profile: Dict[str, Any], args: argparse.Namespace) -> bool:
+    if args.skip_llm:
+        return False
+    existing_extraction = profile.get("extraction")
+    if existing_extraction and not args.overwrite:
+        return bool(args.fill_missing_only and extraction_has_gaps(existing_extraction))
+    return True
 
-    data = json.loads(args.input.read_text())
-    profiles = data.get("profiles", [])
-    if not profiles:
-        raise SystemExit("El archivo no contiene perfiles para procesar.")
-
-    assign_media_folders(profiles)
-    processed = 0
-    iterator = tqdm(profiles, desc="Enriqueciendo perfiles", unit="perfil")
-    for profile in iterator:
-        if args.limit and processed >= args.limit:
-            break
 
-        if args.skip_llm:
-            continue
+def _extraction_prompt(profile: Dict[str, Any]) -> Optional[str]:
+    """The model prompt for ``profile``; None (and a null extraction) when it has no text to extract from."""
+    context = build_context(profile)
+    if not context:
+        profile["extraction"] = None
+        return None
+    return PROMPT_TEMPLATE.format(schema=SCHEMA_JSON, context=context)
 
-        existing_extraction = profile.get("extraction")
-        if existing_extraction and not args.overwrite:
-            if args.fill_missing_only:
-                if not extraction_has_gaps(existing_extraction):
-                    continue
-            else:
-                continue
 
-        context = build_context(profile)
-        if not context:
-            profile["extraction"] = None
-            continue
+def _store_extraction(profile: Dict[str, Any], response: str) -> bool:
+    try:
+        cleaned = clean_response(response)
+        normalized = ensure_json_payload(cleaned)
+        extraction = ProfileExtraction.model_validate_json(normalized)
+    except ValidationError as exc:
+        profile["extraction_error"] = f"Validation error: {exc}"
+        return False
+    except json.JSONDecodeError as exc:
+        profile["extraction_error"] = f"JSON decode error: {exc}"
+        return False
+    except Exception as exc:  # noqa: BLE001
+        profile["extraction_error"] = f"Ollama failed: {exc}"
+        return False
+
+    profile["extraction"] = extraction.model_dump()
+    profile.pop("extraction_error", None)
+    return True
+
+
+def enrich_profile(profile: Dict[str, Any], args: argparse.Namespace) -> bool:
+    """Run the extraction model for one profile; return True when a new extraction was stored."""
+    prompt = _extraction_prompt(profile)
+    if prompt is None:
+        return False
+    try:
+        response = run_ollama(args.ollama_bin, args.model, prompt, args.timeout, args.stream)
+    except Exception as exc:  # noqa: BLE001
+        profile["extraction_error"] = f"Ollama failed: {exc}"
+        return False
+    return _store_extraction(profile, response)
+
+
+class AsyncEnricher:
+    """Send extraction requests from a background event loop, at most ``args.concurrency`` at a time.
+
+    ``submit`` is called from the caller's thread and returns a future resolving
+    to ``(extracted, seconds)``; the profile is updated in place when it resolves.
+    """
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.loop = asyncio.new_event_loop()
+        # No transport timeout: run_ollama_async bounds each whole request instead.
+        self.client = ollama.AsyncClient(host=_normalize_host(args.ollama_bin))
+        self.semaphore = asyncio.Semaphore(args.concurrency)
+        self.futures: Set[Future] = set()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="enrich-async", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "AsyncEnricher":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def submit(self, profile: Dict[str, Any]) -> Future:
+        future = asyncio.run_coroutine_threadsafe(self._enrich(profile), self.loop)
+        self.futures.add(future)
+        future.add_done_callback(self.futures.discard)
+        return future
+
+    async def _enrich(self, profile: Dict[str, Any]) -> Tuple[bool, float]:
+        prompt = _extraction_prompt(profile)
+        if prompt is None:
+            return False, 0.0
+        async with self.semaphore:
+            started = time.perf_counter()
+            try:
+                response = await run_ollama_async(
+                    self.client, self.args.model, prompt, self.args.timeout, self.args.stream
+                )
+            except Exception as exc:  # noqa: BLE001
+                profile["extraction_error"] = f"Ollama failed: {exc}"
+                return False, time.perf_counter() - started
+        return _store_extraction(profile, response), time.perf_counter() - started
+
+    def close(self) -> None:
+        for future in list(self.futures):
+            future.cancel()
+        wait(list(self.futures))
+        asyncio.run_coroutine_threadsafe(self.client.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+def enrich_stream(
+    profiles: Iterable[Dict[str, Any]],
+    args: argparse.Namespace,
+    on_done: Callable[[Dict[str, Any], float], None] | None = None,
+    total: int | None = None,
+) -> Iterator[Tuple[Dict[str, Any], bool]]:
+    """Enrich profiles, yielding each finished profile (in input order) and whether it got a new extraction.
+
+    ``on_done`` is called with each profile sent to the model and the seconds it took.
+    """
+    iterator = tqdm(profiles, desc="Enriqueciendo perfiles", unit="perfil", total=total)
+    if args.concurrency > 1 and not args.skip_llm:
+        yield from _enrich_concurrently(iter_media_folders(iterator), args, on_done)
+        return
+    processed = 0
+    for profile in iter_media_folders(iterator):
+        extracted = False
+        if not (args.limit and processed >= args.limit) and needs_extraction(profile, args):
+            started = time.perf_counter()
+            extracted = enrich_profile(profile, args)
+            if extracted:
+                processed += 1
+            if on_done is not None:
+                on_done(profile, time.perf_counter() - started)
+        rewrite_media_paths([profile], args.media_root)
+        yield profile, extracted
+
+
+def _enrich_concurrently(
+    profiles: Iterable[Dict[str, Any]],
+    args: argparse.Namespace,
+    on_done: Callable[[Dict[str, Any], float], None] | None,
+) -> Iterator[Tuple[Dict[str, Any], bool]]:
+    """``enrich_stream`` with up to ``args.concurrency`` requests in flight.
+
+    Requests finish in any order; ``on_done`` sees them in completion order,
+    while profiles are yielded in input order. At most twice the concurrency
+    profiles are held back waiting for an earlier one, so NDJSON streaming keeps
+    its flat memory. ``--limit`` picks the same profiles as the sequential loop.
+    """
+    window = args.concurrency * 2
+    pending: Deque[Tuple[Dict[str, Any], Optional[Future]]] = deque()
+    inflight: Dict[Future, Dict[str, Any]] = {}
+    results: Dict[Future, bool] = {}
+    processed = 0
 
-        prompt = PROMPT_TEMPLATE.format(schema=SCHEMA_JSON, context=context)
-        try:
-            response = run_ollama(args.ollama_bin, args.model, prompt, args.timeout)
-            cleaned = clean_response(response)
-            normalized = ensure_json_payload(cleaned)
-            extraction = ProfileExtraction.model_validate_json(normalized)
-        except ValidationError as exc:
-            profile["extraction_error"] = f"Validation error: {exc}"
-            continue
-        except json.JSONDecodeError as exc:
-            profile["extraction_error"] = f"JSON decode error: {exc}"
-            continue
-        except Exception as exc:  # noqa: BLE001
-            profile["extraction_error"] = f"Ollama failed: {exc}"
-            continue
+    def settle(futures: Iterable[Future]) -> None:
+        nonlocal processed
+        for future in futures:
+            profile = inflight.pop(future)
+            extracted, seconds = future.result()
+            results[future] = extracted
+            processed += extracted
+            if on_done is not None:
+                on_done(profile, seconds)
+
+    def finish(profile: Dict[str, Any], future: Optional[Future]) -> Tuple[Dict[str, Any], bool]:
+        if future in inflight:
+            future.result()
+            settle([future])
+        rewrite_media_paths([profile], args.media_root)
+        return profile, results.pop(future, False) if future is not None else False
+
+    with AsyncEnricher(args) as enricher:
+        for profile in profiles:
+            future: Optional[Future] = None
+            if needs_extraction(profile, args):
+                # Only count requests that may still be needed to reach the limit.
+                while args.limit and inflight and processed + len(inflight) >= args.limit:
+                    settle(wait(list(inflight), return_when=FIRST_COMPLETED).done)
+                if not (args.limit and processed >= args.limit):
+                    future = enricher.submit(profile)
+                    inflight[future] = profile
+            pending.append((profile, future))
+            settle([done for done in list(inflight) if done.done()])
+            while pending and (len(pending) > window or pending[0][1] is None or pending[0][1].done()):
+                yield finish(*pending.popleft())
+        while pending:
+            yield finish(*pending.popleft())
+
+
+def enrich_payload(
+    data: Dict[str, Any],
+    args: argparse.Namespace,
+    on_done: Callable[[Dict[str, Any], float], None] | None = None,
+) -> int:
+    """Enrich the profiles of a consolidated payload in place; return how many were extracted."""
+    profiles = data.get("profiles", [])
+    if not profiles:
+        raise SystemExit("El archivo no contiene perfiles para procesar.")
+    return sum(1 for _, extracted in enrich_stream(profiles, args, on_done, len(profiles)) if extracted)
+
+
+def run_enrichment(
+    args: argparse.Namespace,
+    data: Dict[str, Any] | None = None,
+    on_done: Callable[[Dict[str, Any], float], None] | None = None,
+) -> Dict[str, Any] | None:
+    """Enrich ``data`` (or the consolidated file at ``args.input``) and write ``args.output``.
+
+    An NDJSON input is streamed: profiles are read, enriched and written one at
+    a time and None is returned instead of the payload.
+    """
+    input_mode = "inline"
+    if data is None:
+        if not args.input.exists():
+            raise SystemExit(f"No se encontró el archivo de entrada: {args.input}")
+        if is_ndjson(args.input):
+            enrich_file_stream(args, on_done)
+            return None
+        data, input_mode = read_payload(args.input)
+    enrich_payload(data, args, on_done)
+    mode = input_mode if args.text_table == "auto" else args.text_table
+    if mode == "inline" or is_ndjson(args.output):
+        write_profiles(args.output, data, args.indent)
+    else:
+        write_payload(data, args.output, mode, args.indent)
+    print(f"Perfiles enriquecidos escritos en {args.output}")
+    return data
+
+
+def enrich_file_stream(
+    args: argparse.Namespace,
+    on_done: Callable[[Dict[str, Any], float], None] | None = None,
+) -> int:
+    """Stream an NDJSON consolidated file through enrichment into ``args.output``; returns profiles written."""
+    if args.text_table not in ("auto", "inline"):
+        raise SystemExit("--text-table solo aplica a salidas JSON de documento único con entrada JSON.")
+    header, profiles = open_profiles(args.input)
+    total = (header.get("summary") or {}).get("unique_profiles")
+    with ProfileWriter(args.output, header, args.indent) as writer:
+        for profile, _ in enrich_stream(profiles, args, on_done, total):
+            writer.write(profile)
+        if not writer.count:
+            raise SystemExit("El archivo no contiene perfiles para procesar.")
+    print(f"Perfiles enriquecidos escritos en {args.output}")
+    return writer.count
 
-        profile["extraction"] = extraction.model_dump()
-        profile.pop("extraction_error", None)
-        processed += 1
 
-    rewrite_media_paths(profiles, args.media_root)
-    args.output.write_text(json.dumps(data, ensure_ascii=False, indent=args.indent))
-    print(f"Perfiles enriquecidos escritos en {args.output}")
+def main() -> None:
+    run_enrichment(parse_args())
 
 
 if __name__ == "__main__":
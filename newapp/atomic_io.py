@@ -0,0 +1,47 @@
+"""Atomic file replacement shared by the pipeline stages.
+
+Every writer goes through a temporary file next to the target that is moved
+into place with ``os.replace``, so readers and concurrent workers never see a
+partial file and an interrupted write leaves the previous version intact.
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+from typing import Tuple
+
+
+def temp_file_beside(path: Path) -> Tuple[int, str]:
+    """Open a temporary file in ``path``'s directory (created if missing); returns ``(fd, name)``."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """Replace ``path`` with ``text`` in one step."""
+    fd, tmp_name = temp_file_beside(path)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(text)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def write_if_changed(path: Path, text: str, existing: str | None = None) -> bool:
+    """Atomically replace ``path`` with ``text`` unless it already holds exactly that; True when written.
+
+    ``existing`` is the file's current text when the caller already read it.
+    """
+    if existing is None:
+        try:
+            existing = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            pass
+    if text == existing:
+        return False
+    atomic_write_text(path, text)
+    return True
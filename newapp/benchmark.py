@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""Benchmark the OCR and enrichment stages offline against fake_ollama.py.
+
+A synthetic PATRON tree is generated in a temporary directory, a fake Ollama
+server is started in-process and the stage functions are driven directly so
+per-item latency can be measured. Reports images/sec, profiles/sec, p50/p95
+latency and peak RSS. ``--merge-sources`` additionally times consolidation's
+list merging for one profile with many sources.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import stat
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import fake_ollama
+from run_pipeline import load_stage
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:  # pragma: no cover - falls back to opaque bytes
+    Image = None
+
+APP_ROOT = Path(__file__).resolve().parent
+PROFILE_NAMES = ["KIMBERLY", "DANIELA", "LESKY", "TIKAS", "YANSY", "MARIA", "SOFIA", "VALERIA"]
+
+
+def build_synthetic_tree(root: Path, profiles: int, screenshots: int, seed: int) -> List[Path]:
+    rng = random.Random(seed)
+    images: List[Path] = []
+    for idx in range(profiles):
+        name = PROFILE_NAMES[idx % len(PROFILE_NAMES)]
+        folder = root / f"{idx} - {name}{idx} ⭐⭐"
+        folder.mkdir(parents=True, exist_ok=True)
+        for shot in range(screenshots):
+            target = folder / f"Screenshot_2026{idx:04d}_{shot:04d}_WhatsApp.jpg"
+            if Image is not None:
+                img = Image.new("RGB", (540, 1200), "white")
+                draw = ImageDraw.Draw(img)
+                for _ in range(12):
+                    x, y = rng.randrange(0, 500), rng.randrange(0, 1160)
+                    draw.rectangle((x, y, x + rng.randrange(10, 40), y + 10), fill="black")
+                img.save(target, format="JPEG", quality=80)
+            else:
+                target.write_bytes(rng.randbytes(64 * 1024))
+            images.append(target)
+        (folder / f"VID-2026{idx:04d}-WA0001.mp4").write_bytes(b"\0" * 1024)
+    return images
+
+
+def write_cli_shim(directory: Path) -> Path:
+    shim = directory / "ollama"
+    shim.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{APP_ROOT / "fake_ollama.py"}" "$@"\n')
+    shim.chmod(shim.stat().st_mode | stat.S_IXUSR)
+    return shim
+
+
+def percentile(values: Sequence[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timed_map(fn: Callable[[Any], Any], items: Sequence[Any], workers: int) -> Tuple[List[float], int, float]:
+    """Run ``fn`` over ``items`` with ``workers`` threads; return latencies, error count and wall time."""
+
+    def _timed(item: Any) -> Tuple[float, bool]:
+        started = time.perf_counter()
+        try:
+            fn(item)
+        except Exception:  # noqa: BLE001 - counted, not fatal
+            return time.perf_counter() - started, False
+        return time.perf_counter() - started, True
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        results = list(executor.map(_timed, items))
+    wall = time.perf_counter() - started
+    return [latency for latency, _ in results], sum(1 for _, ok in results if not ok), wall
+
+
+def summarize(name: str, unit: str, latencies: List[float], errors: int, wall: float) -> Dict[str, Any]:
+    count = len(latencies)
+    return {
+        "stage": name,
+        "items": count,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "unit": unit,
+        "per_s": round(count / wall, 2) if wall else None,
+        "p50_s": round(percentile(latencies, 50) or 0, 4),
+        "p95_s": round(percentile(latencies, 95) or 0, 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def bench_ocr(root: Path, host: str, shim: Path, args: argparse.Namespace) -> Dict[str, Any]:
+    ocr = load_stage(APP_ROOT / "1-process_ocr.py")
+    argv = [
+        "--root", str(root),
+        "--backend", args.backend,
+        "--ollama-host", host,
+        "--ollama-bin", str(shim),
+        "--timeout", str(args.timeout),
+        "--workers", str(args.workers),
+        "--no-cache",
+        "--overwrite",
+    ]
+    for model in args.llm:
+        argv.extend(["--llm", model])
+    if len(args.llm) > 1:
+        argv.extend(["--coordinator", args.llm[0]])
+    if args.stream:
+        argv.append("--stream")
+    ocr_args = ocr.parse_args(argv)
+    backend = ocr.build_backend(ocr_args)
+    images = ocr.discover_images(root)
+    with contextlib.redirect_stdout(io.StringIO()):
+        latencies, errors, wall = timed_map(
+            lambda image: ocr.process_image(image, ocr_args, backend), images, args.workers
+        )
+    return summarize("ocr", "images", latencies, errors, wall)
+
+
+def bench_enrich(root: Path, host: str, args: argparse.Namespace) -> Dict[str, Any]:
+    metadata = load_stage(APP_ROOT / "2-add_metadata.py")
+    consolidate = load_stage(APP_ROOT / "3-consolidate_profiles.py")
+    extend = load_stage(APP_ROOT / "4-extend_profiles.py")
+    files = consolidate.discover_json_files(root)
+    # Folder metadata keys profiles by folder, like a real run, instead of by the canned model name.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for path in files:
+            metadata.process_json_file(path, 2, root)
+    profiles = consolidate.consolidate_profiles(files, root)["profiles"]
+    argv = ["--ollama-bin", host, "--model", args.enrich_model, "--timeout", str(args.timeout)]
+    if args.stream:
+        argv.append("--stream")
+    enrich_args = extend.parse_args(argv)
+    latencies, errors, wall = timed_map(
+        lambda profile: extend.enrich_profile(profile, enrich_args), profiles, args.enrich_workers
+    )
+    errors += sum(1 for profile in profiles if profile.get("extraction_error"))
+    return summarize("enrich", "profiles", latencies, errors, wall)
+
+
+def synthetic_merge_payloads(sources: int, items: int, seed: int) -> List[Dict[str, Any]]:
+    """Structured payloads for one profile whose list fields mostly repeat across sources."""
+    rng = random.Random(seed)
+    services = [f"servicio {idx}" for idx in range(items)]
+    payloads = []
+    for _ in range(sources):
+        payloads.append(
+            {
+                "name": "KIMBERLY",
+                "services": rng.sample(services, k=min(len(services), max(1, items // 4))),
+                "prices": [
+                    {"duration": f"{rng.randrange(1, items)}h", "amount": rng.randrange(10, 300) * 1000}
+                    for _ in range(8)
+                ],
+                "contact": {"phones": [f"8{rng.randrange(1000000, 1000000 + items):07d}"]},
+            }
+        )
+    return payloads
+
+
+def bench_merge(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Merge many sources into one profile, re-fingerprinting lists per call vs. keeping per-bucket sets."""
+    consolidate = load_stage(APP_ROOT / "3-consolidate_profiles.py")
+    payloads = synthetic_merge_payloads(args.merge_sources, args.merge_items, args.seed)
+    results = []
+    for name, shared in (("merge-percall", False), ("merge", True)):
+        target: Dict[str, Any] = {}
+        conflicts: List[Dict[str, Any]] = []
+        seen: Dict[Tuple[str, ...], Any] = {}
+        latencies: List[float] = []
+        started = time.perf_counter()
+        for idx, payload in enumerate(payloads):
+            item_started = time.perf_counter()
+            consolidate._merge_dict(
+                target, payload, conflicts, ["structured_data"], f"source-{idx}", seen if shared else None
+            )
+            latencies.append(time.perf_counter() - item_started)
+        results.append(summarize(name, "sources", latencies, 0, time.perf_counter() - started))
+    return results
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark for the OCR pipeline.")
+    parser.add_argument("--profiles", type=int, default=20, help="Synthetic profile folders (default: 20).")
+    parser.add_argument("--screenshots", type=int, default=5, help="Screenshots per profile (default: 5).")
+    parser.add_argument("--backend", choices=("http", "cli"), default="http", help="OCR backend to exercise.")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent OCR images (default: 4).")
+    parser.add_argument("--enrich-workers", type=int, default=1, help="Concurrent enrichment profiles (default: 1).")
+    parser.add_argument(
+        "--llm",
+        action="append",
+        default=[],
+        help="Structuring model name(s) to request from the fake server (default: none).",
+    )
+    parser.add_argument("--enrich-model", default="fake-enrich", help="Enrichment model name.")
+    parser.add_argument("--stream", action="store_true", help="Exercise the streaming JSON path.")
+    parser.add_argument("--timeout", type=int, default=60, help="Per-request timeout (seconds).")
+    parser.add_argument(
+        "--latency",
+        type=fake_ollama.parse_distribution,
+        default=fake_ollama.parse_distribution("normal:0.2,0.05"),
+        help="Fake model latency distribution (see fake_ollama.py; default: normal:0.2,0.05).",
+    )
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of failed fake requests.")
+    parser.add_argument("--responses", type=Path, help="Recorded responses JSON for the fake server.")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for the tree and the fake server.")
+    parser.add_argument("--skip-enrich", action="store_true", help="Only benchmark the OCR stage.")
+    parser.add_argument(
+        "--merge-sources",
+        type=int,
+        default=0,
+        help="Also benchmark consolidation list merging over this many sources of one profile (default: off).",
+    )
+    parser.add_argument("--merge-items", type=int, default=400, help="Distinct list items per merged field (default: 400).")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here as well.")
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    args = parse_args()
+    fake = fake_ollama.FakeOllama(
+        fake_ollama.load_responses(args.responses),
+        args.latency,
+        {},
+        args.failure_rate,
+        args.seed,
+    )
+    server = fake_ollama.start_server(fake, "127.0.0.1", 0)
+    host = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with tempfile.TemporaryDirectory(prefix="patron-bench-") as tmp:
+            tmp_path = Path(tmp)
+            root = tmp_path / "PATRON"
+            images = build_synthetic_tree(root, args.profiles, args.screenshots, args.seed)
+            shim = write_cli_shim(tmp_path)
+            # The CLI shim (and ollama.Client defaults) read the server address from here.
+            os.environ["OLLAMA_HOST"] = host
+            print(f"Synthetic tree: {len(images)} screenshots in {args.profiles} profiles; fake Ollama at {host}")
+            results = [bench_ocr(root, host, shim, args)]
+            if not args.skip_enrich:
+                results.append(bench_enrich(root, host, args))
+            if args.merge_sources:
+                results.extend(bench_merge(args))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    server_requests = fake.stats()["requests"]
+    report = {
+        "config": {
+            "profiles": args.profiles,
+            "screenshots": args.screenshots,
+            "backend": args.backend,
+            "workers": args.workers,
+            "enrich_workers": args.enrich_workers,
+            "llm": args.llm,
+            "stream": args.stream,
+            "failure_rate": args.failure_rate,
+        },
+        "stages": results,
+        "server": {
+            "requests": len(server_requests),
+            "failed": sum(1 for entry in server_requests if entry["status"] == "failed"),
+            "cancelled": sum(1 for entry in server_requests if entry["status"] == "cancelled"),
+        },
+    }
+    for stage in results:
+        print(
+            f"{stage['stage']:<7} {stage['items']:>5} items  {stage['wall_s']:>8.2f}s  "
+            f"{stage['per_s']:>8} {stage['unit']}/s  "
+            f"p50 {stage['p50_s']:.3f}s  p95 {stage['p95_s']:.3f}s  "
+            f"errors {stage['errors']}  peak RSS {stage['peak_rss_mb']} MB"
+        )
+    print(f"fake server: {report['server']}")
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
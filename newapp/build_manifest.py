@@ -0,0 +1,126 @@
+"""Make-style build manifest for incremental pipeline runs.
+
+For every stage the manifest remembers, per item (image, sidecar, profile
+folder or profile), the content hash of the inputs it was built from and of the
+output it produced. A later run compares fresh hashes against it to decide
+what is stale, and can explain why each item is rebuilt. Items that are plain
+files also keep their size and mtime, so unchanged files are not re-read.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from atomic_io import atomic_write_text
+
+MANIFEST_VERSION = 1
+
+
+def bytes_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_stamp(path: Path) -> str:
+    stat = path.stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def json_digest(payload: Any) -> str:
+    """Hash a JSON-serialisable value independently of key order."""
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return bytes_digest(encoded.encode("utf-8"))
+
+
+class BuildManifest:
+    """Per-stage ``{item: {"input": hash, "output": hash}}`` table persisted as JSON."""
+
+    def __init__(self, path: Path, explain: bool = False) -> None:
+        self.path = path
+        self.explain = explain
+        self.stages: Dict[str, Dict[str, Dict[str, Optional[str]]]] = {}
+        if path.exists():
+            try:
+                payload = json.loads(path.read_text())
+            except json.JSONDecodeError:
+                payload = {}
+            if payload.get("version") == MANIFEST_VERSION:
+                self.stages = payload.get("stages") or {}
+        self.rebuilt: Dict[str, int] = {}
+        self.fresh: Dict[str, int] = {}
+
+    def stage(self, name: str) -> Dict[str, Dict[str, Optional[str]]]:
+        return self.stages.setdefault(name, {})
+
+    def stale_reason(self, stage: str, item: str, input_hash: str, output_hash: str | None = None) -> str | None:
+        """Return why ``item`` must be rebuilt, or None when its recorded entry still matches.
+
+        ``output_hash`` is the hash of the output currently on disk (or in
+        memory); pass it to also catch outputs edited or lost since the last run.
+        """
+        entry = self.stage(stage).get(item)
+        if entry is None:
+            reason = "new item"
+        elif entry.get("input") != input_hash:
+            reason = "inputs changed"
+        elif output_hash is not None and entry.get("output") != output_hash:
+            reason = "output missing" if output_hash == "" else "output changed since last build"
+        else:
+            self.mark_fresh(stage)
+            return None
+        self.rebuilt[stage] = self.rebuilt.get(stage, 0) + 1
+        if self.explain:
+            print(f"[explain] {stage}: rebuild {item} ({reason})")
+        return reason
+
+    def file_input(self, stage: str, item: str, path: Path) -> Tuple[str, str]:
+        """Return the content hash and stamp of ``path``; the recorded hash is reused while the stamp matches."""
+        stamp = file_stamp(path)
+        entry = self.stage(stage).get(item)
+        if entry is not None and entry.get("stamp") == stamp and entry.get("input"):
+            return str(entry["input"]), stamp
+        return file_digest(path), stamp
+
+    def mark_fresh(self, stage: str) -> None:
+        self.fresh[stage] = self.fresh.get(stage, 0) + 1
+
+    def record(
+        self,
+        stage: str,
+        item: str,
+        input_hash: str,
+        output_hash: str | None = None,
+        stamp: str | None = None,
+    ) -> None:
+        entry: Dict[str, Optional[str]] = {"input": input_hash, "output": output_hash}
+        if stamp is not None:
+            entry["stamp"] = stamp
+        self.stage(stage)[item] = entry
+
+    def prune(self, stage: str, keep: Iterable[str]) -> List[str]:
+        """Forget items that no longer exist; returns the removed keys."""
+        keep_set = set(keep)
+        entries = self.stage(stage)
+        removed = sorted(key for key in entries if key not in keep_set)
+        for key in removed:
+            entries.pop(key)
+            if self.explain:
+                print(f"[explain] {stage}: {key} removed since last build")
+        return removed
+
+    def summary(self, stage: str) -> str:
+        return f"{stage}: {self.rebuilt.get(stage, 0)} rebuilt, {self.fresh.get(stage, 0)} up to date"
+
+    def save(self) -> None:
+        payload = {"version": MANIFEST_VERSION, "stages": self.stages}
+        atomic_write_text(self.path, json.dumps(payload, indent=2, sort_keys=True))
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""Offline stand-in for Ollama that replays recorded responses.
+
+``serve`` starts an HTTP server that speaks enough of the Ollama API
+(``/api/generate``, ``/api/tags``, ``/api/version``) for ``ollama.Client`` and
+the stages in this folder. Latency and failures are drawn from configurable
+distributions so throughput can be measured without real models.
+
+``run`` mimics ``ollama run MODEL PROMPT`` by forwarding the prompt to the fake
+server (``OLLAMA_HOST``), which lets 1-process_ocr.py's CLI backend use it
+through a tiny shell shim.
+
+``serve --upstream URL --record FILE`` proxies a real Ollama and stores the
+responses it returns, producing a recording to replay later.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+DEFAULT_PORT = 11435
+STREAM_CHUNK_CHARS = 12
+
+DEFAULT_RESPONSES: Dict[str, List[str]] = {
+    "ocr": [
+        "Nombre: Kimberly\nEdad: 23 años\nZona donde vive: Escazú\nEstatura: 1.62 m\n"
+        "Cabello: negro\n1 hora 100 mil\n2 horas ₡180.000\nToda la noche $500\n"
+        "WhatsApp +506 8888-1234",
+        "Hola amor, soy Daniela, 25 años\nUbicación: Heredia\n1 hora ₡90.000\n"
+        "Servicios: masajes, cena",
+    ],
+    "structure": [
+        '{"name": "Kimberly", "age": 23, "location": "Escazú", "prices": '
+        '[{"duration": "1 hora", "amount": 100000, "currency": "CRC"}], "services": [], '
+        '"contact": {"whatsapp": "+50688881234", "phone": null, "email": null, "social": null}, '
+        '"attributes": {"height": "1.62 m", "weight": null, "hair_color": "negro", "eye_color": null, '
+        '"implants": null, "measurements": null}, "raw_text": "Kimberly, 23 años, de Escazú"}',
+    ],
+    "enrich": [
+        '{"name": "Kimberly", "age": 23, "height": "1.62 m", "weight": null, "hair_color": "negro", '
+        '"eye_color": null, "location": "Escazú", "availability": null, "contact": "+506 8888-1234", '
+        '"prices": {"one_hour": "100000 CRC", "two_hours": "180000 CRC", "three_hours": null, '
+        '"overnight": "$500"}, "implants": null, "uber": null, "cosmetic_surgeries": null, '
+        '"other_attributes": null}',
+    ],
+}
+
+
+def parse_distribution(spec: str) -> Callable[[random.Random], float]:
+    """Parse ``fixed:S``, ``uniform:LO,HI``, ``normal:MEAN,SD`` or ``lognormal:MU,SIGMA`` (seconds)."""
+    kind, _, raw = spec.partition(":")
+    try:
+        values = [float(part) for part in raw.split(",")] if raw else []
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"Invalid latency distribution: {spec!r}") from exc
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise argparse.ArgumentTypeError(f"Invalid latency distribution: {spec!r}")
+
+
+def _model_override(value: str) -> tuple[str, Callable[[random.Random], float]]:
+    model, sep, spec = value.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"Expected MODEL=DISTRIBUTION, got {value!r}")
+    return model, parse_distribution(spec)
+
+
+class FakeOllama:
+    """Response, latency and failure policy shared by every request handler."""
+
+    def __init__(
+        self,
+        responses: Dict[str, List[str]],
+        latency: Callable[[random.Random], float],
+        model_latency: Dict[str, Callable[[random.Random], float]],
+        failure_rate: float,
+        seed: int | None,
+        upstream: str | None = None,
+        record_path: Path | None = None,
+    ) -> None:
+        self.responses = responses
+        self.latency = latency
+        self.model_latency = model_latency
+        self.failure_rate = failure_rate
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.record_path = record_path
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests: List[Dict[str, Any]] = []
+
+    def classify(self, payload: Dict[str, Any]) -> str:
+        if payload.get("images") or str(payload.get("prompt", "")).startswith("Text Recognition"):
+            return "ocr"
+        if "esquema Pydantic" in str(payload.get("prompt", "")):
+            return "enrich"
+        return "structure"
+
+    def pick_response(self, payload: Dict[str, Any]) -> str:
+        model = str(payload.get("model", ""))
+        kind = self.classify(payload)
+        choices = self.responses.get(model) or self.responses.get(kind) or DEFAULT_RESPONSES[kind]
+        # Deterministic per prompt (and image) so repeated runs replay the same answers.
+        key = str(payload.get("prompt", "")) + "".join(str(image) for image in payload.get("images") or [])
+        digest = hashlib.sha256(key.encode("utf-8")).digest()
+        return choices[int.from_bytes(digest[:4], "big") % len(choices)]
+
+    def draw(self, model: str) -> tuple[float, bool]:
+        with self._lock:
+            latency = self.model_latency.get(model, self.latency)(self._rng)
+            failed = self._rng.random() < self.failure_rate
+        return latency, failed
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self.requests.append(entry)
+
+    def proxy(self, payload: Dict[str, Any]) -> str:
+        body = dict(payload, stream=False)
+        request = urllib.request.Request(
+            f"{self.upstream}/api/generate",
+            data=json.dumps(body).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request) as response:  # noqa: S310 - operator-supplied URL
+            text = json.loads(response.read()).get("response", "")
+        if self.record_path is not None:
+            with self._lock:
+                recorded = self.responses.setdefault(str(payload.get("model", "")), [])
+                if text not in recorded:
+                    recorded.append(text)
+                self.record_path.write_text(json.dumps(self.responses, indent=2, ensure_ascii=False))
+        return text
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = list(self.requests)
+        return {"requests": requests}
+
+
+def make_handler(fake: FakeOllama) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - stdlib signature
+            return
+
+        def _send_json(self, status: int, payload: Any) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_HEAD(self) -> None:  # noqa: N802 - stdlib naming
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self) -> None:  # noqa: N802
+            if self.path == "/api/version":
+                self._send_json(200, {"version": "0.0.0-fake"})
+            elif self.path == "/api/tags":
+                models = sorted(set(fake.responses) - set(DEFAULT_RESPONSES))
+                self._send_json(200, {"models": [{"name": name, "model": name} for name in models]})
+            elif self.path == "/_stats":
+                self._send_json(200, fake.stats())
+            else:
+                self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+
+        def do_POST(self) -> None:  # noqa: N802
+            if self.path != "/api/generate":
+                self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            model = str(payload.get("model", ""))
+            started = time.perf_counter()
+            latency, failed = fake.draw(model)
+            entry = {"model": model, "kind": fake.classify(payload), "latency_s": latency, "status": "ok"}
+            if failed:
+                time.sleep(latency / 2)
+                entry["status"] = "failed"
+                fake.record(entry)
+                self._send_json(500, {"error": "simulated model failure"})
+                return
+            try:
+                text = fake.proxy(payload) if fake.upstream else fake.pick_response(payload)
+            except (urllib.error.URLError, OSError) as exc:
+                entry["status"] = "upstream_error"
+                fake.record(entry)
+                self._send_json(502, {"error": f"upstream failed: {exc}"})
+                return
+            if payload.get("stream", True):
+                entry["status"] = self._stream(model, text, latency)
+            else:
+                time.sleep(latency)
+                self._send_json(200, self._final_chunk(model, text, payload, response=text))
+            entry["service_s"] = round(time.perf_counter() - started, 4)
+            fake.record(entry)
+
+        def _final_chunk(self, model: str, text: str, payload: Dict[str, Any], response: str) -> Dict[str, Any]:
+            return {
+                "model": model,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "response": response,
+                "done": True,
+                "done_reason": "stop",
+                "prompt_eval_count": len(str(payload.get("prompt", ""))) // 4,
+                "eval_count": max(1, len(text) // 4),
+            }
+
+        def _stream(self, model: str, text: str, latency: float) -> str:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            pieces = [text[i : i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+            delay = latency / len(pieces)
+            try:
+                for piece in pieces:
+                    time.sleep(delay)
+                    self._write_chunk({"model": model, "response": piece, "done": False})
+                self._write_chunk(self._final_chunk(model, text, {}, response=""))
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client hung up early (e.g. once its JSON object closed).
+                self.close_connection = True
+                return "cancelled"
+            return "ok"
+
+        def _write_chunk(self, payload: Dict[str, Any]) -> None:
+            data = (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # Clients hang up mid-stream on purpose (early JSON stop, timeouts).
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+def start_server(fake: FakeOllama, host: str, port: int) -> FakeOllamaServer:
+    """Start the server on a daemon thread; ``port=0`` picks a free port."""
+    server = FakeOllamaServer((host, port), make_handler(fake))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def load_responses(path: Optional[Path]) -> Dict[str, List[str]]:
+    if not path or not path.exists():
+        return {}
+    data = json.loads(path.read_text())
+    return {key: value if isinstance(value, list) else [value] for key, value in data.items()}
+
+
+def run_cli(model: str, prompt: str) -> int:
+    """Behave like ``ollama run``: print the response or exit non-zero with the error."""
+    host = os.environ.get("OLLAMA_HOST") or f"http://127.0.0.1:{DEFAULT_PORT}"
+    if not host.startswith("http"):
+        host = f"http://{host}"
+    request = urllib.request.Request(
+        f"{host.rstrip('/')}/api/generate",
+        data=json.dumps({"model": model, "prompt": prompt, "stream": False}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request) as response:  # noqa: S310 - local fake server
+            print(json.loads(response.read()).get("response", ""))
+    except urllib.error.HTTPError as exc:
+        print(f"Error: {exc.read().decode('utf-8', 'replace')}", file=sys.stderr)
+        return 1
+    except urllib.error.URLError as exc:
+        print(f"Error: could not reach {host}: {exc.reason}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline stand-in for the Ollama CLI and HTTP API.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="Serve the fake Ollama HTTP API.")
+    serve.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1).")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT}).")
+    serve.add_argument(
+        "--responses",
+        type=Path,
+        help="JSON file mapping model names (or 'ocr'/'structure'/'enrich') to lists of recorded responses.",
+    )
+    serve.add_argument(
+        "--latency",
+        type=parse_distribution,
+        default=parse_distribution("fixed:0.05"),
+        help="Latency distribution in seconds: fixed:S, uniform:LO,HI, normal:MEAN,SD, lognormal:MU,SIGMA.",
+    )
+    serve.add_argument(
+        "--model-latency",
+        type=_model_override,
+        action="append",
+        default=[],
+        help="Per-model latency override as MODEL=DISTRIBUTION. Repeat for more models.",
+    )
+    serve.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500.")
+    serve.add_argument("--seed", type=int, help="Random seed for reproducible latency/failure draws.")
+    serve.add_argument("--upstream", help="Proxy requests to this real Ollama URL instead of replaying.")
+    serve.add_argument("--record", type=Path, help="With --upstream, append every response to this JSON file.")
+
+    run = sub.add_parser("run", help="Mimic 'ollama run MODEL PROMPT' against the fake server.")
+    run.add_argument("model")
+    run.add_argument("prompt", nargs=argparse.REMAINDER)
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    args = parse_args()
+    if args.command == "run":
+        raise SystemExit(run_cli(args.model, " ".join(args.prompt)))
+
+    responses = load_responses(args.record if args.upstream else args.responses)
+    fake = FakeOllama(
+        responses,
+        args.latency,
+        dict(args.model_latency),
+        args.failure_rate,
+        args.seed,
+        upstream=args.upstream,
+        record_path=args.record,
+    )
+    server = FakeOllamaServer((args.host, args.port), make_handler(fake))
+    mode = f"proxying {args.upstream}" if args.upstream else "replaying recorded responses"
+    print(f"Fake Ollama listening on http://{args.host}:{server.server_address[1]} ({mode})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Folder-name labels shared by the metadata, consolidation and media-mover tools.
+
+Profile folders look like ``4 - KIMBERLY ⭐⭐⭐⭐⭐`` or ``1 (diosa)``; the parent
+folders above them are category labels. Parsing a folder name is a pure
+function of the name, so every name is parsed once and ``FolderLabelIndex``
+keeps both the parsed names and, per scanned directory, its profile label and
+category labels; both tables are persisted between runs. All tools derive
+profile keys, display names and emojis from here so they agree on which
+profile a folder belongs to.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import unicodedata
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from atomic_io import atomic_write_text
+
+APP_ROOT = Path(__file__).resolve().parent
+DEFAULT_INDEX = APP_ROOT / "folder_labels.json"
+# Bump whenever the parsing rules below change so persisted labels are rebuilt.
+RULES_VERSION = 2
+
+EMOJI_PATTERN = re.compile(
+    r"[\u2600-\u27BF\u2B50\u231A-\u231B\u23E9-\u23EC\u23F0\u23F3\u25FD-\u25FE"
+    r"\U0001F004\U0001F0CF\U0001F170-\U0001F251\U0001F300-\U0001FAD6"
+    r"\U0001F680-\U0001F6FF\U0001F900-\U0001F9FF\U0001FA70-\U0001FAFF]+",
+    flags=re.UNICODE,
+)
+DIGIT_PATTERN = re.compile(r"\d+")
+PAREN_CONTENT_PATTERN = re.compile(r"\(([^()]+)\)")
+NUMBER_PREFIX_PATTERN = re.compile(r"^\d+\s*[-.)]\s*")
+
+
+def _prefer_parenthetical(text: str) -> str:
+    """Return the inner text of the first parentheses if available."""
+    match = PAREN_CONTENT_PATTERN.search(text)
+    if match:
+        inner = match.group(1).strip()
+        if inner:
+            return inner
+    return text.strip()
+
+
+def strip_prefix(folder: str) -> str:
+    parts = folder.split("-", 1)
+    base = parts[1].strip() if len(parts) == 2 else folder
+    return _prefer_parenthetical(base)
+
+
+def separate_emojis(text: str) -> Tuple[str, str]:
+    emojis = "".join(EMOJI_PATTERN.findall(text))
+    base = EMOJI_PATTERN.sub("", text).strip()
+    digits_only = DIGIT_PATTERN.fullmatch(base)
+    if digits_only and emojis:
+        digits = digits_only.group(0)
+        if emojis.endswith(digits):
+            emojis = emojis[:-len(digits)]
+        base = base[len(digits):].strip()
+    return (base or text.strip(), emojis)
+
+
+def normalize_token(value: str) -> str:
+    """ASCII-fold ``value`` into a lowercase ``snake_case`` token (accents and emojis dropped)."""
+    value = unicodedata.normalize("NFKD", value)
+    value = "".join(ch for ch in value if not unicodedata.combining(ch))
+    value = value.strip().lower()
+    value = value.replace("&", " and ")
+    value = value.replace("_", " ")
+    value = re.sub(r"[^a-z0-9]+", "_", value)
+    value = re.sub(r"_+", "_", value).strip("_")
+    return value
+
+
+def profile_key(name: str) -> str:
+    """Bucket key for a profile name; falls back to casefolding for names with no ASCII letters."""
+    return normalize_token(name) or name.strip().casefold()
+
+
+def candidate_names(component: str) -> List[str]:
+    """Labels a folder may be known by, most literal first."""
+    raw = component.strip()
+    out: List[str] = []
+
+    def add(item: str) -> None:
+        item = item.strip()
+        if item and item not in out:
+            out.append(item)
+
+    add(raw)
+    # "4 - KIMBERLY ⭐⭐⭐⭐⭐" -> "KIMBERLY ⭐⭐⭐⭐⭐"
+    add(NUMBER_PREFIX_PATTERN.sub("", raw))
+    # "1 (diosa)" -> "diosa"
+    for inner in re.findall(r"\(([^)]+)\)", raw):
+        add(inner)
+    # Right-most meaningful part for labels like "0 - TIKAS".
+    if "-" in raw:
+        parts = [part.strip() for part in raw.split("-") if part.strip()]
+        if parts:
+            add(parts[-1])
+    add(separate_emojis(strip_prefix(raw))[0])
+    return out
+
+
+@dataclass(frozen=True)
+class FolderLabel:
+    name: str
+    base: str
+    display: str
+    key: str
+    emoji: str
+    candidates: Tuple[str, ...]
+    candidate_keys: Tuple[str, ...]
+
+
+def parse_folder(name: str) -> FolderLabel:
+    base = strip_prefix(name)
+    display, emoji = separate_emojis(base)
+    candidates = tuple(candidate_names(name))
+    keys: List[str] = []
+    for label in candidates:
+        token = normalize_token(label)
+        if token and token not in keys:
+            keys.append(token)
+    return FolderLabel(name, base, display, profile_key(display), emoji, candidates, tuple(keys))
+
+
+@dataclass(frozen=True)
+class DirectoryLabel:
+    """A directory's own label plus the category labels of the folders above it (outermost first)."""
+
+    path: str
+    label: FolderLabel
+    categories: Tuple[FolderLabel, ...]
+
+    @property
+    def key(self) -> str:
+        return self.label.key
+
+    @property
+    def display(self) -> str:
+        return self.label.display
+
+    @property
+    def emoji(self) -> str:
+        return self.label.emoji
+
+
+class FolderLabelIndex:
+    """Memoized folder-name and directory label tables persisted as JSON between runs.
+
+    ``labels`` maps a folder name to its parsed ``FolderLabel``; ``directories``
+    maps each directory seen by ``scan`` (absolute path) to the folder names
+    from the scanned root down to it, so ``directory`` can answer without
+    walking or parsing again. A ``path`` of None keeps everything in memory.
+    """
+
+    def __init__(self, path: Optional[Path] = DEFAULT_INDEX) -> None:
+        self.path = path
+        self.labels: Dict[str, FolderLabel] = {}
+        self.directories: Dict[str, Tuple[str, ...]] = {}
+        self._dirty = False
+        if path is not None and path.exists():
+            try:
+                payload = json.loads(path.read_text(encoding="utf-8"))
+            except json.JSONDecodeError:
+                payload = {}
+            if payload.get("rules") == RULES_VERSION:
+                for name, fields in (payload.get("labels") or {}).items():
+                    fields["candidates"] = tuple(fields["candidates"])
+                    fields["candidate_keys"] = tuple(fields["candidate_keys"])
+                    self.labels[name] = FolderLabel(**fields)
+                for directory, parts in (payload.get("directories") or {}).items():
+                    self.directories[directory] = tuple(parts)
+
+    def label(self, name: str) -> FolderLabel:
+        found = self.labels.get(name)
+        if found is None:
+            found = self.labels[name] = parse_folder(name)
+            self._dirty = True
+        return found
+
+    def directory(self, path: Path, root: Optional[Path] = None) -> DirectoryLabel:
+        """Labels of directory ``path``; categories are the folders between ``root`` (or the scanned root) and it.
+
+        Directories that were never scanned are labelled from ``root`` when
+        given, otherwise by their own name only.
+        """
+        key = str(path)
+        parts = self.directories.get(key)
+        if root is not None:
+            expected = path.relative_to(root).parts
+            if parts != expected:
+                parts = self.directories[key] = expected
+                self._dirty = True
+        elif parts is None:
+            parts = (path.name,)
+        labels = [self.label(part) for part in parts]
+        return DirectoryLabel(key, labels[-1], tuple(labels[:-1]))
+
+    def scan(self, root: Path) -> None:
+        """Walk ``root`` once and record every directory below it; forgets directories that disappeared."""
+        root = root.resolve()
+        seen: Dict[str, Tuple[str, ...]] = {}
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = sorted(name for name in dirnames if not name.startswith("."))
+            base = Path(dirpath).relative_to(root).parts
+            for name in dirnames:
+                seen[str(Path(dirpath) / name)] = base + (name,)
+                self.label(name)
+        prefix = str(root) + os.sep
+        stale = [key for key in self.directories if key.startswith(prefix) and key not in seen]
+        for key in stale:
+            del self.directories[key]
+        changed = {key: parts for key, parts in seen.items() if self.directories.get(key) != parts}
+        self.directories.update(changed)
+        if stale or changed:
+            self._dirty = True
+
+    def save(self) -> None:
+        """Persist the tables if anything was parsed or scanned since they were loaded."""
+        if self.path is None or not self._dirty:
+            return
+        payload = {
+            "rules": RULES_VERSION,
+            "labels": {name: asdict(label) for name, label in sorted(self.labels.items())},
+            "directories": {key: list(parts) for key, parts in sorted(self.directories.items())},
+        }
+        atomic_write_text(self.path, json.dumps(payload, indent=2, ensure_ascii=False))
+        self._dirty = False
+
+
+_default_index: Optional[FolderLabelIndex] = None
+
+
+def default_index() -> FolderLabelIndex:
+    """Process-wide index backed by ``DEFAULT_INDEX``."""
+    global _default_index
+    if _default_index is None:
+        _default_index = FolderLabelIndex()
+    return _default_index
@@ -0,0 +1,177 @@
+"""Incremental JSON helpers shared by the Ollama-calling stages.
+
+Models often wrap their answer in markdown fences, append chatty explanations or
+get cut off mid-object. ``JSONObjectScanner`` follows a streamed response and
+reports as soon as the first top-level object closes, so generation can be
+stopped early; ``repair_json`` closes a truncated object locally, keeping only
+the members that were complete, instead of discarding the whole call.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import List, Tuple
+
+
+class JSONObjectScanner:
+    """Track brace depth over streamed text until the first top-level object closes."""
+
+    def __init__(self) -> None:
+        self._parts: List[str] = []
+        self._length = 0
+        self._start = -1
+        self._end = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def complete(self) -> bool:
+        return self._end != -1
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> bool:
+        """Consume ``chunk`` and return True once a complete object has been seen."""
+        if self.complete or not chunk:
+            self._parts.append(chunk)
+            self._length += len(chunk)
+            return self.complete
+        offset = self._length
+        self._parts.append(chunk)
+        self._length += len(chunk)
+        for idx, char in enumerate(chunk):
+            if self._start == -1:
+                if char == "{":
+                    self._start = offset + idx
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._end = offset + idx
+                    return True
+        return False
+
+    def json_text(self) -> str | None:
+        """Return the first complete top-level object, if one has closed."""
+        if not self.complete:
+            return None
+        return self.text[self._start : self._end + 1]
+
+    def partial_text(self) -> str | None:
+        """Return everything from the first ``{`` onwards, complete or not."""
+        if self._start == -1:
+            return None
+        return self.text[self._start :]
+
+
+def first_json_object(text: str) -> str | None:
+    scanner = JSONObjectScanner()
+    scanner.feed(text)
+    return scanner.json_text()
+
+
+def _scan_state(text: str) -> Tuple[List[str], bool, List[int]]:
+    """Return the open bracket stack, whether a string is open and safe truncation offsets.
+
+    Truncation offsets sit just before each comma and just after each opening
+    bracket, i.e. the places where a prefix ends on a complete member.
+    """
+    stack: List[str] = []
+    cuts: List[int] = []
+    in_string = False
+    escape = False
+    for idx, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append(char)
+            cuts.append(idx + 1)
+        elif char in "}]":
+            if stack:
+                stack.pop()
+        elif char == ",":
+            cuts.append(idx)
+    return stack, in_string, cuts
+
+
+def _close(text: str) -> str:
+    stack, _, _ = _scan_state(text)
+    closed = text.rstrip().rstrip(", \n\t")
+    closers = {"{": "}", "[": "]"}
+    return closed + "".join(closers[char] for char in reversed(stack))
+
+
+def _ends_on_closed_value(text: str) -> bool:
+    """Whether ``text`` stops right after a value that cannot have been cut off.
+
+    Closed strings and containers and the ``true``/``false``/``null`` literals
+    are complete; a trailing number may have been cut mid-digits.
+    """
+    _, in_string, _ = _scan_state(text)
+    if in_string:
+        return False
+    stripped = text.rstrip()
+    return stripped.endswith(('"', "}", "]")) or stripped.endswith(("true", "false", "null"))
+
+
+def repair_json(text: str) -> str:
+    """Close a truncated JSON object so it parses, dropping every member whose value was cut off.
+
+    Members whose value is a closed string or container are kept; a cut-off
+    string, number or missing value is dropped with its key. Raises
+    ``json.JSONDecodeError`` when nothing parseable can be recovered.
+    """
+    start = text.find("{")
+    if start == -1:
+        raise json.JSONDecodeError("No JSON object found", text, 0)
+    candidate = text[start:].rstrip()
+    if candidate.endswith("```"):
+        candidate = candidate[:-3]
+    _, _, cuts = _scan_state(candidate)
+    last_error: json.JSONDecodeError | None = None
+    full = [len(candidate)] if _ends_on_closed_value(candidate) else []
+    for cut in full + list(reversed(cuts)):
+        attempt = _close(candidate[:cut])
+        try:
+            json.loads(attempt)
+        except json.JSONDecodeError as exc:
+            last_error = exc
+            continue
+        return attempt
+    assert last_error is not None
+    raise last_error
+
+
+def loads_lenient(text: str) -> Tuple[dict, bool]:
+    """Parse the first JSON object in ``text``; return it and whether it had to be repaired."""
+    complete = first_json_object(text)
+    if complete is not None:
+        try:
+            return json.loads(complete), False
+        except json.JSONDecodeError:
+            pass
+    return json.loads(repair_json(text)), True
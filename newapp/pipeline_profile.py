@@ -0,0 +1,292 @@
+"""Per-stage resource accounting for run_pipeline.py --profile.
+
+Each stage records wall and CPU time, peak RSS and file I/O bytes; optionally a
+cProfile dump and a tracemalloc snapshot. Peak RSS is the stage's own: on Linux
+the high-water mark is reset before each stage, and subprocess stages report
+the peak of their own child process. Stages may also report per-item
+timings (images, profiles) so the slowest ones can be listed. The result is a
+JSON report plus a short human-readable summary.
+
+cProfile only sees the thread that entered the stage (worker pools show up as
+time spent waiting on them); stages run as subprocesses write their own dump,
+which is summarised afterwards.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# ru_maxrss is in kilobytes on Linux and bytes on macOS; ru_inblock/ru_oublock count 512-byte blocks.
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+BLOCK_SIZE = 512
+
+
+def _rusage() -> Tuple[resource.struct_rusage, resource.struct_rusage]:
+    return resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+
+
+def _proc_io() -> Dict[str, int] | None:
+    try:
+        text = Path("/proc/self/io").read_text()
+    except OSError:
+        return None
+    counters: Dict[str, int] = {}
+    for line in text.splitlines():
+        key, _, value = line.partition(":")
+        counters[key.strip()] = int(value)
+    return counters
+
+
+def io_counters() -> Dict[str, int]:
+    """Bytes read/written by this process (storage level when /proc is available) plus finished children."""
+    self_usage, child_usage = _rusage()
+    proc = _proc_io()
+    if proc is not None:
+        read_bytes, write_bytes = proc.get("read_bytes", 0), proc.get("write_bytes", 0)
+        rchar, wchar = proc.get("rchar", 0), proc.get("wchar", 0)
+    else:
+        read_bytes, write_bytes = self_usage.ru_inblock * BLOCK_SIZE, self_usage.ru_oublock * BLOCK_SIZE
+        rchar, wchar = read_bytes, write_bytes
+    child_read = child_usage.ru_inblock * BLOCK_SIZE
+    child_write = child_usage.ru_oublock * BLOCK_SIZE
+    return {
+        "read_bytes": read_bytes + child_read,
+        "write_bytes": write_bytes + child_write,
+        "read_chars": rchar + child_read,
+        "write_chars": wchar + child_write,
+    }
+
+
+def _cpu_seconds() -> float:
+    self_usage, child_usage = _rusage()
+    return (
+        self_usage.ru_utime + self_usage.ru_stime + child_usage.ru_utime + child_usage.ru_stime
+    )
+
+
+def _peak_rss_mb() -> Tuple[float, float]:
+    """Lifetime peak RSS of this process and of its largest reaped child."""
+    self_usage, child_usage = _rusage()
+    return _maxrss_mb(self_usage), _maxrss_mb(child_usage)
+
+
+def _maxrss_mb(usage: resource.struct_rusage) -> float:
+    return usage.ru_maxrss * RSS_UNIT / (1024 * 1024)
+
+
+def reset_peak_rss() -> bool:
+    """Reset this process's RSS high-water mark (Linux ``clear_refs``); False when unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as handle:
+            handle.write("5")
+    except OSError:
+        return False
+    return _vm_hwm_mb() is not None
+
+
+def _vm_hwm_mb() -> float | None:
+    try:
+        status = Path("/proc/self/status").read_text()
+    except OSError:
+        return None
+    match = re.search(r"^VmHWM:\s+(\d+)\s+kB", status, re.MULTILINE)
+    return int(match.group(1)) / 1024 if match else None
+
+
+def run_child(cmd: Sequence[str]) -> resource.struct_rusage:
+    """Run ``cmd`` like ``subprocess.run(check=True)`` and return that child's own resource usage."""
+    process = subprocess.Popen(cmd)  # noqa: S603
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, list(cmd))
+    return usage
+
+
+def _mb(value: float) -> float:
+    return round(value / (1024 * 1024), 2)
+
+
+class PipelineProfiler:
+    """Collect stage measurements for one pipeline run and write them as a report."""
+
+    def __init__(
+        self,
+        report_path: Path,
+        top: int = 10,
+        cprofile: bool = False,
+        trace_memory: bool = False,
+    ) -> None:
+        self.report_path = report_path
+        self.top = top
+        self.cprofile = cprofile
+        self.trace_memory = trace_memory
+        self.stages: List[Dict[str, Any]] = []
+        self._items: Dict[str, List[Tuple[str, float]]] = {}
+        self._lock = threading.Lock()
+        self.started = datetime.now(timezone.utc)
+
+    def cprofile_path(self, stage: str) -> Path:
+        return self.report_path.with_name(f"{self.report_path.stem}.{stage}.prof")
+
+    @staticmethod
+    def child_finished(entry: Dict[str, Any], usage: resource.struct_rusage) -> None:
+        """Attach a subprocess stage's own peak RSS (from ``run_child``) to its stage entry."""
+        entry["children_peak_rss_mb"] = round(_maxrss_mb(usage), 1)
+
+    def item(self, kind: str, name: str, seconds: float) -> None:
+        """Record how long one item of ``kind`` ("ocr" images, "enrich" profiles) took (thread-safe)."""
+        with self._lock:
+            self._items.setdefault(kind, []).append((name, seconds))
+
+    @contextmanager
+    def stage(self, name: str, subprocess: bool = False) -> Iterator[Dict[str, Any]]:
+        """Measure the enclosed block; the yielded dict can carry extra report fields.
+
+        With ``subprocess`` the block is expected to have written its own
+        cProfile dump to ``cprofile_path(name)`` and to pass the child's usage
+        to ``child_finished``.
+        """
+        entry: Dict[str, Any] = {"stage": name}
+        profiler = cProfile.Profile() if self.cprofile and not subprocess else None
+        if self.cprofile:
+            self.cprofile_path(name).unlink(missing_ok=True)
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+            tracemalloc.reset_peak()
+        scoped_peak = reset_peak_rss()
+        self_peak_before, child_peak_before = _peak_rss_mb()
+        io_before = io_counters()
+        cpu_before = _cpu_seconds()
+        wall_before = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield entry
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            entry["wall_s"] = round(time.perf_counter() - wall_before, 3)
+            entry["cpu_s"] = round(_cpu_seconds() - cpu_before, 3)
+            self_peak, child_peak = _peak_rss_mb()
+            stage_peak = _vm_hwm_mb() if scoped_peak else None
+            if stage_peak is None:
+                # Without a resettable high-water mark only a new lifetime peak is known to be this stage's.
+                stage_peak = self_peak
+                if self_peak <= self_peak_before:
+                    entry["peak_rss_scope"] = "process"
+            entry["peak_rss_mb"] = round(stage_peak, 1)
+            # Subprocess stages set their child's own peak; otherwise only a new peak belongs to this stage.
+            if "children_peak_rss_mb" not in entry and child_peak > child_peak_before:
+                entry["children_peak_rss_mb"] = round(child_peak, 1)
+            io_after = io_counters()
+            entry["io"] = {key: io_after[key] - io_before[key] for key in io_after}
+            if profiler is not None:
+                path = self.cprofile_path(name)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(str(path))
+            if self.cprofile and self.cprofile_path(name).exists():
+                self._summarize_cprofile(self.cprofile_path(name), entry)
+            if self.trace_memory:
+                self._finish_tracemalloc(entry)
+            self.stages.append(entry)
+
+    def _summarize_cprofile(self, path: Path, entry: Dict[str, Any]) -> None:
+        entry["cprofile"] = str(path)
+        stats = pstats.Stats(str(path), stream=io.StringIO())
+        top: List[Dict[str, Any]] = []
+        for func, (_, calls, tottime, cumtime, _) in sorted(
+            stats.stats.items(), key=lambda item: item[1][2], reverse=True
+        )[: self.top]:
+            filename, line, function = func
+            top.append(
+                {
+                    "function": f"{Path(filename).name}:{line}({function})",
+                    "calls": calls,
+                    "tottime_s": round(tottime, 4),
+                    "cumtime_s": round(cumtime, 4),
+                }
+            )
+        entry["top_functions"] = top
+
+    def _finish_tracemalloc(self, entry: Dict[str, Any]) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        entry["tracemalloc"] = {"current_mb": _mb(current), "peak_mb": _mb(peak)}
+        snapshot = tracemalloc.take_snapshot()
+        entry["tracemalloc"]["top_allocations"] = [
+            {"where": str(stat.traceback[0]), "size_mb": _mb(stat.size), "count": stat.count}
+            for stat in snapshot.statistics("lineno")[: self.top]
+        ]
+
+    def report(self, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        stages = self.stages
+        items: Dict[str, Any] = {}
+        with self._lock:
+            timings = {kind: list(values) for kind, values in self._items.items()}
+        for kind, values in timings.items():
+            durations = sorted(seconds for _, seconds in values)
+            items[kind] = {
+                "count": len(values),
+                "p50_s": round(durations[len(durations) // 2], 3),
+                "max_s": round(durations[-1], 3),
+                "slowest": [
+                    {"item": name, "seconds": round(seconds, 3)}
+                    for name, seconds in sorted(values, key=lambda pair: pair[1], reverse=True)[: self.top]
+                ],
+            }
+        payload: Dict[str, Any] = {
+            "started": self.started.isoformat(),
+            "argv": sys.argv,
+            "stages": stages,
+            "items": items,
+            "total": {
+                "wall_s": round(sum(entry["wall_s"] for entry in stages), 3),
+                "cpu_s": round(sum(entry["cpu_s"] for entry in stages), 3),
+                "peak_rss_mb": max((entry["peak_rss_mb"] for entry in stages), default=0),
+            },
+        }
+        if extra:
+            payload.update(extra)
+        return payload
+
+    def write(self, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        payload = self.report(extra)
+        self.report_path.parent.mkdir(parents=True, exist_ok=True)
+        self.report_path.write_text(json.dumps(payload, indent=2, ensure_ascii=False))
+        return payload
+
+
+def format_summary(payload: Dict[str, Any]) -> str:
+    lines = [f"{'stage':<14}{'wall s':>9}{'cpu s':>9}{'rss MB':>9}{'read MB':>9}{'write MB':>9}"]
+    for entry in payload["stages"]:
+        lines.append(
+            f"{entry['stage']:<14}{entry['wall_s']:>9.2f}{entry['cpu_s']:>9.2f}{entry['peak_rss_mb']:>9.1f}"
+            f"{_mb(entry['io']['read_bytes']):>9.2f}{_mb(entry['io']['write_bytes']):>9.2f}"
+        )
+    total = payload["total"]
+    lines.append(f"{'total':<14}{total['wall_s']:>9.2f}{total['cpu_s']:>9.2f}{total['peak_rss_mb']:>9.1f}")
+    for kind, summary in payload.get("items", {}).items():
+        slowest = ", ".join(f"{entry['item']} ({entry['seconds']}s)" for entry in summary["slowest"][:3])
+        lines.append(f"{kind}: {summary['count']} items, p50 {summary['p50_s']}s, max {summary['max_s']}s; slowest: {slowest}")
+    return "\n".join(lines)
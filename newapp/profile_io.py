@@ -0,0 +1,133 @@
+"""Streaming readers and writers for consolidated and enriched profile files.
+
+Two layouts are supported and picked by file suffix:
+
+- ``.ndjson`` / ``.jsonl``: the first line holds the top-level fields (``summary``
+  and friends), every following line is one profile. Written and read one
+  profile at a time, so memory stays flat however many profiles there are.
+- anything else: the single JSON document the pipeline always produced. It is
+  still written profile by profile (byte-identical to ``json.dumps`` of the
+  whole payload), but reading it loads the whole document.
+"""
+
+from __future__ import annotations
+
+import filecmp
+import json
+import os
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Any, Dict, Iterator, Optional, Tuple, Type
+
+from atomic_io import temp_file_beside
+from text_table import read_payload
+
+NDJSON_SUFFIXES = {".ndjson", ".jsonl"}
+
+
+def is_ndjson(path: Path) -> bool:
+    return path.suffix.lower() in NDJSON_SUFFIXES
+
+
+def _nested(value: Any, indent: int, level: int) -> str:
+    """``json.dumps`` of ``value`` as it appears ``level`` levels deep in an indented document."""
+    text = json.dumps(value, indent=indent, ensure_ascii=False)
+    return text.replace("\n", "\n" + " " * (indent * level))
+
+
+class ProfileWriter:
+    """Write a header and then profiles one at a time; the file is replaced atomically on close.
+
+    When the finished file is identical to the one already on disk it is left
+    untouched and ``changed`` stays False.
+    """
+
+    def __init__(self, path: Path, header: Dict[str, Any], indent: int = 2) -> None:
+        self.path = path
+        self.header = {key: value for key, value in header.items() if key != "profiles"}
+        self.indent = indent
+        self.ndjson = is_ndjson(path)
+        self.count = 0
+        self.changed = False
+        self._handle: Optional[IO[str]] = None
+        self._tmp_name = ""
+
+    def __enter__(self) -> "ProfileWriter":
+        fd, self._tmp_name = temp_file_beside(self.path)
+        self._handle = os.fdopen(fd, "w", encoding="utf-8")
+        if self.ndjson:
+            self._handle.write(json.dumps(self.header, ensure_ascii=False) + "\n")
+        else:
+            pad = " " * self.indent
+            self._handle.write("{")
+            for key, value in self.header.items():
+                self._handle.write(f"\n{pad}{json.dumps(key, ensure_ascii=False)}: {_nested(value, self.indent, 1)},")
+            self._handle.write(f'\n{pad}"profiles": [')
+        return self
+
+    def write(self, profile: Dict[str, Any]) -> None:
+        assert self._handle is not None, "ProfileWriter used outside a with block"
+        if self.ndjson:
+            self._handle.write(json.dumps(profile, ensure_ascii=False) + "\n")
+        else:
+            pad = " " * (self.indent * 2)
+            separator = "," if self.count else ""
+            self._handle.write(f"{separator}\n{pad}{_nested(profile, self.indent, 2)}")
+        self.count += 1
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        assert self._handle is not None
+        try:
+            if exc_type is None and not self.ndjson:
+                closing = f"\n{' ' * self.indent}]\n}}" if self.count else "]\n}"
+                self._handle.write(closing)
+        finally:
+            self._handle.close()
+        if exc_type is not None or (self.path.exists() and filecmp.cmp(self._tmp_name, self.path, shallow=False)):
+            Path(self._tmp_name).unlink(missing_ok=True)
+            return
+        os.replace(self._tmp_name, self.path)
+        self.changed = True
+
+
+def write_profiles(path: Path, payload: Dict[str, Any], indent: int = 2) -> bool:
+    """Write ``payload`` (``summary`` + ``profiles``) to ``path`` in the layout its suffix asks for."""
+    with ProfileWriter(path, payload, indent) as writer:
+        for profile in payload.get("profiles", []):
+            writer.write(profile)
+    return writer.changed
+
+
+def open_profiles(path: Path) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]:
+    """Return the top-level fields of a profile file and a generator over its profiles.
+
+    NDJSON files are streamed; single-document files (in any text-table layout)
+    are loaded first.
+    """
+    if not is_ndjson(path):
+        payload = read_payload(path)[0]
+        profiles = payload.pop("profiles", [])
+        return payload, iter(profiles)
+    handle = path.open(encoding="utf-8")
+    first = handle.readline()
+    header = json.loads(first) if first.strip() else {}
+
+    def profiles() -> Iterator[Dict[str, Any]]:
+        with handle:
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+
+    return header, profiles()
+
+
+def load_payload(path: Path) -> Dict[str, Any]:
+    """Read a whole profile file (any layout) into the usual ``{"summary", "profiles"}`` dict."""
+    header, profiles = open_profiles(path)
+    header["profiles"] = list(profiles)
+    return header
@@ -4,12 +4,26 @@
 from __future__ import annotations
 
 import argparse
+import contextlib
+import copy
+import importlib.util
 import json
+import os
+import queue
 import shlex
-import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterable, List, Optional, Sequence
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from build_manifest import BuildManifest, file_digest, json_digest
+from folder_labels import default_index, normalize_token
+from pipeline_profile import PipelineProfiler, format_summary, run_child
+from profile_io import is_ndjson, load_payload, open_profiles
+from text_table import TEXT_TABLE_MODES
 
 APP_ROOT = Path(__file__).resolve().parent
 DEFAULT_VENV_PYTHON = APP_ROOT.parent / ".venv" / "bin" / "python"
@@ -24,6 +38,22 @@ DEFAULT_CONSOLIDATED = APP_ROOT / "consolidated_profiles.json"
 DEFAULT_PER_PROFILE = APP_ROOT / "consolidated"
 DEFAULT_MEDIA_ROOT = APP_ROOT / "media_profiles"
 DEFAULT_ENRICHED = APP_ROOT / "consolidated_profiles_enriched.json"
+DEFAULT_MANIFEST = APP_ROOT / "build_manifest.json"
+DEFAULT_PROFILE_REPORT = APP_ROOT / "pipeline_profile.json"
+# ``python -m cProfile`` does not register the script as __main__ (pydantic needs it to
+# resolve postponed annotations) and swallows SystemExit; runpy keeps both intact. Like
+# ``python script.py``, the script's folder goes first on sys.path for its sibling imports.
+CPROFILE_BOOTSTRAP = """import cProfile, os, runpy, sys
+out, sys.argv = sys.argv[1], sys.argv[2:]
+sys.path.insert(0, os.path.dirname(os.path.abspath(sys.argv[0])))
+profiler = cProfile.Profile()
+try:
+    profiler.runcall(runpy.run_path, sys.argv[0], run_name="__main__")
+finally:
+    profiler.dump_stats(out)
+"""
+# Keys written by 2-add_metadata.py; everything else in a sidecar is its input.
+METADATA_KEYS = ("metadata", "profile")
 
 
 def resolve_python(explicit: Path | None) -> str:
@@ -40,12 +70,13 @@ def shlex_join(cmd: Sequence[str]) -> str:
     return " ".join(shlex.quote(part) for part in cmd)
 
 
-def run_step(name: str, cmd: Sequence[str], dry_run: bool) -> None:
+def run_step(name: str, cmd: Sequence[str], dry_run: bool) -> Any:
+    """Run one stage script; returns the child's resource usage (None for a dry run)."""
     print(f"\n==> {name}")
     print(f"    {shlex_join(cmd)}")
     if dry_run:
-        return
-    subprocess.run(cmd, check=True)
+        return None
+    return run_child(cmd)
 
 
 def ensure_scripts_exist() -> None:
@@ -54,6 +85,20 @@ def ensure_scripts_exist() -> None:
             raise SystemExit(f"Required script missing: {script}")
 
 
+def load_stage(script: Path) -> ModuleType:
+    """Import one of the numbered stage scripts as a module."""
+    spec = importlib.util.spec_from_file_location(script.stem.replace("-", "_"), script)
+    if spec is None or spec.loader is None:
+        raise SystemExit(f"Cannot load {script}")
+    if spec.name in sys.modules:
+        return sys.modules[spec.name]
+    module = importlib.util.module_from_spec(spec)
+    # Registered first so pydantic can resolve the stage's postponed annotations.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
 def extend_with_flags(cmd: List[str], flag: str, values: Iterable[str] | None) -> None:
     if not values:
         return
@@ -68,7 +113,15 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--python", type=Path, help="Python interpreter to run sub-commands.")
     parser.add_argument("--root", type=Path, default=DEFAULT_ROOT, help="Root folder containing Screenshot_*.jpg files.")
     parser.add_argument("--ollama-bin", default="ollama", help="Path to the Ollama binary.")
+    parser.add_argument(
+        "--ocr-backend",
+        choices=("auto", "http", "cli"),
+        default="auto",
+        help="Ollama backend for the OCR stage (pooled HTTP client or 'ollama run').",
+    )
+    parser.add_argument("--ollama-host", help="Ollama API host used by the HTTP backend.")
     parser.add_argument("--ocr-model", default="glm-ocr", help="Model used for OCR stage.")
+    parser.add_argument("--ocr-workers", type=int, default=1, help="Concurrent images in the OCR stage.")
     parser.add_argument("--ocr-timeout", type=int, default=300, help="Timeout per Ollama OCR call (seconds).")
     parser.add_argument(
         "--ocr-indent",
@@ -82,6 +135,31 @@ def parse_args() -> argparse.Namespace:
         help="Structured extraction LLM(s) for 1-process_ocr.py (repeat flag to add more).",
     )
     parser.add_argument("--ocr-coordinator", help="Consensus LLM used when more than one --ocr-llm is provided.")
+    parser.add_argument(
+        "--llm-stream",
+        action="store_true",
+        help="Stream structuring/enrichment responses and stop once a complete JSON object closes.",
+    )
+    parser.add_argument(
+        "--ocr-preprocess",
+        action="store_true",
+        help="Crop, mask and downscale screenshots before OCR (see 1-process_ocr.py --preprocess).",
+    )
+    parser.add_argument(
+        "--ocr-jobs-db",
+        type=Path,
+        help="Persistent OCR job queue (see 1-process_ocr.py --jobs-db) so re-runs only touch outstanding work.",
+    )
+    parser.add_argument(
+        "--ocr-cache-db",
+        type=Path,
+        help="SQLite OCR cache passed to 1-process_ocr.py --cache-db (default: the stage's own).",
+    )
+    parser.add_argument(
+        "--ocr-fast-path",
+        action="store_true",
+        help="Let the regex extractor answer well-formatted cards before calling --ocr-llm models.",
+    )
     parser.add_argument("--ocr-overwrite", action="store_true", help="Force regeneration of Screenshot_*.json files.")
 
     parser.add_argument("--skip-ocr", action="store_true", help="Skip the OCR stage.")
@@ -89,6 +167,84 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--skip-consolidate", action="store_true", help="Skip consolidation stage.")
     parser.add_argument("--skip-enrich", action="store_true", help="Skip structured enrichment stage.")
     parser.add_argument("--dry-run", action="store_true", help="Print commands without executing them.")
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Run the stages as library calls in this interpreter, passing records in memory between them.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Implies --in-process; use a content-hash build manifest so each stage only redoes changed items.",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        default=DEFAULT_MANIFEST,
+        help=f"Build manifest used by --incremental (default: {DEFAULT_MANIFEST}).",
+    )
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Implies --incremental; print why each item is rebuilt.",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        nargs="?",
+        const=DEFAULT_PROFILE_REPORT,
+        help=(
+            "Record wall/CPU time, peak RSS and I/O per stage and write a JSON report "
+            f"(default path when the flag is given alone: {DEFAULT_PROFILE_REPORT})."
+        ),
+    )
+    parser.add_argument("--profile-top", type=int, default=10, help="Slowest items/functions to list per stage.")
+    parser.add_argument(
+        "--profile-cprofile",
+        action="store_true",
+        help="With --profile, also dump cProfile stats per stage next to the report.",
+    )
+    parser.add_argument(
+        "--profile-tracemalloc",
+        action="store_true",
+        help="With --profile and --in-process, record tracemalloc peaks and top allocation sites per stage.",
+    )
+    parser.add_argument(
+        "--stream-stages",
+        action="store_true",
+        help=(
+            "Implies --in-process; hand each profile folder to metadata, consolidation and enrichment "
+            "as soon as its screenshots are OCR'd, so OCR and enrichment models run at the same time."
+        ),
+    )
+    parser.add_argument(
+        "--stream-dir",
+        type=Path,
+        help="With --stream-stages, write each enriched profile here as soon as it is ready.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "Implies --in-process; keep running, poll --root for new or changed files and push only the "
+            "affected profile folders through the pipeline, updating the outputs in place."
+        ),
+    )
+    parser.add_argument("--watch-interval", type=float, default=5.0, help="Seconds between polls (default: 5).")
+    parser.add_argument(
+        "--watch-debounce",
+        type=float,
+        default=10.0,
+        help="Wait until no file changed for this many seconds before processing a burst (default: 10).",
+    )
+    parser.add_argument(
+        "--keep-sidecars-in-memory",
+        action="store_true",
+        help=(
+            "With --in-process, do not rewrite Screenshot_*.json after OCR/metadata (OCR still writes with "
+            "--ocr-jobs-db, and flushes finished sidecars if interrupted)."
+        ),
+    )
 
     parser.add_argument(
         "--consolidated-output",
@@ -114,8 +270,20 @@ def parse_args() -> argparse.Namespace:
         default=DEFAULT_ENRICHED,
         help="Path for consolidated_profiles_enriched.json.",
     )
+    parser.add_argument(
+        "--text-table",
+        choices=TEXT_TABLE_MODES,
+        default="inline",
+        help="Store OCR texts inline or once in a content-addressed table (embedded or sidecar file).",
+    )
     parser.add_argument("--enrich-model", default="qwen3-vl:235b-cloud", help="LLM model for profile enrichment.")
     parser.add_argument("--enrich-timeout", type=int, default=300, help="Timeout per enrichment request (seconds).")
+    parser.add_argument(
+        "--enrich-concurrency",
+        type=int,
+        default=1,
+        help="Enrichment requests in flight at once (async client; output stays in profile order).",
+    )
     parser.add_argument("--enrich-limit", type=int, help="Limit number of profiles when running 4-extend_profiles.py.")
     parser.add_argument("--enrich-overwrite", action="store_true", help="Regenerate existing extraction blocks.")
     parser.add_argument("--enrich-skip-llm", action="store_true", help="Skip LLM calls during enrichment.")
@@ -142,17 +310,20 @@ def print_extractions(enriched_path: Path, limit: int | None) -> None:
     if not enriched_path.exists():
         print(f"[warn] Enriched file not found: {enriched_path}")
         return
+    profiles: Iterable[Dict[str, Any]]
     try:
-        payload = json.loads(enriched_path.read_text())
+        if is_ndjson(enriched_path):
+            profiles = open_profiles(enriched_path)[1]
+        else:
+            payload = json.loads(enriched_path.read_text())
+            profiles = payload if isinstance(payload, list) else payload.get("profiles", [])
+            if not profiles:
+                print("[warn] No profiles with extraction data were found.")
+                return
     except json.JSONDecodeError as exc:
         print(f"[warn] Could not parse {enriched_path}: {exc}")
         return
 
-    profiles = payload if isinstance(payload, list) else payload.get("profiles", [])
-    if not profiles:
-        print("[warn] No profiles with extraction data were found.")
-        return
-
     shown = 0
     for profile in profiles:
         extraction = profile.get("extraction")
@@ -170,80 +341,855 @@ def print_extractions(enriched_path: Path, limit: int | None) -> None:
         print(f"\n[done] Displayed {shown} extraction block(s) from {enriched_path}.")
 
 
-def main() -> None:
-    ensure_scripts_exist()
-    args = parse_args()
+def ocr_argv(args: argparse.Namespace) -> List[str]:
+    argv: List[str] = [
+        "--root",
+        str(args.root),
+        "--ollama-bin",
+        args.ollama_bin,
+        "--ocr-model",
+        args.ocr_model,
+        "--timeout",
+        str(args.ocr_timeout),
+        "--indent",
+        str(args.ocr_indent),
+        "--backend",
+        args.ocr_backend,
+        "--workers",
+        str(args.ocr_workers),
+    ]
+    if args.ollama_host:
+        argv.extend(["--ollama-host", args.ollama_host])
+    extend_with_flags(argv, "--llm", args.ocr_llm)
+    if args.ocr_coordinator:
+        argv.extend(["--coordinator", args.ocr_coordinator])
+    if args.ocr_overwrite:
+        argv.append("--overwrite")
+    if args.llm_stream:
+        argv.append("--stream")
+    if args.ocr_preprocess:
+        argv.append("--preprocess")
+    if args.ocr_fast_path:
+        argv.append("--fast-path")
+    if args.ocr_jobs_db:
+        argv.extend(["--jobs-db", str(args.ocr_jobs_db)])
+    if args.ocr_cache_db:
+        argv.extend(["--cache-db", str(args.ocr_cache_db)])
+    return argv
+
+
+def metadata_argv(args: argparse.Namespace) -> List[str]:
+    return ["--root", str(args.root), "--indent", str(args.ocr_indent)]
+
+
+def consolidate_argv(args: argparse.Namespace) -> List[str]:
+    argv: List[str] = [
+        "--root",
+        str(args.root),
+        "--output",
+        str(args.consolidated_output),
+        "--indent",
+        "2",
+        "--text-table",
+        args.text_table,
+    ]
+    if args.per_profile_dir:
+        argv.extend(["--per-profile-dir", str(args.per_profile_dir)])
+    if args.media_root:
+        argv.extend(["--media-output-root", str(args.media_root)])
+    return argv
+
+
+def enrich_argv(args: argparse.Namespace) -> List[str]:
+    argv: List[str] = [
+        "--input",
+        str(args.consolidated_output),
+        "--output",
+        str(args.enriched_output),
+        "--ollama-bin",
+        args.ollama_bin,
+        "--model",
+        args.enrich_model,
+        "--timeout",
+        str(args.enrich_timeout),
+        "--media-root",
+        str(args.media_root),
+        "--indent",
+        str(args.enrich_indent),
+        "--text-table",
+        args.text_table,
+    ]
+    if args.enrich_concurrency > 1:
+        argv.extend(["--concurrency", str(args.enrich_concurrency)])
+    if args.enrich_limit:
+        argv.extend(["--limit", str(args.enrich_limit)])
+    if args.enrich_overwrite:
+        argv.append("--overwrite")
+    if args.enrich_skip_llm:
+        argv.append("--skip-llm")
+    if args.llm_stream:
+        argv.append("--stream")
+    return argv
+
+
+def _stage(profiler: PipelineProfiler | None, name: str, subprocess: bool = False) -> Any:
+    if profiler is None:
+        return contextlib.nullcontext({})
+    return profiler.stage(name, subprocess)
+
+
+def run_subprocesses(args: argparse.Namespace, profiler: PipelineProfiler | None = None) -> None:
     python_bin = resolve_python(args.python)
+    steps = (
+        ("ocr", "OCR extraction", args.skip_ocr, SCRIPT_OCR, ocr_argv(args)),
+        ("metadata", "Metadata enrichment", args.skip_metadata, SCRIPT_METADATA, metadata_argv(args)),
+        ("consolidate", "Consolidation", args.skip_consolidate, SCRIPT_CONSOLIDATE, consolidate_argv(args)),
+        ("enrich", "Enrichment", args.skip_enrich, SCRIPT_EXTEND, enrich_argv(args)),
+    )
+    for stage, label, skipped, script, script_argv in steps:
+        if skipped:
+            continue
+        cmd: List[str] = [python_bin]
+        if profiler is not None and profiler.cprofile:
+            cmd.extend(["-c", CPROFILE_BOOTSTRAP, str(profiler.cprofile_path(stage))])
+        with _stage(profiler, stage, subprocess=True) as entry:
+            usage = run_step(label, [*cmd, str(script), *script_argv], args.dry_run)
+            if profiler is not None and usage is not None:
+                profiler.child_finished(entry, usage)
+
+
+def load_missing_records(records: Dict[Path, Dict[str, Any]], root: Path) -> Dict[Path, Dict[str, Any]]:
+    """Read the sidecars under ``root`` that no earlier in-process stage produced."""
+    for json_file in sorted(root.resolve().rglob("Screenshot_*.json")):
+        if json_file.is_file() and json_file not in records:
+            records[json_file] = json.loads(json_file.read_text())
+    return records
+
+
+def _relative(path: Path, root: Path) -> str:
+    try:
+        return str(path.relative_to(root))
+    except ValueError:
+        return str(path)
+
+
+def plan_ocr(manifest: BuildManifest, root: Path, overwrite: bool) -> None:
+    """Drop sidecars whose screenshot changed since it was OCR'd so stage 1 regenerates them.
+
+    Screenshots are only hashed when their size or mtime differs from the manifest.
+    """
+    root = root.resolve()
+    items: List[str] = []
+    for image in sorted(p for p in root.rglob("Screenshot_*.jpg") if p.is_file()):
+        item = _relative(image, root)
+        items.append(item)
+        digest, stamp = manifest.file_input("ocr", item, image)
+        sidecar = image.with_suffix(".json")
+        # Sidecars that predate the manifest are adopted as they are.
+        if item in manifest.stage("ocr") or not sidecar.exists():
+            reason = manifest.stale_reason("ocr", item, digest, None if sidecar.exists() else "")
+            if reason == "inputs changed" and sidecar.exists() and not overwrite:
+                sidecar.unlink()
+        manifest.record("ocr", item, digest, stamp=stamp)
+    manifest.prune("ocr", items)
+
+
+def _metadata_input(record: Dict[str, Any], item: str) -> str:
+    return json_digest({"path": item, "record": {k: v for k, v in record.items() if k not in METADATA_KEYS}})
+
+
+def stale_metadata_records(
+    manifest: BuildManifest,
+    records: Dict[Path, Dict[str, Any]],
+    root: Path,
+) -> Dict[Path, Dict[str, Any]]:
+    root = root.resolve()
+    stale: Dict[Path, Dict[str, Any]] = {}
+    for path in sorted(records):
+        item = _relative(path, root)
+        record = records[path]
+        if manifest.stale_reason("metadata", item, _metadata_input(record, item), json_digest(record)):
+            stale[path] = record
+    manifest.prune("metadata", (_relative(path, root) for path in records))
+    return stale
+
+
+def record_metadata(manifest: BuildManifest, records: Dict[Path, Dict[str, Any]], root: Path) -> None:
+    root = root.resolve()
+    for path, record in records.items():
+        item = _relative(path, root)
+        manifest.record("metadata", item, _metadata_input(record, item), json_digest(record))
+
+
+def folder_digests(records: Dict[Path, Dict[str, Any]], root: Path, media_extensions: Iterable[str]) -> Dict[str, str]:
+    """Hash each profile folder's sidecars and media listing, the inputs of its consolidated entry."""
+    root = root.resolve()
+    extensions = set(media_extensions)
+    by_folder: Dict[Path, List[Any]] = {}
+    for path in sorted(records):
+        by_folder.setdefault(path.parent, []).append([path.name, json_digest(records[path])])
+    digests: Dict[str, str] = {}
+    for folder, sidecars in by_folder.items():
+        media = sorted(
+            str(candidate.relative_to(folder))
+            for candidate in folder.rglob("*")
+            if candidate.is_file() and candidate.suffix.lower() in extensions
+        )
+        digests[_relative(folder, root)] = json_digest({"sidecars": sidecars, "media": media})
+    return digests
+
+
+def _output_digest(path: Path) -> str:
+    return file_digest(path) if path.exists() else ""
+
+
+def _item_timers(profiler: PipelineProfiler | None, root: Path) -> Tuple[Any, Any]:
+    """Return ``on_done`` callbacks that feed per-image and per-profile timings to ``profiler``."""
+    if profiler is None:
+        return None, None
+    resolved = root.resolve()
+
+    def ocr_done(image: Path, seconds: float) -> None:
+        profiler.item("ocr", _relative(image, resolved), seconds)
+
+    def enrich_done(profile: Dict[str, Any], seconds: float) -> None:
+        profiler.item("enrich", profile.get("profile") or "(sin nombre)", seconds)
+
+    return ocr_done, enrich_done
+
+
+def _write_ocr_sidecars(args: argparse.Namespace) -> bool:
+    """Whether in-process OCR saves each sidecar as it finishes (the metadata stage then updates it).
+
+    Only --keep-sidecars-in-memory holds them back; the job queue marks images
+    done, so with --ocr-jobs-db they must reach disk right away regardless.
+    """
+    return bool(args.ocr_jobs_db) or not args.keep_sidecars_in_memory
+
+
+def run_in_process(
+    args: argparse.Namespace,
+    manifest: BuildManifest | None = None,
+    profiler: PipelineProfiler | None = None,
+) -> None:
+    """Call each stage as a library function and hand records from one stage to the next.
+
+    By default the OCR stage writes every sidecar as it finishes and the metadata
+    stage rewrites the ones it annotates, just like the subprocess pipeline. With
+    --keep-sidecars-in-memory neither stage writes them: records only travel in
+    memory to the later stages, and OCR sidecars reach disk only if the run is
+    interrupted (or right away with --ocr-jobs-db). With a ``manifest`` every
+    stage skips the items whose inputs hash as before.
+    """
+    if args.dry_run:
+        for label, skipped, script_argv in (
+            ("OCR extraction", args.skip_ocr, ocr_argv(args)),
+            ("Metadata enrichment", args.skip_metadata, metadata_argv(args)),
+            ("Consolidation", args.skip_consolidate, consolidate_argv(args)),
+            ("Enrichment", args.skip_enrich, enrich_argv(args)),
+        ):
+            if not skipped:
+                print(f"\n==> {label} (in-process)\n    {shlex_join(script_argv)}")
+        return
+
+    in_memory = args.keep_sidecars_in_memory
+    records: Dict[Path, Dict[str, Any]] = {}
+    consolidated: Dict[str, Any] | None = None
+    ocr_done, enrich_done = _item_timers(profiler, args.root)
 
     if not args.skip_ocr:
-        ocr_cmd: List[str] = [
-            python_bin,
-            str(SCRIPT_OCR),
-            "--root",
-            str(args.root),
-            "--ollama-bin",
-            args.ollama_bin,
-            "--ocr-model",
-            args.ocr_model,
-            "--timeout",
-            str(args.ocr_timeout),
-            "--indent",
-            str(args.ocr_indent),
-        ]
-        extend_with_flags(ocr_cmd, "--llm", args.ocr_llm)
-        if args.ocr_coordinator:
-            ocr_cmd.extend(["--coordinator", args.ocr_coordinator])
-        if args.ocr_overwrite:
-            ocr_cmd.append("--overwrite")
-        run_step("OCR extraction", ocr_cmd, args.dry_run)
+        print(f"\n==> OCR extraction (in-process)\n    {shlex_join(ocr_argv(args))}")
+        with _stage(profiler, "ocr"):
+            ocr = load_stage(SCRIPT_OCR)
+            ocr_args = ocr.parse_args(ocr_argv(args))
+            if manifest is not None:
+                plan_ocr(manifest, ocr_args.root, ocr_args.overwrite)
+            sink = ocr.RecordSink(ocr_args.indent, write=_write_ocr_sidecars(args))
+            records = ocr.run_ocr(ocr_args, sink, on_done=ocr_done).records
+            if manifest is not None:
+                print(manifest.summary("ocr"))
+                manifest.save()
 
     if not args.skip_metadata:
-        metadata_cmd = [python_bin, str(SCRIPT_METADATA)]
-        run_step("Metadata enrichment", metadata_cmd, args.dry_run)
+        print(f"\n==> Metadata enrichment (in-process)\n    {shlex_join(metadata_argv(args))}")
+        with _stage(profiler, "metadata"):
+            metadata = load_stage(SCRIPT_METADATA)
+            metadata_args = metadata.parse_args(metadata_argv(args))
+            load_missing_records(records, metadata_args.root)
+            pending = records
+            if manifest is not None:
+                pending = stale_metadata_records(manifest, records, metadata_args.root)
+            metadata.annotate_records(pending, metadata_args.root, metadata_args.indent, write=not in_memory)
+            if manifest is not None:
+                record_metadata(manifest, pending, metadata_args.root)
+                print(manifest.summary("metadata"))
+                manifest.save()
 
     if not args.skip_consolidate:
-        consolidate_cmd: List[str] = [
-            python_bin,
-            str(SCRIPT_CONSOLIDATE),
-            "--root",
-            str(args.root),
-            "--output",
-            str(args.consolidated_output),
-            "--indent",
-            "2",
-        ]
-        if args.per_profile_dir:
-            consolidate_cmd.extend(["--per-profile-dir", str(args.per_profile_dir)])
-        if args.media_root:
-            consolidate_cmd.extend(["--media-output-root", str(args.media_root)])
-        run_step("Consolidation", consolidate_cmd, args.dry_run)
+        print(f"\n==> Consolidation (in-process)\n    {shlex_join(consolidate_argv(args))}")
+        with _stage(profiler, "consolidate"):
+            consolidate = load_stage(SCRIPT_CONSOLIDATE)
+            consolidate_args = consolidate.parse_args(consolidate_argv(args))
+            load_missing_records(records, consolidate_args.root)
+            if manifest is None:
+                consolidated = consolidate.run_consolidation(consolidate_args, records)
+            else:
+                consolidated = run_consolidation_incremental(
+                    manifest, consolidate, consolidate_args, records, consolidate_argv(args)
+                )
 
     if not args.skip_enrich:
-        enrich_cmd: List[str] = [
-            python_bin,
-            str(SCRIPT_EXTEND),
-            "--input",
-            str(args.consolidated_output),
-            "--output",
-            str(args.enriched_output),
-            "--ollama-bin",
-            args.ollama_bin,
-            "--model",
-            args.enrich_model,
-            "--timeout",
-            str(args.enrich_timeout),
-            "--media-root",
-            str(args.media_root),
-            "--indent",
-            str(args.enrich_indent),
-        ]
-        if args.enrich_limit:
-            enrich_cmd.extend(["--limit", str(args.enrich_limit)])
-        if args.enrich_overwrite:
-            enrich_cmd.append("--overwrite")
-        if args.enrich_skip_llm:
-            enrich_cmd.append("--skip-llm")
-        run_step("Enrichment", enrich_cmd, args.dry_run)
+        print(f"\n==> Enrichment (in-process)\n    {shlex_join(enrich_argv(args))}")
+        with _stage(profiler, "enrich"):
+            extend = load_stage(SCRIPT_EXTEND)
+            extend_args = extend.parse_args(enrich_argv(args))
+            if manifest is None:
+                extend.run_enrichment(extend_args, consolidated, enrich_done)
+            else:
+                run_enrichment_incremental(
+                    manifest, extend, extend_args, consolidated, enrich_argv(args), enrich_done
+                )
+
+
+def run_consolidation_incremental(
+    manifest: BuildManifest,
+    consolidate: ModuleType,
+    consolidate_args: argparse.Namespace,
+    records: Dict[Path, Dict[str, Any]],
+    argv: Sequence[str],
+) -> Dict[str, Any] | None:
+    """Re-consolidate only when a profile folder changed; otherwise keep the previous output.
+
+    Returns the consolidated payload when it was rebuilt, or None when the file
+    on disk is still current.
+    """
+    digests = folder_digests(records, consolidate_args.root, consolidate.MEDIA_EXTENSIONS)
+    changed = [item for item, digest in sorted(digests.items()) if manifest.stale_reason("consolidate", item, digest)]
+    removed = manifest.prune("consolidate", digests)
+    output_key = str(consolidate_args.output)
+    output_input = json_digest({"folders": digests, "argv": list(argv)})
+    reason = manifest.stale_reason("consolidate_output", output_key, output_input, _output_digest(consolidate_args.output))
+    consolidated = None
+    if changed or removed or reason:
+        consolidated = consolidate.run_consolidation(consolidate_args, records)
+        for item, digest in digests.items():
+            manifest.record("consolidate", item, digest)
+        manifest.record("consolidate_output", output_key, output_input, _output_digest(consolidate_args.output))
+    else:
+        print(f"{consolidate_args.output} is up to date.")
+    print(manifest.summary("consolidate"))
+    manifest.save()
+    return consolidated
+
+
+def _profile_keys(profiles: List[Dict[str, Any]]) -> List[str]:
+    keys: List[str] = []
+    used: Dict[str, int] = {}
+    for idx, profile in enumerate(profiles, start=1):
+        base = profile.get("profile") or f"profile_{idx}"
+        count = used.get(base, 0)
+        used[base] = count + 1
+        keys.append(base if count == 0 else f"{base}#{count + 1}")
+    return keys
+
+
+def run_enrichment_incremental(
+    manifest: BuildManifest,
+    extend: ModuleType,
+    extend_args: argparse.Namespace,
+    consolidated: Dict[str, Any] | None,
+    argv: Sequence[str],
+    on_done: Callable[[Dict[str, Any], float], None] | None = None,
+) -> None:
+    """Reuse extractions whose prompt context and model are unchanged; only new contexts reach the LLM."""
+    output = extend_args.output
+    if consolidated is None:
+        if not extend_args.input.exists():
+            raise SystemExit(f"No se encontró el archivo de entrada: {extend_args.input}")
+        consolidated = load_payload(extend_args.input)
+    profiles = consolidated.get("profiles", [])
+    # Sources and media also end up in the enriched file, so they decide whether it is rewritten.
+    consolidated_digest = json_digest(consolidated)
+
+    previous: Dict[str, Any] = {}
+    if output.exists():
+        try:
+            previous_payload = load_payload(output)
+        except (OSError, KeyError, json.JSONDecodeError):
+            previous_payload = {}
+        for profile in previous_payload.get("profiles", []):
+            if profile.get("extraction"):
+                previous[extend.context_fingerprint(profile, extend_args.model)] = profile["extraction"]
+
+    keys = _profile_keys(profiles)
+    fingerprints: List[str] = []
+    for key, profile in zip(keys, profiles):
+        fingerprint = extend.context_fingerprint(profile, extend_args.model)
+        fingerprints.append(fingerprint)
+        reusable = fingerprint in previous and not extend_args.overwrite
+        if reusable:
+            profile["extraction"] = previous[fingerprint]
+            manifest.mark_fresh("enrich")
+        else:
+            manifest.stale_reason("enrich", key, fingerprint, "")
+    manifest.prune("enrich", keys)
+
+    output_key = str(output)
+    output_input = json_digest({"consolidated": consolidated_digest, "argv": list(argv)})
+    if manifest.stale_reason("enrich_output", output_key, output_input, _output_digest(output)) is None:
+        print(f"{output} is up to date.")
+    else:
+        extend.run_enrichment(extend_args, consolidated, on_done)
+        for key, fingerprint, profile in zip(keys, fingerprints, profiles):
+            manifest.record("enrich", key, fingerprint, json_digest(profile.get("extraction")))
+        manifest.record("enrich_output", output_key, output_input, _output_digest(output))
+    print(manifest.summary("enrich"))
+    manifest.save()
+
+
+class FolderTracker:
+    """Count outstanding OCR images per folder and queue each folder once all of them finished."""
+
+    def __init__(self) -> None:
+        self.ready: "queue.Queue[Path | None]" = queue.Queue()
+        self._pending: Dict[Path, int] = {}
+        self._emitted: Set[Path] = set()
+        self._lock = threading.Lock()
+
+    def expect(self, images: Sequence[Path]) -> None:
+        with self._lock:
+            for image in images:
+                self._pending[image.parent] = self._pending.get(image.parent, 0) + 1
+
+    def done(self, image: Path) -> None:
+        with self._lock:
+            remaining = self._pending.get(image.parent, 0) - 1
+            self._pending[image.parent] = remaining
+            if remaining <= 0:
+                self._emit(image.parent)
+
+    def finish(self, folders: Iterable[Path]) -> None:
+        """Release folders OCR never touched (e.g. all sidecars already existed), then close the queue."""
+        with self._lock:
+            for folder in sorted(folders):
+                self._emit(folder)
+        self.ready.put(None)
+
+    def _emit(self, folder: Path) -> None:
+        if folder not in self._emitted:
+            self._emitted.add(folder)
+            self.ready.put(folder)
+
+
+def _enrich_ready(
+    extend: ModuleType,
+    profile: Dict[str, Any],
+    extend_args: argparse.Namespace,
+    stream_dir: Path | None,
+    started: float,
+    on_done: Callable[[Dict[str, Any], float], None] | None = None,
+) -> Any:
+    profile_started = time.perf_counter()
+    extend.enrich_profile(profile, extend_args)
+    if on_done is not None:
+        on_done(profile, time.perf_counter() - profile_started)
+    name = profile.get("profile") or "(sin nombre)"
+    status = "enriched" if profile.get("extraction") else f"failed: {profile.get('extraction_error')}"
+    print(f"[stream] {name} {status} after {time.perf_counter() - started:.1f}s")
+    if stream_dir is not None:
+        stream_dir.mkdir(parents=True, exist_ok=True)
+        target = stream_dir / f"{extend.slugify(name)}.json"
+        target.write_text(json.dumps(profile, ensure_ascii=False, indent=extend_args.indent))
+    return profile.get("extraction")
+
+
+def reuse_extractions(
+    extend: ModuleType,
+    profiles: List[Dict[str, Any]],
+    model: str,
+    extractions: Dict[str, Any],
+) -> int:
+    """Attach extractions already computed for an identical prompt context; return how many matched."""
+    reused = 0
+    for profile in profiles:
+        extraction = extractions.get(extend.context_fingerprint(profile, model))
+        if extraction:
+            profile["extraction"] = extraction
+            reused += 1
+    return reused
+
+
+def settled_buckets(
+    consolidate: ModuleType,
+    mapping: Dict[str, str],
+    identities: Dict[Path, Dict[str, Any]],
+    remaining: Set[Path],
+    root: Path,
+) -> Dict[str, List[Path]]:
+    """Group finished sidecars into final buckets and keep those no unfinished folder can still join.
+
+    ``mapping`` comes from the streaming run's identity index, which merges each
+    finished folder into the groups found so far with the same rules as the
+    final consolidation. A bucket stays open while a folder that has not
+    finished yet carries its name or folder code; evidence only OCR can reveal
+    (a shared phone number) may still regroup it later, which the final pass
+    catches.
+    """
+    labels = default_index()
+    open_names = {normalize_token(labels.label(folder.name).display) for folder in remaining}
+    open_codes = {consolidate.folder_code(folder.relative_to(root).parts + ("",)) for folder in remaining}
+    buckets: Dict[str, List[Path]] = {}
+    for path, identity in identities.items():
+        buckets.setdefault(mapping[identity["key"]], []).append(path)
+    return {
+        key: sorted(paths)
+        for key, paths in buckets.items()
+        if not any(
+            normalize_token(identities[path]["name"]) in open_names
+            or (identities[path]["folder"] is not None and identities[path]["folder"] in open_codes)
+            for path in paths
+        )
+    }
+
+
+def run_streaming(args: argparse.Namespace, profiler: PipelineProfiler | None = None) -> None:
+    """Overlap the stages: OCR produces finished folders, the main thread annotates them
+    and up to --enrich-concurrency enrichment workers extract each profile as soon
+    as its bucket is settled.
+
+    A bucket is enriched early only once every folder that could still add to it
+    has finished (see ``settled_buckets``). The final pass re-consolidates
+    everything and only calls the LLM again for profiles whose prompt context
+    changed since then.
+    """
+    for label, script_argv in (
+        ("OCR extraction", ocr_argv(args)),
+        ("Metadata enrichment", metadata_argv(args)),
+        ("Consolidation", consolidate_argv(args)),
+        ("Enrichment", enrich_argv(args)),
+    ):
+        print(f"\n==> {label} (streaming)\n    {shlex_join(script_argv)}")
+    if args.dry_run:
+        return
+
+    ocr = load_stage(SCRIPT_OCR)
+    metadata = load_stage(SCRIPT_METADATA)
+    consolidate = load_stage(SCRIPT_CONSOLIDATE)
+    extend = load_stage(SCRIPT_EXTEND)
+    ocr_args = ocr.parse_args(ocr_argv(args))
+    metadata_args = metadata.parse_args(metadata_argv(args))
+    consolidate_args = consolidate.parse_args(consolidate_argv(args))
+    extend_args = extend.parse_args(enrich_argv(args))
+    root = ocr_args.root.resolve()
+    started = time.perf_counter()
+    ocr_done, enrich_done = _item_timers(profiler, args.root)
+
+    sink = ocr.RecordSink(ocr_args.indent, write=_write_ocr_sidecars(args))
+    tracker = FolderTracker()
+    failures: List[BaseException] = []
+
+    def image_done(image: Path, seconds: float) -> None:
+        tracker.done(image)
+        if ocr_done is not None:
+            ocr_done(image, seconds)
+
+    def produce() -> None:
+        try:
+            ocr.run_ocr(ocr_args, sink, tracker.expect, image_done)
+        except BaseException as exc:  # noqa: BLE001 - re-raised on the main thread
+            failures.append(exc)
+        finally:
+            folders = {path.parent for path in root.rglob("Screenshot_*.json") if path.is_file()}
+            tracker.finish(folders | {path.parent for path in sink.records})
+
+    producer = threading.Thread(target=produce, name="ocr-producer", daemon=True)
+    producer.start()
+
+    records: Dict[Path, Dict[str, Any]] = {}
+    identities: Dict[Path, Dict[str, Any]] = {}
+    remaining = {
+        path.parent
+        for pattern in ("Screenshot_*.jpg", "Screenshot_*.json")
+        for path in root.rglob(pattern)
+        if path.is_file()
+    }
+    enqueued: Set[str] = set()
+    speculative: Dict[str, Future] = {}
+    submitted = 0
+    identity_index = consolidate.IdentityIndex()
+    mapping: Dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=max(1, args.enrich_concurrency), thread_name_prefix="enrich") as enrich_pool:
+        while True:
+            folder = tracker.ready.get()
+            if folder is None:
+                break
+            remaining.discard(folder)
+            folder_records = sink.records_in(folder)
+            for json_file in sorted(folder.glob("Screenshot_*.json")):
+                if json_file.is_file() and json_file not in folder_records:
+                    folder_records[json_file] = json.loads(json_file.read_text())
+            if folder_records:
+                metadata.annotate_records(
+                    folder_records, metadata_args.root, metadata_args.indent, write=not args.keep_sidecars_in_memory
+                )
+                records.update(folder_records)
+                folder_identities = {
+                    path: consolidate.source_identity(path, record, root) for path, record in folder_records.items()
+                }
+                identities.update(folder_identities)
+                mapping = identity_index.resolve_new(folder_identities.values())
+            for key, paths in sorted(settled_buckets(consolidate, mapping, identities, remaining, root).items()):
+                if key in enqueued:
+                    continue
+                enqueued.add(key)
+                bucket = consolidate.consolidate_records([(path, records[path]) for path in paths], root)
+                for profile in bucket["profiles"]:
+                    fingerprint = extend.context_fingerprint(profile, extend_args.model)
+                    if fingerprint in speculative or not extend.needs_extraction(profile, extend_args):
+                        continue
+                    if extend_args.limit and submitted >= extend_args.limit:
+                        continue
+                    submitted += 1
+                    speculative[fingerprint] = enrich_pool.submit(
+                        _enrich_ready, extend, profile, extend_args, args.stream_dir, started, enrich_done
+                    )
+        producer.join()
+        if failures:
+            raise failures[0]
+        extractions = {fingerprint: future.result() for fingerprint, future in speculative.items()}
+
+    if not records:
+        raise SystemExit(f"No Screenshot_*.json records found under {args.root}")
+    consolidated = consolidate.run_consolidation(consolidate_args, records)
+    reused = reuse_extractions(extend, consolidated["profiles"], extend_args.model, extractions)
+    # Extractions produced moments ago are current; only profiles that grew get a new call.
+    final_args = copy.copy(extend_args)
+    final_args.overwrite = False
+    print(
+        f"Streaming enrichment: {len(speculative)} profiles enriched while OCR ran, "
+        f"{reused} reused in the final output, {len(consolidated['profiles']) - reused} left for the final pass."
+    )
+    extend.run_enrichment(final_args, consolidated, enrich_done)
+
+
+WATCH_IGNORED_SUFFIXES = {".json", ".tmp"}
+
+
+def scan_tree(root: Path) -> Dict[Path, Tuple[int, int]]:
+    """Map every watched file under ``root`` to its (mtime_ns, size).
+
+    Sidecars and temp files are skipped: the pipeline writes those itself.
+    """
+    state: Dict[Path, Tuple[int, int]] = {}
+    stack = [root]
+    while stack:
+        try:
+            entries = list(os.scandir(stack.pop()))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(Path(entry.path))
+            elif entry.is_file() and os.path.splitext(entry.name)[1].lower() not in WATCH_IGNORED_SUFFIXES:
+                try:
+                    info = entry.stat()
+                except FileNotFoundError:
+                    continue
+                state[Path(entry.path)] = (info.st_mtime_ns, info.st_size)
+    return state
+
+
+def changed_paths(before: Dict[Path, Tuple[int, int]], after: Dict[Path, Tuple[int, int]]) -> Set[Path]:
+    changed = {path for path, stamp in after.items() if before.get(path) != stamp}
+    changed.update(path for path in before if path not in after)
+    return changed
+
+
+class PipelineWatcher:
+    """Keep every stage loaded and push the folders of new or changed files through them.
+
+    Sidecar records and finished extractions stay in memory between batches, so
+    a batch only OCRs the touched folders, re-consolidates from memory and calls
+    the enrichment model for profiles whose prompt context actually changed.
+    """
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.ocr = load_stage(SCRIPT_OCR)
+        self.metadata = load_stage(SCRIPT_METADATA)
+        self.consolidate = load_stage(SCRIPT_CONSOLIDATE)
+        self.extend = load_stage(SCRIPT_EXTEND)
+        self.ocr_args = self.ocr.parse_args(ocr_argv(args))
+        self.metadata_args = self.metadata.parse_args(metadata_argv(args))
+        self.consolidate_args = self.consolidate.parse_args(consolidate_argv(args))
+        self.extend_args = copy.copy(self.extend.parse_args(enrich_argv(args)))
+        # Extractions made earlier in the session are current; only changed contexts get a new call.
+        self.extend_args.overwrite = False
+        self.root = self.ocr_args.root.resolve()
+        self.records = load_missing_records({}, self.root)
+        self.extractions = self._load_extractions()
+
+    def _load_extractions(self) -> Dict[str, Any]:
+        output = self.extend_args.output
+        if self.args.enrich_overwrite or not output.exists():
+            return {}
+        try:
+            payload = load_payload(output)
+        except (OSError, KeyError, json.JSONDecodeError):
+            return {}
+        return {
+            self.extend.context_fingerprint(profile, self.extend_args.model): profile["extraction"]
+            for profile in payload.get("profiles", [])
+            if profile.get("extraction")
+        }
+
+    def process(self, changed: Set[Path], catch_up: bool = False) -> None:
+        """Push the folders of ``changed`` through the stages.
+
+        A changed screenshot is OCR'd again even when its sidecar looks newer (a
+        replacement copied with its old mtime). With ``catch_up`` the paths are
+        just everything on disk, so only screenshots newer than their sidecar are.
+        """
+        args = self.args
+        folders = {path.parent for path in changed}
+        fresh: Dict[Path, Dict[str, Any]] = {}
+        if not args.skip_ocr:
+            images: List[Path] = []
+            for folder in sorted(folders):
+                if not folder.is_dir():
+                    continue
+                for image in sorted(folder.glob("Screenshot_*.jpg")):
+                    sidecar = image.with_suffix(".json")
+                    # A screenshot replaced under the same name no longer matches its sidecar.
+                    if image in changed and sidecar.exists():
+                        if not catch_up or sidecar.stat().st_mtime_ns < image.stat().st_mtime_ns:
+                            sidecar.unlink()
+                    images.append(image)
+            sink = self.ocr.RecordSink(self.ocr_args.indent, write=_write_ocr_sidecars(args))
+            fresh = self.ocr.run_ocr(self.ocr_args, sink, images=images).records
+
+        affected: Dict[Path, Dict[str, Any]] = {}
+        for folder in folders:
+            if folder.is_dir():
+                for json_file in sorted(folder.glob("Screenshot_*.json")):
+                    if json_file.is_file():
+                        affected[json_file] = json.loads(json_file.read_text())
+        affected.update({path: record for path, record in fresh.items() if path.parent in folders})
+        if not args.skip_metadata:
+            self.metadata.annotate_records(
+                affected, self.metadata_args.root, self.metadata_args.indent, write=not args.keep_sidecars_in_memory
+            )
+        self.records = {path: record for path, record in self.records.items() if path.parent not in folders}
+        self.records.update(affected)
+        if args.skip_consolidate or not self.records:
+            return
+
+        consolidated = self.consolidate.run_consolidation(self.consolidate_args, self.records)
+        if args.skip_enrich:
+            return
+        profiles = consolidated["profiles"]
+        reused = reuse_extractions(self.extend, profiles, self.extend_args.model, self.extractions)
+        print(f"[watch] {reused} of {len(profiles)} profiles reuse an extraction from this session")
+        self.extend.run_enrichment(self.extend_args, consolidated)
+        for profile in profiles:
+            if profile.get("extraction"):
+                self.extractions[self.extend.context_fingerprint(profile, self.extend_args.model)] = profile[
+                    "extraction"
+                ]
+
+
+def run_watch(args: argparse.Namespace) -> None:
+    """Poll ``args.root`` and process each burst of changes once it has been quiet for the debounce period."""
+    watcher = PipelineWatcher(args)
+    root = watcher.root
+    snapshot = scan_tree(root)
+    print(f"[watch] catching up on {len(snapshot)} files under {root}")
+    watcher.process(set(snapshot), catch_up=True)
+    print(
+        f"[watch] watching {root} every {args.watch_interval:g}s "
+        f"(debounce {args.watch_debounce:g}s); press Ctrl+C to stop."
+    )
+
+    pending: Set[Path] = set()
+    first_change = last_change = 0.0
+    try:
+        while True:
+            time.sleep(args.watch_interval)
+            current = scan_tree(root)
+            changed = changed_paths(snapshot, current)
+            snapshot = current
+            now = time.monotonic()
+            if changed:
+                if not pending:
+                    first_change = now
+                pending |= changed
+                last_change = now
+                print(f"[watch] {len(changed)} file change(s) detected; waiting for the burst to settle")
+                continue
+            if not pending or now - last_change < args.watch_debounce:
+                continue
+            batch, pending = pending, set()
+            folders = len({path.parent for path in batch})
+            print(f"\n[watch] processing {len(batch)} changed file(s) in {folders} folder(s)")
+            try:
+                watcher.process(batch)
+            except (Exception, SystemExit) as exc:  # noqa: BLE001 - keep watching and retry after the debounce
+                print(f"[watch] batch failed, will retry: {exc}")
+                pending |= batch
+                last_change = time.monotonic()
+                continue
+            print(f"[watch] outputs updated {time.monotonic() - first_change:.0f}s after the first change")
+    except KeyboardInterrupt:
+        print("\n[watch] stopped.")
+
+
+def main() -> None:
+    ensure_scripts_exist()
+    args = parse_args()
+    if args.explain:
+        args.incremental = True
+    if args.watch:
+        if args.stream_stages or args.incremental or args.profile:
+            raise SystemExit("--watch cannot be combined with --stream-stages, --incremental or --profile.")
+        args.in_process = True
+    if args.stream_stages:
+        if args.incremental:
+            raise SystemExit("--stream-stages cannot be combined with --incremental/--explain.")
+        if args.skip_ocr or args.skip_metadata or args.skip_consolidate or args.skip_enrich:
+            raise SystemExit("--stream-stages runs all four stages; drop the --skip-* flags.")
+        args.in_process = True
+    if args.incremental:
+        args.in_process = True
+    if args.keep_sidecars_in_memory and not args.in_process:
+        raise SystemExit("--keep-sidecars-in-memory requires --in-process.")
+    if (args.profile_cprofile or args.profile_tracemalloc) and not args.profile:
+        raise SystemExit("--profile-cprofile/--profile-tracemalloc require --profile.")
+    if args.profile_tracemalloc and not args.in_process:
+        raise SystemExit("--profile-tracemalloc requires --in-process (subprocess stages are not traced).")
+
+    profiler = None
+    if args.profile and not args.dry_run:
+        profiler = PipelineProfiler(args.profile, args.profile_top, args.profile_cprofile, args.profile_tracemalloc)
+    mode = "streaming" if args.stream_stages else "in-process" if args.in_process else "subprocess"
+    try:
+        if args.watch:
+            if args.dry_run:
+                raise SystemExit("--watch has nothing to show with --dry-run.")
+            run_watch(args)
+        elif args.stream_stages:
+            with _stage(profiler, "streaming"):
+                run_streaming(args, profiler)
+        elif args.in_process:
+            manifest = BuildManifest(args.manifest, args.explain) if args.incremental and not args.dry_run else None
+            run_in_process(args, manifest, profiler)
+        else:
+            run_subprocesses(args, profiler)
+    finally:
+        if profiler is not None:
+            report = profiler.write({"mode": mode})
+            print(f"\n{format_summary(report)}\nProfile report written to {args.profile}")
 
     print("\nPipeline completed.")
     if args.show_extractions:
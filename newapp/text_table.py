@@ -0,0 +1,125 @@
+"""Content-addressed storage for the raw OCR texts in profile payloads.
+
+Consolidated and enriched payloads repeat every screenshot's OCR text in
+``sources[].raw_response`` and again in the profile's ``raw_responses``. In the
+"embedded" and "sidecar" layouts each distinct text is stored once in a table
+keyed by a hash of its content, and profiles and sources reference it as
+``raw_response_ids`` / ``raw_response_id``. The table sits under ``"texts"`` in
+the payload itself or in a ``<name>.texts.json`` file next to it.
+
+``read_payload`` always hands back the inline layout; texts are shared string
+objects, so a text referenced many times is held in memory once.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+TEXT_TABLE_MODES = ("inline", "embedded", "sidecar")
+ID_LENGTH = 16
+
+
+def text_id(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:ID_LENGTH]
+
+
+def sidecar_path(path: Path) -> Path:
+    return path.with_name(f"{path.stem}.texts.json")
+
+
+def payload_mode(payload: Dict[str, Any]) -> str:
+    if "text_table" in payload:
+        return "sidecar"
+    if "texts" in payload:
+        return "embedded"
+    return "inline"
+
+
+def _swap(entry: Dict[str, Any], old: str, new: str, value: Any) -> Dict[str, Any]:
+    """Copy ``entry`` with key ``old`` replaced by ``new`` at the same position."""
+    return {(new if key == old else key): (value if key == old else item) for key, item in entry.items()}
+
+
+def pack(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Return a copy of an inline ``payload`` that references texts by id, plus the text table."""
+    table: Dict[str, str] = {}
+
+    def ref(text: Any) -> Any:
+        if not isinstance(text, str):
+            return text
+        key = text_id(text)
+        table[key] = text
+        return key
+
+    profiles: List[Dict[str, Any]] = []
+    for profile in payload.get("profiles", []):
+        packed = dict(profile)
+        if "raw_responses" in packed:
+            ids = [ref(text) for text in packed["raw_responses"] or []]
+            packed = _swap(packed, "raw_responses", "raw_response_ids", ids)
+        if isinstance(packed.get("sources"), list):
+            packed["sources"] = [
+                _swap(source, "raw_response", "raw_response_id", ref(source["raw_response"]))
+                if "raw_response" in source
+                else source
+                for source in packed["sources"]
+            ]
+        profiles.append(packed)
+    packed_payload = dict(payload)
+    packed_payload["profiles"] = profiles
+    return packed_payload, dict(sorted(table.items()))
+
+
+def unpack(payload: Dict[str, Any], table: Dict[str, str]) -> Dict[str, Any]:
+    """Replace text ids in ``payload`` (in place) with the shared strings from ``table``."""
+    payload.pop("texts", None)
+    payload.pop("text_table", None)
+    for index, profile in enumerate(payload.get("profiles", [])):
+        if "raw_response_ids" in profile:
+            texts = [table.get(key) for key in profile["raw_response_ids"]]
+            profile = _swap(profile, "raw_response_ids", "raw_responses", texts)
+        if isinstance(profile.get("sources"), list):
+            profile["sources"] = [
+                _swap(source, "raw_response_id", "raw_response", table.get(source["raw_response_id"]))
+                if "raw_response_id" in source
+                else source
+                for source in profile["sources"]
+            ]
+        payload["profiles"][index] = profile
+    return payload
+
+
+def render(payload: Dict[str, Any], path: Path, mode: str, indent: int) -> Dict[Path, str]:
+    """Serialise ``payload`` for ``path`` in ``mode``; returns ``{file: text}`` for every file to write."""
+    if mode == "inline":
+        return {path: json.dumps(payload, indent=indent, ensure_ascii=False)}
+    packed, table = pack(payload)
+    if mode == "embedded":
+        packed["texts"] = table
+        return {path: json.dumps(packed, indent=indent, ensure_ascii=False)}
+    table_path = sidecar_path(path)
+    packed["text_table"] = table_path.name
+    return {
+        path: json.dumps(packed, indent=indent, ensure_ascii=False),
+        table_path: json.dumps(table, indent=indent, ensure_ascii=False),
+    }
+
+
+def write_payload(payload: Dict[str, Any], path: Path, mode: str = "inline", indent: int = 2) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for target, text in render(payload, path, mode, indent).items():
+        target.write_text(text, encoding="utf-8")
+
+
+def read_payload(path: Path) -> Tuple[Dict[str, Any], str]:
+    """Load a payload in any layout; returns it in the inline layout and the layout it was stored in."""
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    mode = payload_mode(payload) if isinstance(payload, dict) else "inline"
+    if mode == "embedded":
+        unpack(payload, payload["texts"])
+    elif mode == "sidecar":
+        unpack(payload, json.loads((path.parent / payload["text_table"]).read_text(encoding="utf-8")))
+    return payload, mode
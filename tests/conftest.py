@@ -5,3 +5,90 @@ ROOT = Path(__file__).resolve().parents[1]
 SRC = ROOT / "src"
 if str(SRC) not in sys.path:
     sys.path.insert(0, str(SRC))
+
+import importlib.util
+
+import pytest
+
+NEWAPP = ROOT / "newapp"
+if str(NEWAPP) not in sys.path:
+    sys.path.insert(0, str(NEWAPP))
+
+
+def _load_stage(filename):
+    """Import one of the hyphenated newapp stage scripts as a module."""
+    path = NEWAPP / filename
+    spec = importlib.util.spec_from_file_location(path.stem.replace("-", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    # Registered first so dataclasses and pydantic can resolve the module's annotations.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def ocr_stage():
+    return _load_stage("1-process_ocr.py")
+
+
+@pytest.fixture(scope="session")
+def consolidate_stage():
+    return _load_stage("3-consolidate_profiles.py")
+
+
+@pytest.fixture(scope="session")
+def extend_stage():
+    return _load_stage("4-extend_profiles.py")
+
+
+def _start_fake_ollama(responses=None, latency="fixed:0", model_latency=None, failure_rate=0.0):
+    from fake_ollama import FakeOllama, parse_distribution, start_server
+
+    overrides = {model: parse_distribution(spec) for model, spec in (model_latency or {}).items()}
+    fake = FakeOllama(responses or {}, parse_distribution(latency), overrides, failure_rate, 0)
+    server = start_server(fake, "127.0.0.1", 0)
+    return fake, server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@pytest.fixture(scope="session")
+def ollama_host():
+    """A fake Ollama server answering instantly with the canned responses."""
+    _, server, host = _start_fake_ollama()
+    yield host
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake_ollama():
+    """Start fake Ollama servers with their own responses, latencies and failures; returns ``(fake, host)``."""
+    servers = []
+
+    def start(**options):
+        fake, server, host = _start_fake_ollama(**options)
+        servers.append(server)
+        return fake, host
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(scope="session")
+def metadata_stage():
+    return _load_stage("2-add_metadata.py")
+
+
+@pytest.fixture
+def label_index(monkeypatch):
+    """Put back the shared folder label index that the stages update."""
+    import folder_labels
+
+    previous = folder_labels.DEFAULT_INDEX.read_bytes() if folder_labels.DEFAULT_INDEX.exists() else None
+    monkeypatch.setattr(folder_labels, "_default_index", None)
+    yield
+    if previous is None:
+        folder_labels.DEFAULT_INDEX.unlink(missing_ok=True)
+    else:
+        folder_labels.DEFAULT_INDEX.write_bytes(previous)
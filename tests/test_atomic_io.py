@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from atomic_io import atomic_write_text, write_if_changed
+
+
+def test_write_if_changed_only_replaces_different_text(tmp_path):
+    path = tmp_path / "nested" / "state.json"
+
+    assert write_if_changed(path, "uno") is True
+    mtime = path.stat().st_mtime_ns
+    assert write_if_changed(path, "uno") is False
+    assert write_if_changed(path, "uno", existing="uno") is False
+    assert path.stat().st_mtime_ns == mtime
+    assert write_if_changed(path, "dos") is True
+    assert path.read_text(encoding="utf-8") == "dos"
+    assert list(path.parent.iterdir()) == [path]
+
+
+def test_failed_write_keeps_the_previous_file(tmp_path, monkeypatch):
+    path = tmp_path / "state.json"
+    atomic_write_text(path, "uno")
+
+    def broken_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("atomic_io.os.replace", broken_replace)
+    with pytest.raises(OSError):
+        atomic_write_text(path, "dos")
+
+    assert path.read_text(encoding="utf-8") == "uno"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_unchanged_sidecar_keeps_its_mtime(metadata_stage, tmp_path):
+    root = tmp_path / "PATRON"
+    sidecar = root / "VIP ⭐" / "4 - KIMBERLY" / "Screenshot_1.json"
+    sidecar.parent.mkdir(parents=True)
+    sidecar.write_text(json.dumps({"raw_response": "Hola"}))
+
+    assert metadata_stage.process_json_file(sidecar, 2, root) is True
+    mtime = sidecar.stat().st_mtime_ns
+    assert metadata_stage.process_json_file(sidecar, 2, root) is False
+
+    assert sidecar.stat().st_mtime_ns == mtime
+    assert json.loads(sidecar.read_text())["metadata"]["VIP"] == "VIP"
+    assert list(sidecar.parent.iterdir()) == [sidecar]
@@ -0,0 +1,53 @@
+import os
+
+from build_manifest import BuildManifest, file_digest, json_digest
+
+
+def test_stale_reason_detects_new_changed_and_lost_items(tmp_path):
+    manifest = BuildManifest(tmp_path / "manifest.json")
+
+    assert manifest.stale_reason("ocr", "a.jpg", "in-1") == "new item"
+    manifest.record("ocr", "a.jpg", "in-1", "out-1")
+
+    assert manifest.stale_reason("ocr", "a.jpg", "in-1", "out-1") is None
+    assert manifest.stale_reason("ocr", "a.jpg", "in-2", "out-1") == "inputs changed"
+    assert manifest.stale_reason("ocr", "a.jpg", "in-1", "out-2") == "output changed since last build"
+    assert manifest.stale_reason("ocr", "a.jpg", "in-1", "") == "output missing"
+    assert manifest.summary("ocr") == "ocr: 4 rebuilt, 1 up to date"
+
+
+def test_manifest_round_trips_and_prunes(tmp_path):
+    path = tmp_path / "manifest.json"
+    manifest = BuildManifest(path)
+    manifest.record("metadata", "a.json", "in-a", "out-a")
+    manifest.record("metadata", "b.json", "in-b", "out-b")
+    manifest.save()
+
+    reloaded = BuildManifest(path)
+    assert reloaded.stale_reason("metadata", "a.json", "in-a", "out-a") is None
+    assert reloaded.prune("metadata", ["a.json"]) == ["b.json"]
+    assert reloaded.stale_reason("metadata", "b.json", "in-b") == "new item"
+
+
+def test_file_input_rehashes_only_when_stamp_changes(tmp_path):
+    image = tmp_path / "Screenshot_1.jpg"
+    image.write_bytes(b"first")
+    manifest = BuildManifest(tmp_path / "manifest.json")
+
+    digest, stamp = manifest.file_input("ocr", "Screenshot_1.jpg", image)
+    assert digest == file_digest(image)
+    # A recorded hash is trusted while size and mtime match, even if it is not the file's hash.
+    manifest.record("ocr", "Screenshot_1.jpg", "recorded", stamp=stamp)
+    assert manifest.file_input("ocr", "Screenshot_1.jpg", image) == ("recorded", stamp)
+
+    image.write_bytes(b"second")
+    stat = image.stat()
+    os.utime(image, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    digest, new_stamp = manifest.file_input("ocr", "Screenshot_1.jpg", image)
+    assert new_stamp != stamp
+    assert digest == file_digest(image)
+
+
+def test_json_digest_ignores_key_order():
+    assert json_digest({"a": 1, "b": [1, 2]}) == json_digest({"b": [1, 2], "a": 1})
+    assert json_digest({"a": 1}) != json_digest({"a": 2})
@@ -0,0 +1,277 @@
+import json
+from pathlib import Path
+
+
+def _touch(path, data=b"x"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def test_media_listing_matches_rglob_order_and_exclusions(consolidate_stage, tmp_path):
+    profile = tmp_path / "VIP" / "4 - KIM"
+    for name in ("b.jpg", "A.mp4", "notes.txt", "sub/c.png", "sub/deeper/d.webp"):
+        _touch(profile / name)
+    cache = consolidate_stage.MediaScanCache(tmp_path)
+
+    expected = [
+        str(path.relative_to(tmp_path))
+        for path in sorted(profile.rglob("*"))
+        if path.is_file() and path.suffix.lower() in consolidate_stage.MEDIA_EXTENSIONS
+    ]
+    assert cache.list(profile, set()) == expected
+    excluded = {str((profile / "b.jpg").resolve())}
+    assert cache.list(profile, excluded) == [rel for rel in expected if not rel.endswith("b.jpg")]
+    assert cache.list(tmp_path / "missing", set()) == []
+
+
+def test_media_listing_is_scanned_once_per_cache(consolidate_stage, tmp_path):
+    profile = tmp_path / "KIM"
+    _touch(profile / "a.jpg")
+    cache = consolidate_stage.MediaScanCache(tmp_path)
+    assert cache.list(profile, set()) == [str(Path("KIM") / "a.jpg")]
+
+    _touch(profile / "b.jpg")
+    # The run's cache keeps its listing; the next run starts with a fresh one.
+    assert cache.list(profile, set()) == [str(Path("KIM") / "a.jpg")]
+    fresh = consolidate_stage.MediaScanCache(tmp_path)
+    assert fresh.list(profile, set()) == [str(Path("KIM") / "a.jpg"), str(Path("KIM") / "b.jpg")]
+
+
+def test_merge_dict_with_shared_seen_matches_fresh_merges(consolidate_stage):
+    incoming = [
+        {"name": "Kim", "tags": ["a", {"k": 1}], "contact": {"phones": ["8888"]}},
+        {"name": "Kim", "tags": [{"k": 1}, "b"], "contact": {"phones": ["8888", "7777"]}},
+        {"name": "Kimberly", "tags": ["a"], "contact": {"phones": []}},
+    ]
+    shared, fresh = {}, {}
+    shared_conflicts, fresh_conflicts = [], []
+    seen = {}
+    for idx, payload in enumerate(incoming):
+        consolidate_stage._merge_dict(shared, payload, shared_conflicts, [], f"s{idx}", seen)
+        consolidate_stage._merge_dict(fresh, payload, fresh_conflicts, [], f"s{idx}")
+
+    assert shared == fresh == {
+        "name": "Kim",
+        "tags": ["a", {"k": 1}, "b"],
+        "contact": {"phones": ["8888", "7777"]},
+    }
+    assert shared_conflicts == fresh_conflicts
+    assert shared_conflicts == [{"field": "name", "existing": "Kim", "candidate": "Kimberly", "source": "s2"}]
+    assert seen[("tags",)] == {consolidate_stage._serialize_for_set(item) for item in shared["tags"]}
+
+
+def test_merge_dict_records_type_conflicts(consolidate_stage):
+    target = {"tags": "vip", "contact": "8888"}
+    conflicts = []
+    consolidate_stage._merge_dict(target, {"tags": ["a"], "contact": {"phone": "7777"}}, conflicts, ["data"], "s1")
+
+    assert target == {"tags": "vip", "contact": "8888"}
+    assert [conflict["field"] for conflict in conflicts] == ["data.tags", "data.contact"]
+
+
+def _write_sidecar(path, payload):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload, ensure_ascii=False))
+    return path
+
+
+def _full(consolidate_stage, root):
+    files = consolidate_stage.discover_json_files(root)
+    return consolidate_stage.consolidate_records(((path, consolidate_stage._read_json(path)) for path in files), root)
+
+
+def _incremental(consolidate_stage, root, state, previous):
+    files = consolidate_stage.discover_json_files(root)
+    return consolidate_stage.consolidate_incremental(
+        files, consolidate_stage._read_json, consolidate_stage.file_digest, root, state, previous
+    )
+
+
+def test_incremental_consolidation_matches_full_rebuild(consolidate_stage, tmp_path):
+    root = tmp_path / "PATRON"
+    _write_sidecar(root / "VIP" / "4 - KIM" / "Screenshot_1.json", {"profile": "Kim", "text": "uno"})
+    _write_sidecar(root / "VIP" / "4 - KIM" / "Screenshot_2.json", {"profile": "Kim", "text": "dos"})
+    _write_sidecar(root / "1 (diosa)" / "Screenshot_3.json", {"profile": "Diosa", "text": "tres"})
+    _touch(root / "1 (diosa)" / "foto.jpg")
+    state = consolidate_stage.ConsolidationState(tmp_path / "state.json")
+
+    first, rebuilt = _incremental(consolidate_stage, root, state, {})
+    assert first == _full(consolidate_stage, root)
+    assert rebuilt == {"kim", "diosa"}
+
+    _write_sidecar(root / "VIP" / "4 - KIM" / "Screenshot_2.json", {"profile": "Kim", "text": "dos!"})
+    previous = dict(zip(state.keys, first["profiles"]))
+    second, rebuilt = _incremental(consolidate_stage, root, state, previous)
+    assert second == _full(consolidate_stage, root)
+    assert rebuilt == {"kim"}
+
+    _touch(root / "1 (diosa)" / "video.mp4")
+    previous = dict(zip(state.keys, second["profiles"]))
+    third, rebuilt = _incremental(consolidate_stage, root, state, previous)
+    assert third == _full(consolidate_stage, root)
+    assert rebuilt == {"diosa"}
+
+
+def _identity(key, name=None, phones=(), folder=None):
+    return {"key": key, "name": name or key, "phones": list(phones), "folder": folder}
+
+
+def test_identity_index_merges_folded_names_phones_and_folder_codes(consolidate_stage):
+    identities = [
+        _identity("kimberly", "Kimberly", phones=["88887777"]),
+        _identity("kimberly ⭐", "KIMBERLY ⭐"),
+        _identity("4", folder="4", phones=["88887777"]),
+        _identity("josé", "José"),
+        _identity("jose", "jose"),
+        _identity("ana", "Ana"),
+    ]
+
+    mapping, names, review = consolidate_stage.resolve_identities(identities)
+
+    assert mapping["kimberly ⭐"] == mapping["4"] == mapping["kimberly"] == "kimberly"
+    assert mapping["josé"] == mapping["jose"]
+    assert mapping["ana"] == "ana"
+    assert names["kimberly"] == "Kimberly"
+    assert review == []
+
+
+def test_identity_review_lists_one_group_per_shared_key(consolidate_stage):
+    identities = [
+        _identity("ana", "Ana", phones=["60001111"]),
+        _identity("maria", "Maria", phones=["60001111"]),
+        _identity("sofia", "Sofia", phones=["60001111"]),
+        _identity("daniela", "Daniela"),
+        _identity("daniella", "Daniella"),
+    ]
+
+    mapping, _, review = consolidate_stage.resolve_identities(identities)
+
+    assert len(set(mapping.values())) == 5
+    assert review == [
+        {
+            "shared": "name:dani",
+            "profiles": ["Daniela", "Daniella"],
+            "keys": ["daniela", "daniella"],
+            "reason": "similar names",
+            "score": 0.93,
+        },
+        {
+            "shared": "phone:60001111",
+            "profiles": ["Ana", "Maria", "Sofia"],
+            "keys": ["ana", "maria", "sofia"],
+            "reason": "shared phone, different names",
+            "score": 0.5,
+        },
+    ]
+
+
+def test_identity_review_without_merging(consolidate_stage):
+    identities = [_identity("kim", phones=["88887777"]), _identity("4", folder="4", phones=["88887777"])]
+
+    mapping, _, review = consolidate_stage.resolve_identities(identities, merge=False)
+
+    assert mapping == {"kim": "kim", "4": "4"}
+    assert [(group["shared"], group["keys"], group["reason"]) for group in review] == [
+        ("phone:88887777", ["4", "kim"], "shared phone")
+    ]
+
+
+def test_identity_find_compresses_the_whole_path(consolidate_stage):
+    index = consolidate_stage.IdentityIndex()
+    index._parent = {"d": "c", "c": "b", "b": "a"}
+
+    assert index._find("d") == "a"
+    assert index._parent == {"d": "a", "c": "a", "b": "a"}
+
+
+def test_oversized_blocks_are_not_compared(consolidate_stage):
+    index = consolidate_stage.IdentityIndex(max_block=2)
+    for key in ("ana", "maria", "sofia"):
+        index.add(_identity(key, phones=["60001111"]))
+
+    mapping, review = index.resolve()
+
+    assert review == []
+    assert set(mapping.values()) == {"ana", "maria", "sofia"}
+
+
+def test_folder_number_does_not_chain_conflicting_names(consolidate_stage):
+    identities = [
+        _identity("kimberly", "Kimberly", folder="4"),
+        _identity("ana", "Ana", folder="4"),
+        _identity("4", folder="4"),
+    ]
+
+    mapping, _, review = consolidate_stage.resolve_identities(identities)
+
+    assert mapping == {"kimberly": "kimberly", "ana": "ana", "4": "4"}
+    assert [(group["shared"], group["keys"]) for group in review] == [("folder:4", ["4", "ana", "kimberly"])]
+    assert "conflicting names" in review[0]["reason"]
+
+
+def test_folder_number_joins_a_group_it_fits(consolidate_stage):
+    identities = [
+        _identity("kimberly", "Kimberly", phones=["88887777"]),
+        _identity("kimberly ⭐", "KIMBERLY ⭐", folder="4"),
+        _identity("4", folder="4", phones=["88887777"]),
+        _identity("ana", "Ana", phones=["60001111"]),
+    ]
+
+    mapping, _, review = consolidate_stage.resolve_identities(identities)
+
+    assert mapping == {"kimberly": "kimberly", "kimberly ⭐": "kimberly", "4": "kimberly", "ana": "ana"}
+    assert review == []
+
+
+def test_resolve_new_matches_a_full_resolve_folder_by_folder(consolidate_stage):
+    folders = [
+        [_identity("kimberly", "Kimberly", phones=["88887777"]), _identity("ana", "Ana")],
+        [_identity("kimberly ⭐", "KIMBERLY ⭐", folder="4")],
+        [_identity("4", folder="4", phones=["88887777"]), _identity("josé", "José")],
+        [_identity("jose", "jose"), _identity("ana", "Ana", phones=["60001111"])],
+    ]
+    index = consolidate_stage.IdentityIndex()
+    seen = []
+    for folder in folders:
+        seen.extend(folder)
+        mapping = index.resolve_new(folder)
+        assert mapping == consolidate_stage.resolve_identities(seen)[0]
+
+
+def test_resolve_new_only_compares_pairs_with_new_buckets(consolidate_stage, monkeypatch):
+    index = consolidate_stage.IdentityIndex()
+    index.resolve_new([_identity("ana", phones=["60001111"]), _identity("maria", phones=["60001111"])])
+    pairs = []
+    compare = consolidate_stage.IdentityIndex._compare
+    monkeypatch.setattr(
+        consolidate_stage.IdentityIndex,
+        "_compare",
+        lambda self, block, left, right, *rest: pairs.append((left, right)) or compare(self, block, left, right, *rest),
+    )
+
+    index.resolve_new([_identity("sofia", phones=["60001111"]), _identity("ana", phones=["60001111"])])
+
+    assert sorted(pairs) == [("ana", "sofia"), ("maria", "sofia")]
+
+
+def test_shared_media_bytes_are_written_once_in_copy_mode(consolidate_stage, tmp_path):
+    root = tmp_path / "PATRON"
+    first = _touch(root / "KIM" / "foto.jpg", b"same bytes")
+    _touch(root / "4 - KIMBERLY" / "foto.jpg", b"same bytes")
+    _touch(root / "ANA" / "otra.jpg", b"different!")
+    profiles = [
+        {"profile": "Kim", "media": ["KIM/foto.jpg"]},
+        {"profile": "Kimberly", "media": ["4 - KIMBERLY/foto.jpg", "ANA/otra.jpg"]},
+    ]
+    media_root = tmp_path / "media"
+
+    stats = consolidate_stage.export_profile_media(profiles, root, media_root)
+
+    assert (stats["copied"], stats["reflinked"] + stats["hardlinked"]) == (2, 1)
+    assert stats["bytes_avoided"] == len(b"same bytes")
+    kim, kimberly = media_root / "Kim" / "foto.jpg", media_root / "Kimberly" / "foto.jpg"
+    assert kimberly.read_bytes() == b"same bytes"
+    assert kim.stat().st_ino != first.stat().st_ino
+    if stats["hardlinked"]:
+        assert kim.stat().st_ino == kimberly.stat().st_ino
@@ -0,0 +1,56 @@
+import asyncio
+import json
+
+import pytest
+
+
+@pytest.fixture
+def fake_model(extend_stage, monkeypatch):
+    """Replace the Ollama call with one whose latency is set per profile, tracking requests in flight."""
+    stats = {"inflight": 0, "peak": 0, "calls": []}
+
+    async def fake_run(client, model, prompt, timeout, stream=False):
+        name = prompt.rsplit("Nombre-", 1)[1].split()[0]
+        stats["calls"].append(name)
+        stats["inflight"] += 1
+        stats["peak"] = max(stats["peak"], stats["inflight"])
+        try:
+            await asyncio.sleep(0.01 * (10 - int(name)))
+        finally:
+            stats["inflight"] -= 1
+        return json.dumps({"nombre": f"Perfil {name}"})
+
+    monkeypatch.setattr(extend_stage, "run_ollama_async", fake_run)
+    return stats
+
+
+def _profiles(count):
+    return [{"profile": str(idx), "raw_responses": [f"Nombre-{idx} texto"]} for idx in range(count)]
+
+
+def _args(extend_stage, tmp_path, *extra):
+    return extend_stage.parse_args(["--media-root", str(tmp_path / "media"), *extra])
+
+
+def test_results_keep_input_order_within_the_concurrency_limit(extend_stage, fake_model, tmp_path):
+    profiles = _profiles(8)
+    completed = []
+    args = _args(extend_stage, tmp_path, "--concurrency", "3")
+
+    results = list(extend_stage._enrich_concurrently(profiles, args, lambda profile, _: completed.append(profile)))
+
+    assert [profile["profile"] for profile, _ in results] == [str(idx) for idx in range(8)]
+    assert all(extracted for _, extracted in results)
+    assert fake_model["peak"] == 3
+    # Later profiles answer first, yet every one is reported exactly once.
+    assert sorted(profile["profile"] for profile in completed) == [str(idx) for idx in range(8)]
+
+
+def test_limit_picks_the_same_profiles_as_the_sequential_loop(extend_stage, fake_model, tmp_path):
+    profiles = _profiles(6)
+    args = _args(extend_stage, tmp_path, "--concurrency", "4", "--limit", "2")
+
+    results = list(extend_stage._enrich_concurrently(profiles, args, None))
+
+    assert [extracted for _, extracted in results] == [True, True, False, False, False, False]
+    assert sorted(fake_model["calls"]) == ["0", "1"]
@@ -0,0 +1,131 @@
+import argparse
+import json
+import random
+import subprocess
+import sys
+import urllib.error
+import urllib.request
+
+import pytest
+
+import benchmark
+from fake_ollama import DEFAULT_RESPONSES, FakeOllama, parse_distribution
+
+
+def _generate(host, payload):
+    request = urllib.request.Request(
+        f"{host}/api/generate",
+        data=json.dumps(dict(payload, stream=False)).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+@pytest.mark.parametrize(
+    "spec, low, high",
+    [("fixed:0.5", 0.5, 0.5), ("uniform:1,2", 1, 2), ("normal:0.2,0.05", 0, 1), ("lognormal:0,0.1", 0, 2)],
+)
+def test_latency_distributions_draw_within_range(spec, low, high):
+    draw = parse_distribution(spec)
+    rng = random.Random(0)
+
+    assert all(low <= draw(rng) <= high for _ in range(50))
+
+
+@pytest.mark.parametrize("spec", ["fixed", "fixed:a", "uniform:1", "gamma:1,2"])
+def test_invalid_latency_distribution_is_an_argparse_error(spec):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_distribution(spec)
+
+
+def test_responses_are_replayed_per_model_and_prompt():
+    fake = FakeOllama({"qwen3": ["a", "b", "c"]}, parse_distribution("fixed:0"), {}, 0.0, 0)
+    structure = {"model": "qwen3", "prompt": "Estructura este texto"}
+
+    assert fake.pick_response(structure) == fake.pick_response(dict(structure))
+    assert fake.pick_response(structure) in ("a", "b", "c")
+    assert fake.classify({"model": "glm-ocr", "prompt": "x", "images": ["..."]}) == "ocr"
+    assert fake.classify({"model": "m", "prompt": "Sigue el esquema Pydantic"}) == "enrich"
+    assert fake.pick_response({"model": "other", "prompt": "x", "images": ["..."]}) in DEFAULT_RESPONSES["ocr"]
+
+
+def test_server_injects_failures_and_reports_them(fake_ollama):
+    fake, host = fake_ollama(failure_rate=1.0)
+
+    with pytest.raises(urllib.error.HTTPError) as excinfo:
+        _generate(host, {"model": "qwen3", "prompt": "Estructura este texto"})
+
+    assert excinfo.value.code == 500
+    with urllib.request.urlopen(f"{host}/_stats") as response:
+        stats = json.loads(response.read())
+    assert stats == fake.stats()
+    assert [(entry["model"], entry["status"]) for entry in stats["requests"]] == [("qwen3", "failed")]
+
+
+def test_server_answers_generate_and_version(fake_ollama):
+    fake, host = fake_ollama(responses={"qwen3": ["{}"]})
+
+    answer = _generate(host, {"model": "qwen3", "prompt": "Estructura este texto"})
+
+    assert answer["response"] == "{}"
+    assert answer["done"] is True
+    with urllib.request.urlopen(f"{host}/api/version") as response:
+        assert json.loads(response.read()) == {"version": "0.0.0-fake"}
+    assert fake.stats()["requests"][0]["status"] == "ok"
+
+
+def test_cli_shim_mimics_ollama_run(fake_ollama, tmp_path, monkeypatch):
+    fake, host = fake_ollama(responses={"qwen3": ["hola"]})
+    monkeypatch.setenv("OLLAMA_HOST", host)
+    shim = benchmark.write_cli_shim(tmp_path)
+
+    result = subprocess.run([str(shim), "run", "qwen3", "Estructura", "esto"], capture_output=True, text=True)
+
+    assert (result.returncode, result.stdout) == (0, "hola\n")
+    assert fake.stats()["requests"][0]["model"] == "qwen3"
+
+
+def test_percentile_interpolates_and_timed_map_counts_errors():
+    assert benchmark.percentile([], 50) is None
+    assert benchmark.percentile([3.0, 1.0, 2.0, 4.0], 50) == 2.5
+    assert benchmark.percentile([1.0, 2.0], 100) == 2.0
+
+    def fn(item):
+        if item % 2:
+            raise ValueError(item)
+
+    latencies, errors, wall = benchmark.timed_map(fn, range(5), 2)
+
+    assert (len(latencies), errors) == (5, 2)
+    assert wall >= 0
+
+
+@pytest.mark.parametrize("backend", ["http", "cli"])
+def test_benchmark_reports_every_stage(backend, tmp_path, monkeypatch, label_index, capsys):
+    # main points OLLAMA_HOST at its own server; setting it here makes monkeypatch restore it.
+    monkeypatch.setenv("OLLAMA_HOST", "http://127.0.0.1:1")
+    output = tmp_path / "report.json"
+    argv = [
+        "benchmark.py",
+        "--profiles", "2",
+        "--screenshots", "2",
+        "--backend", backend,
+        "--workers", "2",
+        "--latency", "fixed:0",
+        "--merge-sources", "3",
+        "--merge-items", "10",
+        "--output", str(output),
+    ]
+    monkeypatch.setattr(sys, "argv", argv)
+
+    benchmark.main()
+
+    report = json.loads(output.read_text(encoding="utf-8"))
+    stages = {stage["stage"]: stage for stage in report["stages"]}
+    assert list(stages) == ["ocr", "enrich", "merge-percall", "merge"]
+    assert (stages["ocr"]["items"], stages["ocr"]["errors"]) == (4, 0)
+    assert (stages["enrich"]["items"], stages["enrich"]["errors"]) == (2, 0)
+    assert stages["merge"]["items"] == 3
+    assert report["server"] == {"requests": 6, "failed": 0, "cancelled": 0}
+    assert "fake server" in capsys.readouterr().out
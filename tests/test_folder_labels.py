@@ -0,0 +1,46 @@
+from folder_labels import FolderLabelIndex, parse_folder
+
+
+def test_parse_folder_keeps_base_display_and_emoji():
+    label = parse_folder("4 - KIMBERLY ⭐⭐")
+
+    assert (label.base, label.display, label.emoji, label.key) == ("KIMBERLY ⭐⭐", "KIMBERLY", "⭐⭐", "kimberly")
+    assert parse_folder("1 (diosa)").display == "diosa"
+
+
+def test_scan_records_directories_with_their_categories(tmp_path):
+    profile = tmp_path / "VIP ⭐" / "4 - KIMBERLY ⭐⭐"
+    profile.mkdir(parents=True)
+    path = tmp_path / "labels.json"
+    index = FolderLabelIndex(path)
+
+    index.scan(tmp_path)
+    assert index.directories == {
+        str(tmp_path.resolve() / "VIP ⭐"): ("VIP ⭐",),
+        str(profile.resolve()): ("VIP ⭐", "4 - KIMBERLY ⭐⭐"),
+    }
+    index.save()
+    entry = FolderLabelIndex(path).directory(profile.resolve())
+
+    assert (entry.display, entry.emoji) == ("KIMBERLY", "⭐⭐")
+    assert [(label.display, label.emoji) for label in entry.categories] == [("VIP", "⭐")]
+
+
+def test_scan_forgets_removed_directories(tmp_path):
+    gone = tmp_path / "Cortesia" / "ANA"
+    gone.mkdir(parents=True)
+    index = FolderLabelIndex(None)
+    index.scan(tmp_path)
+    gone.rmdir()
+    index.scan(tmp_path)
+
+    assert str(gone.resolve()) not in index.directories
+    assert index.directory(gone.resolve()).categories == ()
+
+
+def test_directory_relative_to_an_explicit_root(tmp_path):
+    index = FolderLabelIndex(None)
+    entry = index.directory(tmp_path / "A" / "B" / "3 - LUNA", tmp_path / "A")
+
+    assert entry.display == "LUNA"
+    assert [label.display for label in entry.categories] == ["B"]
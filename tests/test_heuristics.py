@@ -0,0 +1,37 @@
+import pytest
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("Nombre: Kimberly Edad: 23", "Kimberly"),
+        ("Nombre: María José\nEdad: 23", "María José"),
+        ("Nombre: Ana Lucía Soto Pérez", "Ana Lucía Soto"),
+        ("Nombre: Kim, 23 años", "Kim"),
+        ("NOMBRE:Dany-Lee Zona: Escazú", "Dany-Lee"),
+    ],
+)
+def test_name_label_stops_at_next_label(ocr_stage, text, expected):
+    assert ocr_stage.NAME_LABEL_PATTERN.search(text).group(1) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["+50688887777", "WhatsApp +506 8888-7777", "506-8888-7777", "8888 7777", "Tel: 88887777."],
+)
+def test_phone_pattern_matches_common_forms(ocr_stage, text):
+    assert ocr_stage.PHONE_PATTERN.search(text).groups() == ("8888", "7777")
+
+
+@pytest.mark.parametrize("text", ["ref 1234567890123", "+15058888777", "9999 7777"])
+def test_phone_pattern_ignores_other_numbers(ocr_stage, text):
+    assert ocr_stage.PHONE_PATTERN.search(text) is None
+
+
+def test_heuristic_structure_labels_do_not_bleed(ocr_stage):
+    structured, confidence = ocr_stage.heuristic_structure("Nombre: Kimberly Edad: 23\nWhatsApp +50688887777")
+
+    assert structured["name"] == "Kimberly"
+    assert structured["age"] == 23
+    assert structured["contact"]["whatsapp"] == "+50688887777"
+    assert confidence["contact"] == 0.8
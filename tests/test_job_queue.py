@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+
+import pytest
+
+
+def _queue(ocr_stage, tmp_path, max_attempts=2, backoff=0.0):
+    return ocr_stage.JobQueue(tmp_path / "jobs.sqlite3", max_attempts=max_attempts, backoff=backoff)
+
+
+def test_enqueue_skips_known_images_and_finished_sidecars(ocr_stage, tmp_path):
+    done = tmp_path / "Screenshot_1.jpg"
+    done.with_suffix(".json").write_text("{}")
+    todo = tmp_path / "Screenshot_2.jpg"
+    queue = _queue(ocr_stage, tmp_path)
+
+    assert queue.enqueue([done, todo], overwrite=False) == 2
+    assert queue.enqueue([done, todo], overwrite=False) == 0
+    assert queue.outstanding() == [todo]
+    assert queue.status()["counts"] == {"pending": 1, "running": 0, "done": 1, "failed": 0}
+
+    queue.enqueue([done], overwrite=True)
+    assert queue.outstanding() == [done, todo]
+    queue.close()
+
+
+def test_failed_jobs_retry_until_max_attempts(ocr_stage, tmp_path):
+    image = tmp_path / "Screenshot_1.jpg"
+    queue = _queue(ocr_stage, tmp_path, max_attempts=2)
+    queue.enqueue([image], overwrite=False)
+
+    def boom():
+        raise RuntimeError("model down")
+
+    for _ in range(2):
+        assert queue.outstanding() == [image]
+        with pytest.raises(RuntimeError):
+            queue.track(image, boom)()
+
+    assert queue.outstanding() == []
+    assert queue.outstanding(failed_only=True) == [image]
+    status = queue.status()
+    assert status["exhausted"] == 1
+    assert status["recent_failures"][0]["attempts"] == 2
+    assert status["recent_failures"][0]["last_error"] == "RuntimeError: model down"
+    queue.close()
+
+
+def test_backoff_delays_retry(ocr_stage, tmp_path):
+    image = tmp_path / "Screenshot_1.jpg"
+    queue = _queue(ocr_stage, tmp_path, max_attempts=3, backoff=3600.0)
+    queue.enqueue([image], overwrite=False)
+    queue.fail(image, "timeout")
+
+    assert queue.outstanding() == []
+    assert queue.outstanding(failed_only=True) == [image]
+    queue.close()
+
+
+def test_interrupted_running_jobs_are_claimed_again(ocr_stage, tmp_path):
+    image = tmp_path / "Screenshot_1.jpg"
+    queue = _queue(ocr_stage, tmp_path)
+    queue.enqueue([image], overwrite=False)
+    queue.start(image)
+    assert queue.outstanding() == []
+    queue.close()
+
+    reopened = _queue(ocr_stage, tmp_path)
+    assert reopened.outstanding() == [image]
+    reopened.track(image, lambda: None)()
+    assert reopened.outstanding() == []
+    assert reopened.status()["counts"]["done"] == 1
+    reopened.close()
+
+
+def test_failed_job_returns_after_its_backoff_and_ends_exhausted(ocr_stage, tmp_path, monkeypatch):
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(ocr_stage, "time", SimpleNamespace(time=lambda: clock["now"]))
+    image = tmp_path / "Screenshot_1.jpg"
+    queue = _queue(ocr_stage, tmp_path, max_attempts=3, backoff=10.0)
+    queue.enqueue([image], overwrite=False)
+
+    def boom():
+        raise RuntimeError("model down")
+
+    # Attempt n waits backoff * 2 ** (n - 1) before the job is handed out again.
+    for delay in (10.0, 20.0):
+        with pytest.raises(RuntimeError):
+            queue.track(image, boom)()
+        clock["now"] += delay - 1
+        assert queue.outstanding() == []
+        clock["now"] += 1
+        assert queue.outstanding() == [image]
+
+    with pytest.raises(RuntimeError):
+        queue.track(image, boom)()
+    clock["now"] += 10_000
+    # Out of attempts: it is never handed out again, only listed for --retry-failed.
+    assert queue.outstanding() == []
+    assert queue.status()["exhausted"] == 1
+    assert queue.status()["recent_failures"][0]["attempts"] == 3
+    assert queue.outstanding(failed_only=True) == [image]
+    queue.close()
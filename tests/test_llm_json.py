@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from llm_json import JSONObjectScanner, first_json_object, loads_lenient, repair_json
+
+
+def test_scanner_reports_first_object_across_chunks():
+    scanner = JSONObjectScanner()
+    chunks = ['Sure! ```json\n{"name": "Ki', 'm", "tags": ["a}", {"x": 1}]', '}\n``` and more {"y": 2}']
+
+    results = [scanner.feed(chunk) for chunk in chunks]
+
+    assert results == [False, False, True]
+    assert scanner.json_text() == '{"name": "Kim", "tags": ["a}", {"x": 1}]}'
+
+
+def test_scanner_ignores_braces_inside_escaped_strings():
+    scanner = JSONObjectScanner()
+
+    assert scanner.feed('{"quote": "a \\"}\\" b"') is False
+    assert scanner.partial_text() == '{"quote": "a \\"}\\" b"'
+    assert scanner.feed("}") is True
+    assert json.loads(scanner.json_text()) == {"quote": 'a "}" b'}
+
+
+def test_scanner_without_object():
+    scanner = JSONObjectScanner()
+    scanner.feed("no json here")
+
+    assert not scanner.complete
+    assert scanner.json_text() is None
+    assert scanner.partial_text() is None
+    assert first_json_object("still nothing") is None
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('{"name": "Kim", "age": 2', {"name": "Kim"}),
+        ('{"name": "Kim", "bio": "hola que', {"name": "Kim"}),
+        ('{"name": "Kim", "age":', {"name": "Kim"}),
+        ('{"name": "Kim", "ag', {"name": "Kim"}),
+        ('{"name": "Kim", "vip": true', {"name": "Kim", "vip": True}),
+        ('{"name": "Kim", "tags": ["a", "b"', {"name": "Kim", "tags": ["a", "b"]}),
+        ('{"name": "Kim", "tags": ["a", "b', {"name": "Kim", "tags": ["a"]}),
+        ('{"prices": {"one_hour": "100", "two": 15', {"prices": {"one_hour": "100"}}),
+        ('{"prices": {"one_hour": "100"}', {"prices": {"one_hour": "100"}}),
+        ('```json\n{"contact": {"phone": "8888"}, ', {"contact": {"phone": "8888"}}),
+        ('{"name": "Kim"}\n```', {"name": "Kim"}),
+    ],
+)
+def test_repair_json_closes_truncated_objects(text, expected):
+    assert json.loads(repair_json(text)) == expected
+
+
+def test_repair_json_without_object_raises():
+    with pytest.raises(json.JSONDecodeError):
+        repair_json("the model said no")
+
+
+def test_loads_lenient_reports_repairs():
+    assert loads_lenient('Here: {"a": 1} trailing {"b": 2}') == ({"a": 1}, False)
+    assert loads_lenient('{"a": 1, "b": [1, 2') == ({"a": 1, "b": [1]}, True)
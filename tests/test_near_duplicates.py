@@ -0,0 +1,71 @@
+from PIL import Image, ImageDraw
+
+
+def _gradient(path, reverse=False, mark=False):
+    """A horizontal gradient (its dHash bits all agree), optionally with a small mark drawn on it."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    img = Image.new("L", (270, 600))
+    img.putdata([(255 - x if reverse else x) for _ in range(600) for x in range(270)])
+    if mark:
+        ImageDraw.Draw(img).rectangle((10, 10, 30, 20), fill=128)
+    img.convert("RGB").save(path, format="JPEG", quality=85)
+    return path
+
+
+def _tree(root):
+    folder = root / "4 - KIM"
+    return [
+        _gradient(folder / "Screenshot_1.jpg"),
+        _gradient(folder / "Screenshot_2.jpg", mark=True),
+        _gradient(folder / "Screenshot_3.jpg", reverse=True),
+        _gradient(root / "ANA" / "Screenshot_4.jpg"),
+    ]
+
+
+def test_near_duplicates_cluster_within_a_folder_only(ocr_stage, tmp_path):
+    base, near, different, other_folder = _tree(tmp_path)
+
+    clusters = ocr_stage.cluster_near_duplicates([base, near, different, other_folder], 6, 8)
+
+    grouped = {cluster["representative"]: [dup["image"] for dup in cluster["duplicates"]] for cluster in clusters}
+    assert grouped == {base: [near], different: [], other_folder: []}
+    assert len(clusters[0]["hash"]) == 16
+    assert clusters[0]["duplicates"][0]["distance"] <= 6
+
+
+def test_hashes_are_cached_by_content(ocr_stage, tmp_path, monkeypatch):
+    images = _tree(tmp_path)
+    cache = ocr_stage.OCRCache(tmp_path / "cache.sqlite3")
+    first = ocr_stage.cluster_near_duplicates(images, 6, 8, cache=cache)
+    hashed = []
+    monkeypatch.setattr(ocr_stage, "dhash", lambda path, size: hashed.append(path))
+
+    assert ocr_stage.cluster_near_duplicates(images, 6, 8, cache=cache) == first
+    assert hashed == []
+    cache.close()
+
+
+def test_duplicates_reuse_the_representative_sidecar(ocr_stage, tmp_path, fake_ollama):
+    fake, host = fake_ollama()
+    base, near, different, other_folder = _tree(tmp_path / "PATRON")
+    report = tmp_path / "near_duplicates.json"
+    args = ocr_stage.parse_args(
+        [
+            "--root", str(tmp_path / "PATRON"),
+            "--backend", "http",
+            "--ollama-host", host,
+            "--no-cache",
+            "--near-dup-threshold", "6",
+            "--near-dup-report", str(report),
+        ]
+    )
+
+    records = ocr_stage.run_ocr(args, ocr_stage.RecordSink(2, write=False)).records
+
+    duplicate = records[near.with_suffix(".json")]
+    assert duplicate["near_duplicate_of"] == str(base)
+    assert duplicate["raw_response"] == records[base.with_suffix(".json")]["raw_response"]
+    assert len(records) == 4
+    ocr_requests = [entry for entry in fake.stats()["requests"] if entry["kind"] == "ocr"]
+    assert len(ocr_requests) == 3
+    assert report.exists()
@@ -0,0 +1,76 @@
+import json
+import threading
+
+from fake_ollama import DEFAULT_RESPONSES
+
+
+class CountingBackend:
+    """Stand-in backend that numbers its answers so cache hits are visible."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, model, prompt, image=None, stop_at_json=False, cancel=None):
+        self.calls += 1
+        return f"texto {self.calls}"
+
+    def last_usage(self):
+        return None
+
+
+def test_http_backend_reuses_its_client_and_counts_tokens(ocr_stage, fake_ollama, tmp_path):
+    fake, host = fake_ollama()
+    image = tmp_path / "Screenshot_1.jpg"
+    image.write_bytes(b"jpg")
+    backend = ocr_stage.HTTPBackend(host, 10, None)
+    client = backend.client
+
+    text = backend.generate("glm-ocr", ocr_stage.OCR_PROMPT, image=image)
+    structured = backend.generate("qwen3", "Estructura este texto")
+
+    assert text in DEFAULT_RESPONSES["ocr"]
+    assert structured == DEFAULT_RESPONSES["structure"][0]
+    assert backend.client is client
+    assert backend.totals["requests"] == 2
+    assert backend.last_usage()["eval_count"] == len(structured) // 4
+    # Usage is tracked per thread, so concurrent workers each see their own request.
+    other_thread = []
+    worker = threading.Thread(target=lambda: other_thread.append(backend.last_usage()))
+    worker.start()
+    worker.join()
+    assert other_thread == [None]
+    assert [entry["kind"] for entry in fake.stats()["requests"]] == ["ocr", "structure"]
+    backend.close()
+
+
+def test_http_backend_streams_until_the_json_object_closes(ocr_stage, fake_ollama):
+    _, host = fake_ollama()
+    backend = ocr_stage.HTTPBackend(host, 10, None, stream=True)
+
+    text = backend.generate("qwen3", "Estructura este texto", stop_at_json=True)
+
+    assert json.loads(text) == json.loads(DEFAULT_RESPONSES["structure"][0])
+    assert backend.totals["requests"] == 1
+
+
+def test_cache_hit_skips_the_backend_and_a_changed_image_misses(ocr_stage, tmp_path):
+    image = tmp_path / "Screenshot_1.jpg"
+    image.write_bytes(b"uno")
+    twin = tmp_path / "copia" / "Screenshot_1.jpg"
+    twin.parent.mkdir()
+    twin.write_bytes(b"uno")
+    args = ocr_stage.parse_args(["--root", str(tmp_path)])
+    cache = ocr_stage.OCRCache(tmp_path / "cache.sqlite3")
+    backend = CountingBackend()
+
+    assert ocr_stage.recognize_text(image, args, backend, cache) == ("texto 1", {}, None)
+    assert ocr_stage.recognize_text(image, args, backend, cache) == ("texto 1", {}, str(image))
+    # The key is the image content, so an identical screenshot elsewhere hits too.
+    assert ocr_stage.recognize_text(twin, args, backend, cache) == ("texto 1", {}, str(image))
+    assert backend.calls == 1
+
+    image.write_bytes(b"dos")
+    assert ocr_stage.recognize_text(image, args, backend, cache) == ("texto 2", {}, None)
+    assert backend.calls == 2
+    assert (cache.hits, cache.misses) == (2, 2)
+    cache.close()
@@ -0,0 +1,35 @@
+def test_ocr_entries_round_trip_and_count_hits(ocr_stage, tmp_path):
+    cache = ocr_stage.OCRCache(tmp_path / "cache.sqlite3")
+    key = cache.ocr_key("sha-1", "glm-ocr", "prompt")
+
+    assert cache.get_ocr(key) is None
+    cache.put_ocr(key, "sha-1", "glm-ocr", "Nombre: Kim", "http")
+
+    assert cache.get_ocr(key) == ("Nombre: Kim", "http")
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+
+def test_ocr_key_depends_on_image_model_and_prompt(ocr_stage):
+    key = ocr_stage.OCRCache.ocr_key("sha-1", "glm-ocr", "prompt")
+
+    assert key == ocr_stage.OCRCache.ocr_key("sha-1", "glm-ocr", "prompt")
+    assert key != ocr_stage.OCRCache.ocr_key("sha-2", "glm-ocr", "prompt")
+    assert key != ocr_stage.OCRCache.ocr_key("sha-1", "other-ocr", "prompt")
+    assert key != ocr_stage.OCRCache.ocr_key("sha-1", "glm-ocr", "other prompt")
+
+
+def test_entries_persist_across_connections(ocr_stage, tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = ocr_stage.OCRCache(path)
+    structured_key = cache.structured_key("Nombre: Kim", ["a", "b"], "a")
+    cache.put_structured(structured_key, {"name": "Kim", "tags": ["ñ"]})
+    cache.put_dhash("sha-1", 8, 0xFFFF_FFFF_FFFF_FFFF)
+    cache.close()
+
+    reopened = ocr_stage.OCRCache(path)
+    assert reopened.get_structured(structured_key) == {"name": "Kim", "tags": ["ñ"]}
+    assert reopened.get_structured(reopened.structured_key("Nombre: Kim", ["a", "b"], None)) is None
+    assert reopened.get_dhash("sha-1", 8) == 0xFFFF_FFFF_FFFF_FFFF
+    assert reopened.get_dhash("sha-1", 16) is None
+    reopened.close()
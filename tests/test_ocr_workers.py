@@ -0,0 +1,47 @@
+import threading
+
+from benchmark import build_synthetic_tree
+
+
+def _ocr_args(ocr_stage, root, *extra):
+    return ocr_stage.parse_args(["--root", str(root), "--no-cache", *extra])
+
+
+def test_workers_run_images_concurrently_and_isolate_failures(ocr_stage, tmp_path, monkeypatch):
+    for idx in range(6):
+        (tmp_path / f"Screenshot_{idx}.jpg").write_bytes(b"jpg")
+    # The first three images only finish once three of them are in flight together.
+    started = threading.Barrier(3, timeout=5)
+    calls = []
+
+    def fake_process(image, args, backend, cache, preprocessor, sink):
+        calls.append(image.name)
+        if len(calls) <= 3:
+            started.wait()
+        if image.name == "Screenshot_4.jpg":
+            raise RuntimeError("model down")
+        sink.put(image.with_suffix(".json"), {"image": str(image)})
+
+    monkeypatch.setattr(ocr_stage, "process_image", fake_process)
+    done = []
+    sink = ocr_stage.RecordSink(2, write=False)
+    args = _ocr_args(ocr_stage, tmp_path, "--workers", "3")
+
+    ocr_stage.run_ocr(args, sink, on_done=lambda image, _: done.append(image.name))
+
+    assert not started.broken
+    assert sorted(calls) == sorted(done) == [f"Screenshot_{idx}.jpg" for idx in range(6)]
+    assert sorted(path.name for path in sink.records) == [f"Screenshot_{idx}.json" for idx in (0, 1, 2, 3, 5)]
+    assert not list(tmp_path.glob("*.json"))
+
+
+def test_parallel_run_writes_the_same_sidecars_as_one_worker(ocr_stage, tmp_path, ollama_host):
+    root = tmp_path / "PATRON"
+    build_synthetic_tree(root, profiles=2, screenshots=3, seed=3)
+    results = []
+    for workers in ("1", "3"):
+        args = _ocr_args(ocr_stage, root, "--backend", "http", "--ollama-host", ollama_host, "--workers", workers)
+        results.append(ocr_stage.run_ocr(args, ocr_stage.RecordSink(2, write=False)).records)
+
+    assert len(results[0]) == 6
+    assert results[0] == results[1]
@@ -0,0 +1,20 @@
+import io
+
+from PIL import Image
+
+from benchmark import build_synthetic_tree
+
+
+def test_preprocessor_crops_and_downscales(ocr_stage, tmp_path):
+    (image,) = build_synthetic_tree(tmp_path, profiles=1, screenshots=1, seed=1)
+    preprocessor = ocr_stage.ImagePreprocessor(0.1, 0.1, 600, [(0.0, 0.0, 1.0, 0.05)], 70)
+
+    data, stats = preprocessor.process(image)
+
+    with Image.open(io.BytesIO(data)) as processed:
+        assert processed.size == (337, 600)
+    assert stats["pixels_in"] == 540 * 1200
+    assert stats["pixels_out"] == 337 * 600
+    assert stats["bytes_out"] == len(data)
+    assert preprocessor.totals["images"] == 1
+    assert preprocessor.signature == "crop=0.1,0.1|max=600|masks=0,0,1,0.05|q=70"
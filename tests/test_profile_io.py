@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from profile_io import ProfileWriter, load_payload, open_profiles, write_profiles
+
+PAYLOAD = {
+    "summary": {"total_profiles": 2, "root": "PATRON"},
+    "profiles": [
+        {"profile": "Kim", "tags": ["ñ", "⭐"], "merged_metadata": {"VIP": "VIP"}},
+        {"profile": "Diosa", "tags": [], "merged_metadata": {}},
+    ],
+}
+
+
+def test_ndjson_round_trip_streams_one_profile_per_line(tmp_path):
+    path = tmp_path / "profiles.ndjson"
+
+    assert write_profiles(path, PAYLOAD) is True
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == [{"summary": PAYLOAD["summary"]}] + PAYLOAD["profiles"]
+
+    header, profiles = open_profiles(path)
+    assert header == {"summary": PAYLOAD["summary"]}
+    assert next(profiles) == PAYLOAD["profiles"][0]
+    assert list(profiles) == PAYLOAD["profiles"][1:]
+    assert load_payload(path) == PAYLOAD
+
+
+@pytest.mark.parametrize("profiles", [PAYLOAD["profiles"], []])
+def test_single_document_matches_json_dumps(tmp_path, profiles):
+    path = tmp_path / "profiles.json"
+    payload = {"summary": PAYLOAD["summary"], "profiles": profiles}
+
+    write_profiles(path, payload, indent=2)
+
+    assert path.read_text(encoding="utf-8") == json.dumps(payload, indent=2, ensure_ascii=False)
+    assert load_payload(path) == payload
+
+
+def test_unchanged_output_is_left_alone(tmp_path):
+    path = tmp_path / "profiles.ndjson"
+    write_profiles(path, PAYLOAD)
+    mtime = path.stat().st_mtime_ns
+
+    assert write_profiles(path, PAYLOAD) is False
+    assert path.stat().st_mtime_ns == mtime
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    path = tmp_path / "profiles.ndjson"
+    write_profiles(path, PAYLOAD)
+
+    with pytest.raises(RuntimeError):
+        with ProfileWriter(path, {"summary": {}}) as writer:
+            writer.write({"profile": "partial"})
+            raise RuntimeError("interrupted")
+
+    assert load_payload(path) == PAYLOAD
+    assert list(tmp_path.iterdir()) == [path]
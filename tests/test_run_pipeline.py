@@ -0,0 +1,163 @@
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import run_pipeline
+from pipeline_profile import PipelineProfiler, format_summary
+from benchmark import build_synthetic_tree
+
+
+def _args(monkeypatch, root, host, cache_db, *extra):
+    argv = [
+        "run_pipeline.py",
+        "--root", str(root),
+        "--python", sys.executable,
+        "--ocr-backend", "http",
+        "--ollama-host", host,
+        "--ocr-cache-db", str(cache_db),
+        "--ocr-overwrite",
+        "--skip-enrich",
+        *extra,
+    ]
+    monkeypatch.setattr(sys, "argv", argv)
+    return run_pipeline.parse_args()
+
+
+def _sidecars(root):
+    paths = sorted(root.rglob("Screenshot_*.json"))
+    return {str(path.relative_to(root)): json.loads(path.read_text()) for path in paths}
+
+
+@pytest.fixture
+def subprocess_sidecars(monkeypatch, tmp_path, ollama_host, label_index):
+    root = tmp_path / "PATRON"
+    build_synthetic_tree(root, profiles=2, screenshots=2, seed=7)
+    run_pipeline.run_subprocesses(
+        _args(monkeypatch, root, ollama_host, tmp_path / "subprocess.sqlite3", "--skip-consolidate")
+    )
+    sidecars = _sidecars(root)
+    for name in sidecars:
+        (root / name).unlink()
+    return root, sidecars
+
+
+def test_in_process_writes_the_same_sidecars_as_subprocesses(monkeypatch, tmp_path, ollama_host, subprocess_sidecars):
+    root, expected = subprocess_sidecars
+    args = _args(monkeypatch, root, ollama_host, tmp_path / "in_process.sqlite3", "--skip-consolidate")
+
+    run_pipeline.run_in_process(args)
+
+    assert len(expected) == 4
+    assert all("metadata" in record for record in expected.values())
+    assert _sidecars(root) == expected
+
+
+def test_sidecars_kept_in_memory_reach_consolidation_unchanged(
+    monkeypatch, tmp_path, ollama_host, subprocess_sidecars, consolidate_stage
+):
+    root, expected = subprocess_sidecars
+    handed_over = {}
+
+    def capture(consolidate_args, records):
+        handed_over.update({str(path.relative_to(root.resolve())): record for path, record in records.items()})
+
+    monkeypatch.setattr(consolidate_stage, "run_consolidation", capture)
+    args = _args(monkeypatch, root, ollama_host, tmp_path / "in_memory.sqlite3", "--keep-sidecars-in-memory")
+
+    run_pipeline.run_in_process(args)
+
+    assert _sidecars(root) == {}
+    assert handed_over == expected
+
+
+def test_profiler_records_stages_and_slowest_items(tmp_path):
+    profiler = PipelineProfiler(tmp_path / "profile.json", top=2, cprofile=True, trace_memory=True)
+    for name, seconds in (("a.jpg", 0.1), ("b.jpg", 0.3), ("c.jpg", 0.2)):
+        profiler.item("ocr", name, seconds)
+
+    with profiler.stage("ocr") as entry:
+        entry["allocated"] = len(b"".join(bytes(1024) for _ in range(100)))
+
+    report = profiler.write({"mode": "in-process"})
+
+    assert json.loads((tmp_path / "profile.json").read_text()) == report
+    (stage,) = report["stages"]
+    assert stage["allocated"] == 102400
+    assert {"wall_s", "cpu_s", "peak_rss_mb", "io", "top_functions", "tracemalloc"} <= set(stage)
+    assert Path(stage["cprofile"]).exists()
+    assert stage["tracemalloc"]["peak_mb"] > 0
+    assert report["items"]["ocr"]["count"] == 3
+    assert [entry["item"] for entry in report["items"]["ocr"]["slowest"]] == ["b.jpg", "c.jpg"]
+    assert report["mode"] == "in-process"
+    assert "ocr: 3 items" in format_summary(report)
+
+
+@pytest.mark.parametrize("mode", ["--in-process", None])
+def test_profile_flag_reports_each_stage_run(monkeypatch, tmp_path, ollama_host, label_index, mode):
+    root = tmp_path / "PATRON"
+    build_synthetic_tree(root, profiles=2, screenshots=2, seed=7)
+    report_path = tmp_path / "profile.json"
+    extra = ["--skip-consolidate", "--profile", str(report_path), "--profile-cprofile"]
+    if mode:
+        extra.append(mode)
+    _args(monkeypatch, root, ollama_host, tmp_path / "cache.sqlite3", *extra)
+
+    run_pipeline.main()
+
+    report = json.loads(report_path.read_text())
+    assert report["mode"] == ("in-process" if mode else "subprocess")
+    assert [entry["stage"] for entry in report["stages"]] == ["ocr", "metadata"]
+    for entry in report["stages"]:
+        assert Path(entry["cprofile"]).exists()
+        assert entry["top_functions"]
+    if mode:
+        # Per-image timings come from the in-process OCR workers.
+        assert report["items"]["ocr"]["count"] == 4
+    else:
+        assert all(entry["children_peak_rss_mb"] > 0 for entry in report["stages"])
+
+
+def test_watch_reprocesses_a_replaced_screenshot(monkeypatch, tmp_path, fake_ollama, label_index):
+    fake, host = fake_ollama()
+    root = tmp_path / "PATRON"
+    replaced = build_synthetic_tree(root, profiles=2, screenshots=2, seed=7)[0]
+    replacement = build_synthetic_tree(tmp_path / "new", profiles=1, screenshots=1, seed=99)[0]
+    sidecar = replaced.with_suffix(".json")
+    written = []
+
+    def poll(seconds):
+        written.append(sidecar.stat().st_mtime_ns)
+        if len(written) == 1:
+            # Copied over the old screenshot with an mtime older than its sidecar, like ``cp -p``.
+            shutil.copy2(replacement, replaced)
+            os.utime(replaced, ns=(written[0] - 10**9, written[0] - 10**9))
+        elif len(written) == 3:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(run_pipeline, "time", SimpleNamespace(sleep=poll, monotonic=time.monotonic))
+    argv = [
+        "run_pipeline.py",
+        "--root", str(root),
+        "--ocr-backend", "http",
+        "--ollama-host", host,
+        "--ocr-cache-db", str(tmp_path / "cache.sqlite3"),
+        "--skip-consolidate",
+        "--skip-enrich",
+        "--watch-interval", "0",
+        "--watch-debounce", "0",
+    ]
+    monkeypatch.setattr(sys, "argv", argv)
+
+    run_pipeline.run_watch(run_pipeline.parse_args())
+
+    ocr_requests = [entry for entry in fake.stats()["requests"] if entry["kind"] == "ocr"]
+    # Four screenshots on the catch-up pass, then only the replaced one again.
+    assert len(ocr_requests) == 5
+    assert written[2] > written[1] == written[0]
+    assert "metadata" in json.loads(sidecar.read_text())
@@ -0,0 +1,106 @@
+import time
+
+import pytest
+
+
+def _wait_for_statuses(fake, count):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        statuses = [entry["status"] for entry in fake.stats()["requests"]]
+        if len(statuses) >= count:
+            return statuses
+        time.sleep(0.05)
+    return [entry["status"] for entry in fake.stats()["requests"]]
+
+
+def test_single_model_is_cancelled_after_model_timeout(ocr_stage, fake_ollama):
+    fake, host = fake_ollama(model_latency={"slow": "fixed:3"})
+    backend = ocr_stage.HTTPBackend(host, 30, None)
+    started = time.perf_counter()
+
+    with pytest.raises(RuntimeError, match="No structuring model answered in time"):
+        ocr_stage.structure_with_models("Nombre: Kim", backend, ["slow"], None, model_timeout=0.3)
+
+    assert time.perf_counter() - started < 2
+    backend.close()
+    assert _wait_for_statuses(fake, 1) == ["cancelled"]
+
+
+def test_single_model_answer_reports_its_stats(ocr_stage, fake_ollama):
+    _, host = fake_ollama()
+    backend = ocr_stage.HTTPBackend(host, 30, None)
+
+    structured, stats = ocr_stage.structure_with_models("Nombre: Kim", backend, ["qwen3"], None, model_timeout=5)
+
+    assert structured["name"] == "Kimberly"
+    assert stats["models"]["qwen3"]["status"] == "ok"
+    backend.close()
+
+
+def _backend(ocr_stage, host, models):
+    backend = ocr_stage.HTTPBackend(host, 30, None)
+    backend.fanout_workers = models
+    return backend
+
+
+def test_models_are_asked_concurrently(ocr_stage, fake_ollama):
+    _, host = fake_ollama(latency="fixed:0.5")
+    backend = _backend(ocr_stage, host, 3)
+
+    _, stats = ocr_stage.structure_with_models("Nombre: Kim", backend, ["a", "b", "c"], None, model_timeout=10)
+
+    assert [stats["models"][model]["status"] for model in "abc"] == ["ok", "ok", "ok"]
+    assert stats["wall_s"] < 1.2
+    backend.close()
+
+
+def test_watchdog_cancels_slow_models_and_keeps_the_answers_in_time(ocr_stage, fake_ollama):
+    fake, host = fake_ollama(model_latency={"slow": "fixed:5"})
+    backend = _backend(ocr_stage, host, 2)
+
+    structured, stats = ocr_stage.structure_with_models(
+        "Nombre: Kim", backend, ["fast", "slow"], "judge", model_timeout=0.5
+    )
+
+    assert structured["name"] == "Kimberly"
+    assert stats["models"]["fast"]["status"] == "ok"
+    assert stats["models"]["slow"] == {"status": "timeout", "latency_s": None}
+    # One proposal left: nothing to reconcile, so the coordinator is not called.
+    assert "coordinator" not in stats
+    backend.close()
+    _wait_for_statuses(fake, 2)
+    # "fast" may also log as cancelled: its client hangs up as soon as the JSON object closes.
+    (slow,) = [entry for entry in fake.stats()["requests"] if entry["model"] == "slow"]
+    assert slow["status"] == "cancelled"
+    assert slow["service_s"] < 5
+
+
+def test_coordinator_reconciles_every_proposal(ocr_stage, fake_ollama):
+    fake, host = fake_ollama()
+    backend = _backend(ocr_stage, host, 2)
+
+    _, stats = ocr_stage.structure_with_models("Nombre: Kim", backend, ["a", "b"], "judge", model_timeout=10)
+
+    assert stats["coordinator"]["model"] == "judge"
+    assert stats["coordinator"]["proposals"] == 2
+    # The server logs a request once its reply is sent, so the order of the log can race.
+    _wait_for_statuses(fake, 3)
+    assert sorted(entry["model"] for entry in fake.stats()["requests"]) == ["a", "b", "judge"]
+    backend.close()
+
+
+def test_partial_reconciliation_is_not_cached(ocr_stage, fake_ollama, tmp_path):
+    fake, host = fake_ollama(model_latency={"slow": "fixed:5"})
+    args = ocr_stage.parse_args(
+        ["--root", str(tmp_path), "--llm", "fast", "--llm", "slow", "--coordinator", "judge", "--llm-timeout", "0.5"]
+    )
+    backend = _backend(ocr_stage, host, 2)
+    cache = ocr_stage.OCRCache(tmp_path / "cache.sqlite3")
+
+    structured, stats = ocr_stage.structure_text("Nombre: Kim", args, backend, cache)
+
+    assert structured["name"] == "Kimberly"
+    assert stats["models"]["slow"]["status"] == "timeout"
+    assert cache.get_structured(cache.structured_key("Nombre: Kim", args.llm, args.coordinator)) is None
+    backend.close()
+    cache.close()
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from text_table import pack, read_payload, sidecar_path, unpack, write_payload
+
+PAYLOAD = {
+    "summary": {"total_profiles": 2},
+    "profiles": [
+        {
+            "profile": "Kim",
+            "raw_responses": ["Hola ₡", "Hola ₡", None],
+            "sources": [
+                {"json": "a.json", "raw_response": "Hola ₡", "metadata": {}},
+                {"json": "b.json", "raw_response": None, "metadata": {}},
+                {"json": "c.json", "metadata": {}},
+            ],
+        },
+        {"profile": "Ana", "raw_responses": [], "sources": []},
+    ],
+}
+
+
+def test_pack_unpack_round_trip_keeps_order_and_missing_texts():
+    packed, table = pack(PAYLOAD)
+
+    assert list(table.values()) == ["Hola ₡"]
+    kim = packed["profiles"][0]
+    assert list(kim) == ["profile", "raw_response_ids", "sources"]
+    assert kim["raw_response_ids"][2] is None
+    assert kim["sources"][1] == {"json": "b.json", "raw_response_id": None, "metadata": {}}
+    assert unpack(json.loads(json.dumps(packed)), table) == PAYLOAD
+
+
+@pytest.mark.parametrize("mode", ["inline", "embedded", "sidecar"])
+def test_written_payload_reads_back_inline(tmp_path, mode):
+    path = tmp_path / "profiles.json"
+
+    write_payload(PAYLOAD, path, mode)
+
+    assert read_payload(path) == (PAYLOAD, mode)
+    assert sidecar_path(path).exists() == (mode == "sidecar")
+
+
+@pytest.mark.parametrize("mode", ["embedded", "sidecar"])
+def test_consolidated_file_reads_back_as_the_inline_output(consolidate_stage, label_index, tmp_path, mode):
+    root = tmp_path / "PATRON"
+    for folder, name, text in (("4 - KIM", "1", "Hola"), ("4 - KIM", "2", "Hola"), ("ANA", "3", None)):
+        sidecar = root / folder / f"Screenshot_{name}.json"
+        sidecar.parent.mkdir(parents=True, exist_ok=True)
+        sidecar.write_text(json.dumps({"raw_response": text, "structured_data": {"name": folder}}))
+
+    outputs = {}
+    for layout in ("inline", mode):
+        output = tmp_path / layout / "consolidated.json"
+        args = consolidate_stage.parse_args(
+            [
+                "--root", str(root),
+                "--output", str(output),
+                "--state", str(tmp_path / layout / "state.json"),
+                "--identity-review", str(tmp_path / layout / "review.json"),
+                "--text-table", layout,
+            ]
+        )
+        consolidate_stage.run_consolidation(args)
+        outputs[layout] = output
+
+    inline = json.loads(outputs["inline"].read_text(encoding="utf-8"))
+    assert read_payload(outputs[mode]) == (inline, mode)
@@ -21,17 +21,34 @@ from __future__ import annotations
 
 import argparse
 import hashlib
+import importlib.util
 import json
 import os
 import re
 import shutil
 import subprocess
 import sys
-import unicodedata
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Dict, Iterable, List, Optional, Set, Tuple
 
+
+def _load_folder_labels():
+    """Load the folder-name parser shared with the newapp pipeline stages."""
+    path = Path(__file__).resolve().parents[2] / "newapp" / "folder_labels.py"
+    # folder_labels imports its newapp siblings (atomic_io) by name.
+    if str(path.parent) not in sys.path:
+        sys.path.append(str(path.parent))
+    spec = importlib.util.spec_from_file_location("folder_labels", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules.setdefault(spec.name, module)
+    spec.loader.exec_module(module)
+    return module
+
+
+folder_labels = _load_folder_labels()
+normalize_token = folder_labels.normalize_token
+
 SUPPORTED_MEDIA_EXTENSIONS = {
     ".jpg",
     ".jpeg",
@@ -107,60 +124,17 @@ class FingerprintCache:
         return fingerprint
 
 
-def normalize_token(value: str) -> str:
-    value = unicodedata.normalize("NFKD", value)
-    value = "".join(ch for ch in value if not unicodedata.combining(ch))
-    value = value.strip().lower()
-    value = value.replace("&", " and ")
-    value = value.replace("_", " ")
-    value = re.sub(r"[^a-z0-9]+", "_", value)
-    value = re.sub(r"_+", "_", value).strip("_")
-    return value
-
-
-def candidate_names(component: str) -> List[str]:
-    raw = component.strip()
-    out: List[str] = []
-
-    def add(item: str) -> None:
-        item = item.strip()
-        if item and item not in out:
-            out.append(item)
-
-    add(raw)
-
-    # Example: "4 - KIMBERLY ⭐⭐⭐⭐⭐" -> "KIMBERLY ⭐⭐⭐⭐⭐"
-    add(re.sub(r"^\d+\s*[-.)]\s*", "", raw))
-
-    # Example: "1 (diosa)" -> "diosa"
-    for inner in re.findall(r"\(([^)]+)\)", raw):
-        add(inner)
-
-    # Split on dash and use right-most meaningful part for labels like "0 - TIKAS".
-    if "-" in raw:
-        parts = [part.strip() for part in raw.split("-") if part.strip()]
-        if parts:
-            add(parts[-1])
-
-    return out
-
-
-def build_target_key_index(target_root: Path) -> Dict[str, List[Path]]:
+def build_target_key_index(target_root: Path, labels) -> Dict[str, List[Path]]:
     index: Dict[str, List[Path]] = {}
     for entry in sorted(target_root.iterdir()):
         if not entry.is_dir():
             continue
-        add_target_to_key_index(index, entry)
+        add_target_to_key_index(index, entry, labels)
     return index
 
 
-def add_target_to_key_index(index: Dict[str, List[Path]], target_dir: Path) -> None:
-    labels = {target_dir.name}
-    labels.update(candidate_names(target_dir.name))
-    for label in labels:
-        key = normalize_token(label)
-        if not key:
-            continue
+def add_target_to_key_index(index: Dict[str, List[Path]], target_dir: Path, labels) -> None:
+    for key in labels.label(target_dir.name).candidate_keys:
         paths = index.setdefault(key, [])
         if target_dir not in paths:
             paths.append(target_dir)
@@ -190,15 +164,18 @@ def iter_media_files(source_root: Path) -> Iterable[Path]:
             yield path
 
 
-def resolve_target_dir(file_path: Path, source_root: Path, key_index: Dict[str, List[Path]]) -> Optional[Path]:
-    rel_parent = file_path.parent.relative_to(source_root)
-    components = list(rel_parent.parts)
+def resolve_target_dir(
+    file_path: Path,
+    source_root: Path,
+    key_index: Dict[str, List[Path]],
+    labels,
+) -> Optional[Path]:
+    if file_path.parent == source_root:
+        return None
+    entry = labels.directory(file_path.parent, source_root)
 
-    for component in reversed(components):
-        for label in candidate_names(component):
-            key = normalize_token(label)
-            if not key:
-                continue
+    for label in (entry.label, *reversed(entry.categories)):
+        for key in label.candidate_keys:
             matches = key_index.get(key, [])
             if len(matches) == 1:
                 return matches[0]
@@ -228,10 +205,11 @@ def resolve_or_create_target_dir(
     source_root: Path,
     target_root: Path,
     key_index: Dict[str, List[Path]],
+    labels,
     apply: bool,
     create_missing_targets: bool,
 ) -> Optional[Path]:
-    target_dir = resolve_target_dir(file_path, source_root, key_index)
+    target_dir = resolve_target_dir(file_path, source_root, key_index, labels)
     if target_dir is not None:
         return target_dir
 
@@ -255,7 +233,7 @@ def resolve_or_create_target_dir(
     created = target_root / folder_name
     if apply:
         created.mkdir(parents=True, exist_ok=True)
-    add_target_to_key_index(key_index, created)
+    add_target_to_key_index(key_index, created, labels)
     return created
 
 
@@ -296,10 +274,14 @@ def move_media(
     create_missing_targets: bool,
     cleanup_empty_dirs: bool,
     verbose: bool,
+    labels=None,
 ) -> Stats:
     stats = Stats()
     fp_cache = FingerprintCache()
-    key_index = build_target_key_index(target_root)
+    if labels is None:
+        labels = folder_labels.FolderLabelIndex(None)
+    labels.scan(source_root)
+    key_index = build_target_key_index(target_root, labels)
 
     target_fp_indexes: Dict[Path, Dict[Tuple[int, str], Path]] = {}
 
@@ -318,6 +300,7 @@ def move_media(
             source_root=source_root,
             target_root=target_root,
             key_index=key_index,
+            labels=labels,
             apply=apply,
             create_missing_targets=create_missing_targets,
         )
@@ -375,6 +358,7 @@ def move_media(
     if apply and cleanup_empty_dirs:
         remove_empty_dirs(source_root, verbose=verbose)
 
+    labels.save()
     return stats
 
 
@@ -675,6 +659,11 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Print each planned/applied operation.",
     )
+    parser.add_argument(
+        "--label-index",
+        default=str(folder_labels.DEFAULT_INDEX),
+        help=f"Folder label index JSON shared with the pipeline stages (default: {folder_labels.DEFAULT_INDEX}).",
+    )
     return parser.parse_args()
 
 
@@ -702,6 +691,7 @@ def main() -> int:
         else:
             pre_snapshot = collect_git_media_snapshot(repo_root, target_root)
 
+    labels = folder_labels.FolderLabelIndex(Path(args.label_index).resolve())
     stats = move_media(
         source_root=source_root,
         target_root=target_root,
@@ -709,6 +699,7 @@ def main() -> int:
         create_missing_targets=args.create_missing_targets,
         cleanup_empty_dirs=not args.no_cleanup_empty_dirs,
         verbose=args.verbose,
+        labels=labels,
     )
 
     if args.apply and not args.no_catalog_update and repo_root is not None: